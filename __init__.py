@@ -17,7 +17,7 @@ The plugin also enables the creation and management of agent teams (flocks)
 
 4. Composition of agents via config files
 The plugin also enables composition of agents via config files, which allows setting up of teams 
-or individual agents with different goals, personalities, and traits
+or individual agents with different goals, personalities, and traits (see manifest.py)
 
 In the future, Auto-GPT shall introduce native multi-agent support within its core. However, until
 that goal is achieved, Dolly provides a solution for introducing multi-agent functionality without 
@@ -26,7 +26,7 @@ requiring alterations to the AutoGPT core structure.
 Build by @lcOrp on github.
 For help and discussion: https://discord.com/channels/1092243196446249134/1099609931562369024
 """
-import inspect
+import os
 from typing import Any, Optional, TypedDict, TypeVar
 
 from auto_gpt_plugin_template import AutoGPTPluginTemplate
@@ -42,14 +42,58 @@ class Message(TypedDict):
 
 
 COMMANDS = {
+    # A description can be a list of wordings; the prompt gets the one with
+    # the fewest tokens (see schemas.py)
     "clone_agent": {
-        "description": "Deploy a copy of the current agent to perform tasks in parallel.",
+        "description": [
+            "Deploy a copy of the current agent to perform tasks in parallel.",
+            "Deploy a copy of yourself to work on tasks in parallel.",
+        ],
         "aliases": ["clone", "replicate", "create_replica"],
     },
     "create_agent": {
-        "description": "Deploy a new, specialized agent to perform tasks in parallel.",
+        "description": [
+            "Deploy a new, specialized agent to perform tasks in parallel.",
+            "Deploy a specialized agent to work on tasks in parallel.",
+        ],
         "aliases": ["create_agent", "create_agent", "call_agent", "spawn"],
     },
+    "launch_team": {
+        "description": "Launch the team of agents described by a manifest file.",
+        "aliases": ["team"],
+    },
+    "share_finding": {
+        "description": "Share a finding with the other agents of the flock.",
+        "aliases": ["share"],
+    },
+    "search_findings": {
+        "description": (
+            "Search findings shared in the flock (scope: own, siblings or tree)."
+        ),
+        "aliases": ["recall"],
+    },
+    "publish_artifact": {
+        "description": "Publish a workspace file so other agents can fetch it.",
+        "aliases": ["publish"],
+    },
+    "fetch_artifact": {
+        "description": "Fetch an artifact (digest or agent_name/file) into a file.",
+        "aliases": ["fetch"],
+    },
+    "hand_off": {
+        "description": "Hand a large file to other agents as a payload handle.",
+        "aliases": ["handoff"],
+    },
+    "read_payload": {
+        "description": "Read length bytes of a payload handle from byte start.",
+        "aliases": ["read_handoff"],
+    },
+    "tail_agent": {
+        "description": (
+            "Show the last lines logged by an agent (name * for all agents)."
+        ),
+        "aliases": ["tail"],
+    },
 }
 
 
@@ -63,19 +107,136 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
         # Plugin settings
         self.debug = False
-        self.max_agents = 5
+        # Concurrent agents float between these limits, driven by
+        # completion latency, rate limits and host load (see concurrency.py).
+        self.max_agents = int(os.getenv("DOLLY_MAX_AGENTS", "5"))
+        self.min_agents = int(os.getenv("DOLLY_MIN_AGENTS", "1"))
+        self.target_latency = float(os.getenv("DOLLY_TARGET_LATENCY", "300"))
+        self.queue_timeout = float(os.getenv("DOLLY_QUEUE_TIMEOUT", "60"))
+
+        # Tree quotas, checked before a child is built (0 disables).
+        # Children inherit the clone commands, so without these limits the
+        # number of agents can grow geometrically.
+        self.max_depth = int(os.getenv("DOLLY_MAX_DEPTH", "2"))
+        self.max_descendants = int(os.getenv("DOLLY_MAX_DESCENDANTS", "20"))
+        self.max_fanout = int(os.getenv("DOLLY_MAX_FANOUT", "5"))
+        # A team launched from a manifest counts as one child of its caller
+        # towards the limits above, and is bounded by its own size instead
+        self.max_team_size = int(os.getenv("DOLLY_MAX_TEAM_SIZE", "30"))
+        # Where an agent run on a remote worker sits in the tree that spawned
+        # it: its depth and the agents that tree already spawned (set by the
+        # dispatcher, see Shepherd._run_remote)
+        self.tree_depth = int(os.getenv("DOLLY_TREE_DEPTH", "0"))
+        self.tree_spawned = int(os.getenv("DOLLY_TREE_SPAWNED", "0"))
         self.continuous_mode = False
         self.continuous_limit = 5
         self.separate_memory_index = False
         self.separate_settings = False
         self.separate_instructions = False
 
+        # Wall-clock limits, in seconds (0 disables).
+        # The agent timeout bounds each child, the tree timeout bounds a top-level
+        # agent's whole subtree. Deadlines propagate to grandchildren, and a
+        # cancelled agent gets the grace period to stop before it is interrupted.
+        self.agent_timeout = float(os.getenv("DOLLY_AGENT_TIMEOUT", "0"))
+        self.tree_timeout = float(os.getenv("DOLLY_TREE_TIMEOUT", "0"))
+        self.cancel_grace = float(os.getenv("DOLLY_CANCEL_GRACE", "30"))
+        # Deadline (Unix time) of an agent run on a remote worker, inherited
+        # from the tree that spawned it
+        self.tree_deadline = float(os.getenv("DOLLY_TREE_DEADLINE", "0"))
+
+        # Flock registry database (defaults to dolly_flock.sqlite3 in the workspace)
+        self.registry_path = os.getenv("DOLLY_REGISTRY_PATH", "")
+
+        # Remote workers: when set, agents run on the least-loaded worker
+        # registered with this coordinator instead of in-process (see workers.py)
+        self.coordinator_url = os.getenv("DOLLY_COORDINATOR_URL", "")
+        # Shared by the coordinator, the workers and the plugin; every request
+        # to them carries it
+        self.worker_token = os.getenv("DOLLY_WORKER_TOKEN", "")
+
+        # Model routing: children get the fast model unless explicit rules
+        # (a JSON file, see routing.py) or their goals' complexity call for the
+        # smart one. Decisions and outcomes go to dolly_routing.jsonl.
+        self.model_routing = os.getenv("DOLLY_MODEL_ROUTING", "True") == "True"
+        self.routing_rules = os.getenv("DOLLY_ROUTING_RULES", "")
+        self.routing_threshold = int(os.getenv("DOLLY_ROUTING_THRESHOLD", "2"))
+
+        # Command result cache shared by all agents using the same workspace.
+        # TTLs are "command=seconds,..." and default to cache.DEFAULT_TTLS.
+        self.command_cache = os.getenv("DOLLY_COMMAND_CACHE", "True") == "True"
+        self.cache_ttls = os.getenv("DOLLY_CACHE_TTLS", "")
+        self.cache_max_mb = int(os.getenv("DOLLY_CACHE_MAX_MB", "64"))
+
+        # Duplicate work: a new agent whose goals are at least this similar to
+        # an active agent's, or one finished within the window (seconds), is
+        # not spawned; the caller gets that agent's result instead (0 disables).
+        self.dedup_threshold = float(os.getenv("DOLLY_DEDUP_THRESHOLD", "0.8"))
+        self.dedup_window = float(os.getenv("DOLLY_DEDUP_WINDOW", "3600"))
+
+        # Hedging (opt-in): a child still running at this percentile of past
+        # run times gets a replica on a spare slot, on the smart model if the
+        # child was routed to the fast one. The first to finish wins and the
+        # other is cancelled (0 disables).
+        self.hedge_percentile = float(os.getenv("DOLLY_HEDGE_PERCENTILE", "0"))
+
+        # Clones start from a summary of the parent's history, its relevant
+        # memories and a workspace file list, within this many tokens (0 disables)
+        self.warm_start_tokens = int(os.getenv("DOLLY_WARM_START_TOKENS", "500"))
+
+        # History compaction for children: the last turns stay verbatim, older
+        # ones are folded into the running summary once they hold the threshold
+        # in tokens, and repeated command outputs are dropped (0 turns disables)
+        self.compact_keep_turns = int(os.getenv("DOLLY_COMPACT_KEEP_TURNS", "4"))
+        self.compact_threshold = int(os.getenv("DOLLY_COMPACT_THRESHOLD", "1000"))
+
+        # Early stop: children end as finished when they declare their goals
+        # met or when the files they were to produce exist and stopped changing,
+        # and as stalled after repeating the same command this many times
+        # (0 never idles out)
+        self.early_stop = os.getenv("DOLLY_EARLY_STOP", "True") == "True"
+        self.idle_cycles = int(os.getenv("DOLLY_IDLE_CYCLES", "3"))
+
+        # Lines of each agent's log kept in memory for tail_agent (see logmux.py)
+        self.log_ring_lines = int(os.getenv("DOLLY_LOG_RING_LINES", "1000"))
+
+        # Log segments rotate at this size or age and are then compressed; the
+        # oldest rotated segments are evicted once dolly_logs exceeds the quota
+        self.log_segment_mb = float(os.getenv("DOLLY_LOG_SEGMENT_MB", "16"))
+        self.log_segment_minutes = float(os.getenv("DOLLY_LOG_SEGMENT_MINUTES", "60"))
+        self.log_quota_mb = float(os.getenv("DOLLY_LOG_QUOTA_MB", "1024"))
+
+        # Record/replay (see cassette.py): with a cassette file, every chat
+        # completion, embedding and command result is recorded to it ("record")
+        # or fed back from it ("replay"), with the original latency or none
+        self.cassette = os.getenv("DOLLY_CASSETTE", "")
+        self.cassette_mode = os.getenv("DOLLY_CASSETTE_MODE", "replay")
+        self.replay_latency = os.getenv("DOLLY_REPLAY_LATENCY", "True") == "True"
+
+        # Auto-GPT's agent machinery is imported by the first create_agent; with
+        # prewarming that happens in the background once the first cycle starts
+        self.prewarm = os.getenv("DOLLY_PREWARM", "False") == "True"
+
+        # Memory accounting (opt-in, slows agents down): tracemalloc snapshots
+        # around every in-process child report what it left behind, and whether
+        # its Agent, Config and memory backend survived its teardown
+        self.memory_accounting = os.getenv("DOLLY_MEMORY_ACCOUNTING", "False") == "True"
+        self.memory_frames = int(os.getenv("DOLLY_MEMORY_FRAMES", "1"))
+
+        # Scratch area for payloads handed between agents by handle (defaults
+        # to /dev/shm, or dolly_handoff in the workspace; see handoff.py)
+        self.handoff_dir = os.getenv("DOLLY_HANDOFF_DIR", "")
+
+        # Team manifests (see manifest.py): the template each member's
+        # ai_settings.yaml is rendered from (defaults to the bundled one)
+        self.settings_template = os.getenv("DOLLY_SETTINGS_TEMPLATE", "")
+
         # Print out a summary of the settings
         print(f"\n\nAuto-GPT Dolly Plugin Settings (v {self._version}):")
         print("==============================================")
         print(f"  - Commands: {', '.join(COMMANDS.keys())}")
         print(f"  - Agents in Debug Mode: {self.debug}")
-        print(f"  - Max Agents Num: {self.max_agents}")
+        print(f"  - Agents Num: {self.min_agents}-{self.max_agents} (adaptive)")
         print(f"  - Agents in Continuous Mode: {self.continuous_mode}")
         print(f"  - Agents Continuous Mode Max Cycles: {self.continuous_limit}")
         print(f"  - Separate Memory Per Agent: {self.separate_memory_index}")
@@ -85,6 +246,24 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         print(
             f"  - Separate Instructions Per Agent: {'Configured (See .env)' if self.separate_instructions else 'None'}"
         )
+        print(
+            f"  - Agent Tree Quotas: depth={self.max_depth},"
+            f" descendants={self.max_descendants}, fan-out={self.max_fanout},"
+            f" team size={self.max_team_size}"
+        )
+        print(f"  - Remote Workers: {self.coordinator_url or 'None'}")
+        print(f"  - Model Routing: {self.model_routing}")
+        print(f"  - Command Cache: {self.command_cache}")
+        print(f"  - Duplicate Threshold: {self.dedup_threshold or 'None'}")
+        print(f"  - Hedge Percentile: {self.hedge_percentile or 'None'}")
+        print(f"  - Warm Start Tokens: {self.warm_start_tokens or 'None'}")
+        print(f"  - History Compaction: {self.compact_keep_turns or 'None'} turns kept")
+        print(f"  - Early Stop: {self.early_stop}")
+        print(f"  - Log Quota (MB): {self.log_quota_mb or 'None'}")
+        cassette = f"{self.cassette_mode} {self.cassette}" if self.cassette else "None"
+        print(f"  - Cassette: {cassette}")
+        print(f"  - Agent Timeout (s): {self.agent_timeout or 'None'}")
+        print(f"  - Agent Tree Timeout (s): {self.tree_timeout or 'None'}")
 
     def post_prompt(self, prompt: PromptGenerator) -> PromptGenerator:
         """
@@ -97,42 +276,19 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         Returns:
             PromptGenerator: The prompt generator.
         """
+        from .schemas import compiled_commands
         from .shepherd import Shepherd
 
-        for command, attrs in COMMANDS.items():
-            try:
-                target = getattr(Shepherd, command)
-                aliases = attrs["aliases"]
-                # Use the shortest alias as the command label to save tokens
-                command_label = (
-                    min(aliases + [command], key=len) if aliases else command
-                )
-
-                argspec = inspect.getfullargspec(target)
-                arg_names = argspec.args
-                arg_annotations = argspec.annotations
-                params = {}
-                for arg_name, arg_annotation in zip(
-                    arg_names, arg_annotations.values()
-                ):
-                    if arg_name in ["cls", "self", "agent"]:
-                        continue
-
-                    params[arg_name] = (
-                        str(arg_annotation)
-                        if "class" not in str(arg_annotation)
-                        else arg_annotation.__name__
-                    )
-
-                prompt.add_command(
-                    command_label=command_label,
-                    command_name=attrs["description"],
-                    params=params,
-                    function=target,
-                )
-            except AttributeError:
-                # TODO: Log error
-                pass
+        Shepherd.configure(self)
+        Shepherd.install_replay(getattr(prompt, "command_registry", None))
+        # Labels, descriptions and parameters are worked out once per process
+        for schema in compiled_commands(COMMANDS, Shepherd):
+            prompt.add_command(
+                command_label=schema.label,
+                command_name=schema.description,
+                params=schema.params,
+                function=getattr(Shepherd, schema.name),
+            )
 
         return prompt
 
@@ -152,11 +308,17 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the on_response method."""
-        return False
+        return bool(self.cassette) and self.cassette_mode == "record"
 
     def on_response(self, response: str, *args, **kwargs) -> Optional[str]:
         """This method is called when a response is received from the model."""
-        pass
+        from .cassette import active_cassette
+        from .lifecycle import flock_tree
+
+        cassette = active_cassette()
+        if cassette is None:
+            return response
+        return cassette.after_chat(flock_tree.current(), response)
 
     def can_handle_on_planning(self) -> bool:
         """
@@ -165,7 +327,7 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the on_planning method."""
-        return False
+        return True
 
     def on_planning(
         self, prompt: PromptGenerator, messages: list[Message]
@@ -177,7 +339,17 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
             prompt (PromptGenerator): The prompt generator.
             messages (list[str]): The list of messages.
         """
-        pass
+        from .lifecycle import flock_tree
+        from .shepherd import Shepherd
+
+        if self.prewarm:
+            from .startup import prewarm
+
+            prewarm()
+        # Planning starts every cycle, so it doubles as the cancellation point
+        flock_tree.checkpoint()
+        Shepherd.record_cycle(flock_tree.current())
+        Shepherd.compact_history(flock_tree.current())
 
     def can_handle_post_planning(self) -> bool:
         """
@@ -186,7 +358,7 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the post_planning method."""
-        return False
+        return self.early_stop
 
     def post_planning(self, response: str) -> Optional[str]:
         """
@@ -198,7 +370,11 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         Returns:
             str: The resulting response.
         """
-        pass
+        from .lifecycle import flock_tree
+        from .shepherd import Shepherd
+
+        Shepherd.check_completion(flock_tree.current(), response)
+        return response
 
     def can_handle_pre_instruction(self) -> bool:
         """
@@ -270,7 +446,7 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the pre_command method."""
-        return False
+        return True
 
     def pre_command(
         self, command_name: str, arguments: dict[str, Any]
@@ -285,8 +461,21 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         Returns:
             tuple[str, dict[str, Any]]: The command name and the arguments.
         """
-        # Return "write_to_file" => settings file
-        pass
+        from .cache import active_cache
+        from .cassette import active_cassette
+        from .lifecycle import flock_tree
+        from .shepherd import Shepherd
+
+        Shepherd.record_command(flock_tree.current(), command_name)
+        cassette = active_cassette()
+        if cassette is not None:
+            command_name, arguments = cassette.pre_command(
+                flock_tree.current(), command_name, arguments
+            )
+        cache = active_cache()
+        if cache is None:
+            return command_name, arguments
+        return cache.pre_command(command_name, arguments)
 
     def can_handle_post_command(self) -> bool:
         """
@@ -295,7 +484,7 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
         Returns:
             bool: True if the plugin can handle the post_command method."""
-        return False
+        return self.command_cache or bool(self.cassette)
 
     def post_command(self, command_name: str, response: str) -> str:
         """
@@ -308,7 +497,18 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         Returns:
             str: The resulting response.
         """
-        pass
+        from .cache import active_cache
+        from .cassette import active_cassette
+        from .lifecycle import flock_tree
+
+        cassette = active_cassette()
+        if cassette is not None:
+            node = flock_tree.current()
+            response = cassette.post_command(node, command_name, response)
+        cache = active_cache()
+        if cache is None:
+            return response
+        return cache.post_command(command_name, response)
 
     def can_handle_chat_completion(
         self, messages: dict[Any, Any], model: str, temperature: float, max_tokens: int
@@ -325,7 +525,13 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
 
           Returns:
               bool: True if the plugin can handle the chat_completion method."""
-        return False
+        from .cassette import active_cassette
+        from .lifecycle import flock_tree
+
+        cassette = active_cassette()
+        if cassette is None:
+            return False
+        return cassette.before_chat(flock_tree.current(), messages, model)
 
     def handle_chat_completion(
         self, messages: list[Message], model: str, temperature: float, max_tokens: int
@@ -342,6 +548,9 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         Returns:
             str: The resulting response.
         """
+        from .cassette import active_cassette
+
+        return active_cassette().chat_result()
 
     def can_handle_text_embedding(self, text: str) -> bool:
         """This method is called to check that the plugin can
@@ -350,7 +559,16 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
             text (str): The text to be convert to embedding.
           Returns:
               bool: True if the plugin can handle the text_embedding method."""
-        return False
+        from .cassette import RECORD, active_cassette
+        from .knowledge import active_knowledge
+
+        if active_knowledge() is not None:
+            return True
+        cassette = active_cassette()
+        if cassette is None:
+            return False
+        # Recording computes every embedding itself, so none goes unrecorded
+        return cassette.mode == RECORD or cassette.has_embedding(text)
 
     def handle_text_embedding(self, text: str) -> list:
         """This method is called when the chat completion is done.
@@ -359,7 +577,23 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         Returns:
             list: The text embedding.
         """
-        pass
+        from .cassette import RECORD, active_cassette
+        from .knowledge import active_knowledge
+        from .lifecycle import flock_tree
+        from .shepherd import Shepherd
+
+        def embed(text: str) -> list:
+            cassette = active_cassette()
+            if cassette and (cassette.mode == RECORD or cassette.has_embedding(text)):
+                return cassette.embedding(
+                    flock_tree.current(), text, Shepherd.live_embedding
+                )
+            return Shepherd.live_embedding(text)
+
+        # Identical texts, whichever agent's memory they are for, share one
+        # embedding in the flock's content-addressed index
+        knowledge = active_knowledge()
+        return knowledge.embedding(text, embed) if knowledge else embed(text)
 
     def can_handle_user_input(self, user_input: str) -> bool:
         """This method is called to check that the plugin can
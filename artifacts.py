@@ -0,0 +1,127 @@
+"""Content-addressed artifact store shared by the agents of a flock.
+
+Published files are stored once under their sha256 and appear in workspaces as
+copy-on-write reflinks of the stored blob where the file system supports them,
+or as copies. Workspace files never share an inode with a blob, so whatever
+writes to them (commands, shell scripts, chmod) leaves the blob alone. Blobs
+are checked against their digest before they are fetched.
+"""
+import json
+import os
+import shutil
+import stat
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+from .blobs import BlobStore, file_digest
+
+# Linux FICLONE ioctl: copy-on-write clone on btrfs, xfs and similar
+FICLONE = 0x40049409
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    target.unlink()
+    return False
+
+
+def reflink_or_copy(source: Path, target: Path) -> str:
+    """Make target a reflink or copy of source; returns which."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    if _reflink(source, tmp):
+        method = "reflink"
+    else:
+        shutil.copyfile(source, tmp)
+        method = "copy"
+    os.replace(tmp, target)
+    return method
+
+
+class ArtifactStore(BlobStore):
+    """Flock-level blob store with a manifest of the artifacts of each agent.
+
+    Parameters:
+        root (Path): Where blobs and manifests are kept.
+        workspace (Path): The workspace artifact paths are relative to.
+    """
+
+    def __init__(self, root: Union[str, Path], workspace: Union[str, Path]):
+        super().__init__(Path(root))
+        self.workspace = Path(workspace).resolve()
+        self.manifests = self.root / "manifests"
+        self.manifests.mkdir(exist_ok=True)
+
+    def _resolve(self, relative: str) -> Path:
+        path = (self.workspace / relative).resolve()
+        if self.workspace not in path.parents:
+            raise ValueError(f"Artifacts must be inside the workspace: {relative}")
+        return path
+
+    def put_file(self, path: Path) -> str:
+        """Store a file without reading it into memory; returns its digest."""
+        digest = file_digest(path)
+        blob = self.path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            shutil.copyfile(path, tmp)
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            tmp.replace(blob)
+        return digest
+
+    def manifest(self, agent_id: str) -> dict[str, str]:
+        path = self.manifests / f"{agent_id}.json"
+        return json.loads(path.read_text()) if path.exists() else {}
+
+    def _record(self, agent_id: str, relative: str, digest: str):
+        manifest = self.manifest(agent_id)
+        manifest[relative] = digest
+        path = self.manifests / f"{agent_id}.json"
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        tmp.replace(path)
+
+    def publish(self, agent_id: str, relative: str) -> str:
+        """Store a workspace file; returns its digest."""
+        path = self._resolve(relative)
+        digest = self.put_file(path)
+        self._record(agent_id, relative, digest)
+        return digest
+
+    def fetch(self, agent_id: str, digest: str, relative: str) -> str:
+        """Reflink or copy a blob into the workspace; returns which.
+
+        A blob whose content no longer matches its digest is deleted, so it can
+        be published again, and ValueError is raised.
+        """
+        if not self.has(digest):
+            raise KeyError(digest)
+        if not self.verify(digest):
+            self.path(digest).unlink(missing_ok=True)
+            raise ValueError(f"artifact {digest} was corrupted and has been removed")
+        method = reflink_or_copy(self.path(digest), self._resolve(relative))
+        self._record(agent_id, relative, digest)
+        return method
+
+
+_active: Optional[ArtifactStore] = None
+
+
+def install_store(store: ArtifactStore):
+    global _active
+    _active = store
+
+
+def active_store() -> Optional[ArtifactStore]:
+    return _active
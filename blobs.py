@@ -0,0 +1,71 @@
+"""Files stored under the sha256 of their content, shared by workers and artifacts."""
+import fnmatch
+import hashlib
+import uuid
+from pathlib import Path
+from typing import Iterable
+
+
+def file_digest(path: Path) -> str:
+    """The sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """Files stored under the sha256 of their content."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob digest: {digest}")
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def verify(self, digest: str) -> bool:
+        """Whether the stored blob still has the content its digest names."""
+        return file_digest(self.path(digest)) == digest
+
+    def get(self, digest: str) -> bytes:
+        return self.path(digest).read_bytes()
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        return digest
+
+    def snapshot(self, directory: Path, exclude: Iterable[str] = ()) -> dict[str, str]:
+        """Store every file under directory; returns {relative path: digest}."""
+        manifest = {}
+        directory = Path(directory)
+        if not directory.exists():
+            return manifest
+        for path in sorted(directory.rglob("*")):
+            relative = path.relative_to(directory).as_posix()
+            if path.is_file() and not any(
+                fnmatch.fnmatch(relative, pattern) for pattern in exclude
+            ):
+                manifest[relative] = self.put(path.read_bytes())
+        return manifest
+
+    def materialize(self, manifest: dict[str, str], directory: Path):
+        directory = Path(directory).resolve()
+        for relative, digest in manifest.items():
+            target = (directory / relative).resolve()
+            if directory not in target.parents:
+                raise ValueError(f"Refusing to write outside workspace: {relative}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(self.get(digest))
@@ -0,0 +1,226 @@
+"""Cross-agent cache for the results of idempotent commands.
+
+pre_command looks the command up; on a hit it rewrites the call to the
+`dolly_cached_result` command, which returns the stored result instead of
+running the command again. post_command stores fresh results.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+from urllib.parse import urlsplit, urlunsplit
+
+CACHED_RESULT_COMMAND = "dolly_cached_result"
+
+# Seconds a result stays fresh, per command
+DEFAULT_TTLS = {
+    "web_search": 3600,
+    "google": 3600,
+    "browse_website": 1800,
+    "read_webpage": 1800,
+    "read_file": 86400,
+}
+# Commands whose result depends on a workspace file, and the argument naming it
+FILE_ARGUMENTS = {"read_file": "filename"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    command TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    validator TEXT,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at);
+"""
+
+
+def parse_ttls(spec: str) -> dict[str, int]:
+    """Parse "command=seconds,..." into a TTL whitelist; empty means the defaults."""
+    if not spec:
+        return dict(DEFAULT_TTLS)
+    ttls = {}
+    for item in spec.split(","):
+        command, _, seconds = item.partition("=")
+        ttls[command.strip()] = int(seconds)
+    return ttls
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        if value.startswith(("http://", "https://")):
+            parts = urlsplit(value)
+            path = parts.path.rstrip("/") or "/"
+            return urlunsplit(
+                (parts.scheme.lower(), parts.netloc.lower(), path, parts.query, "")
+            )
+    return value
+
+
+def cache_key(command: str, arguments: dict) -> str:
+    payload = json.dumps([command, _normalize(arguments)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CommandCache:
+    """On-disk result cache shared by every agent process using the same file.
+
+    Parameters:
+        path (Path): SQLite database file.
+        workspace (Path): Root that file arguments are relative to.
+        ttls (dict): Cacheable commands and their TTL in seconds.
+        max_bytes (int): Size bound; least recently used results are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        workspace: Union[str, Path],
+        ttls: Optional[dict[str, int]] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.workspace = Path(workspace)
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def cacheable(self, command: str) -> bool:
+        return command in self.ttls
+
+    def _validator(self, command: str, arguments: dict) -> Optional[str]:
+        """The mtime and size of the file a command reads, if any."""
+        argument = FILE_ARGUMENTS.get(command)
+        if argument is None or argument not in arguments:
+            return None
+        path = self.workspace / str(arguments[argument])
+        try:
+            stat = path.stat()
+        except OSError:
+            return "missing"
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def lookup(self, command: str, arguments: dict) -> Optional[str]:
+        """The key of a fresh cached result for this call, or None."""
+        if not self.cacheable(command):
+            return None
+        key = cache_key(command, arguments)
+        row = (
+            self._connection()
+            .execute("SELECT validator, expires_at FROM results WHERE key = ?", (key,))
+            .fetchone()
+        )
+        now = time.time()
+        if row is None or row[1] < now or row[0] != self._validator(command, arguments):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return key
+
+    def result(self, key: str) -> Optional[str]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT result FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+        )
+        return row[0]
+
+    def store(self, command: str, arguments: dict, result: str):
+        if not self.cacheable(command) or not isinstance(result, str):
+            return
+        if result.startswith("Error") or "Traceback" in result:
+            return
+        now = time.time()
+        size = len(result.encode())
+        if size > self.max_bytes:
+            return
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                cache_key(command, arguments),
+                command,
+                result,
+                size,
+                self._validator(command, arguments),
+                now + self.ttls[command],
+                now,
+            ),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        rows = conn.execute("SELECT key, size FROM results ORDER BY accessed_at")
+        doomed = []
+        for key, size in rows:
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    # Plugin hooks
+
+    def pre_command(self, command: str, arguments: dict) -> tuple[str, dict]:
+        key = self.lookup(command, arguments)
+        if key is not None:
+            return CACHED_RESULT_COMMAND, {"key": key}
+        self._local.pending = (command, arguments)
+        return command, arguments
+
+    def post_command(self, command: str, response: str) -> str:
+        pending = getattr(self._local, "pending", None)
+        self._local.pending = None
+        if pending is not None and pending[0] == command:
+            self.store(command, pending[1], response)
+        return response
+
+    def cached_result(self, key: str, agent=None) -> str:
+        """Method of the dolly_cached_result command."""
+        result = self.result(key)
+        if result is None:
+            return "Error: the cached result expired, run the command again."
+        return result
+
+
+_active: Optional[CommandCache] = None
+
+
+def install(cache: CommandCache):
+    global _active
+    _active = cache
+
+
+def active_cache() -> Optional[CommandCache]:
+    return _active
@@ -0,0 +1,248 @@
+"""Record and replay the chat completions, embeddings and command results of a flock.
+
+In record mode every interaction of every agent is appended to a JSONL
+cassette with its latency. In replay mode the hooks hand the recorded results
+back in the same order, after the original latency or none at all, so
+scheduler, cache and spawn changes can be compared on identical workloads
+without calling an LLM.
+
+Agents are identified by their place in the tree (`0` for the top-level
+agent, `0.2` for its second child, ...), since names and ids change between
+runs. Dolly's own commands are never replayed: they spawn the children whose
+interactions are replayed in turn.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Union
+
+RECORD = "record"
+REPLAY = "replay"
+REPLAYED_RESULT_COMMAND = "dolly_replayed_result"
+
+CHAT = "chat"
+EMBEDDING = "embedding"
+COMMAND = "command"
+
+logger = logging.getLogger(__name__)
+
+
+def track(node) -> str:
+    """The position of an agent in its tree, stable across runs."""
+    ordinals = []
+    while node is not None and node.parent is not None:
+        ordinals.append(str(node.ordinal))
+        node = node.parent
+    return ".".join(["0", *reversed(ordinals)])
+
+
+def request_key(*parts: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+
+
+class Cassette:
+    """A recording of a flock run, being written or played back.
+
+    Parameters:
+        path (Path): The JSONL cassette.
+        mode (str): RECORD or REPLAY.
+        latency (bool): Whether replay waits as long as the original calls took.
+        live_commands (Iterable[str]): Commands that always run for real.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        mode: str = REPLAY,
+        latency: bool = True,
+        live_commands: Iterable[str] = (),
+    ):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.live_commands = {*live_commands, REPLAYED_RESULT_COMMAND}
+        self.misses = 0
+        self.diverged = 0
+        # Set once the dolly_replayed_result command is registered with the
+        # command registry every agent shares
+        self.commands_installed = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counts: dict[tuple[str, str], int] = {}
+        self._tapes: dict[tuple[str, str], deque] = {}
+        self._embeddings: dict[str, dict] = {}
+        self._replayed: dict[str, dict] = {}
+        if mode == RECORD:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["kind"] == EMBEDDING:
+                    self._embeddings[entry["key"]] = entry
+                else:
+                    counter = (entry["track"], entry["kind"])
+                    self._tapes.setdefault(counter, deque()).append(entry)
+
+    def close(self):
+        if self.mode == RECORD:
+            self._file.close()
+
+    # Recording
+
+    def _record(self, node, kind: str, key: str, result: Any, started: float):
+        entry = {
+            "track": track(node),
+            "kind": kind,
+            "key": key,
+            "latency": round(time.monotonic() - started, 3),
+            "result": result,
+        }
+        with self._lock:
+            counter = (entry["track"], kind)
+            entry["n"] = self._counts.get(counter, 0)
+            self._counts[counter] = entry["n"] + 1
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    # Replaying
+
+    def _next(self, node, kind: str, key: str) -> Optional[dict]:
+        """The next recorded entry of this agent and kind, None once exhausted."""
+        name = track(node)
+        with self._lock:
+            tape = self._tapes.get((name, kind))
+            if not tape:
+                self.misses += 1
+                logger.warning(f"Dolly: the cassette has no {kind} left for {name}")
+                return None
+            entry = tape.popleft()
+        if entry["key"] != key:
+            # The run went its own way; keep feeding it the recording regardless
+            self.diverged += 1
+            logger.warning(
+                f"Dolly: {name} diverged from the cassette at {kind} #{entry['n']}"
+            )
+        return entry
+
+    def _wait(self, entry: dict):
+        if self.latency and entry["latency"] > 0:
+            time.sleep(entry["latency"])
+
+    # Chat completions
+
+    def before_chat(self, node, messages: list, model: str) -> bool:
+        """Called before each chat completion; True if replay will answer it."""
+        key = request_key(messages, model)
+        if self.mode == RECORD:
+            self._local.chat = (key, time.monotonic())
+            return False
+        self._local.chat = self._next(node, CHAT, key)
+        return self._local.chat is not None
+
+    def chat_result(self) -> Optional[str]:
+        """The recorded reply for the completion accepted by before_chat."""
+        entry, self._local.chat = getattr(self._local, "chat", None), None
+        if entry is None:
+            return None
+        self._wait(entry)
+        return entry["result"]
+
+    def after_chat(self, node, content: str) -> str:
+        """Called with each live chat completion; records it."""
+        pending, self._local.chat = getattr(self._local, "chat", None), None
+        if self.mode == RECORD and pending is not None:
+            self._record(node, CHAT, pending[0], content, pending[1])
+        return content
+
+    # Embeddings
+
+    def embedding(self, node, text: str, embed: Callable[[str], Any]) -> Any:
+        """The embedding of text, recorded or replayed; replay misses call embed."""
+        key = request_key(text)
+        if self.mode == REPLAY:
+            entry = self._embeddings.get(key)
+            if entry is not None:
+                self._wait(entry)
+                return entry["result"]
+            self.misses += 1
+            return embed(text)
+        if getattr(self._local, "embedding", False):
+            # The embedding being recorded went through the plugin hooks again
+            return embed(text)
+        self._local.embedding = True
+        started = time.monotonic()
+        try:
+            result = embed(text)
+        finally:
+            self._local.embedding = False
+        self._record(node, EMBEDDING, key, list(result), started)
+        return result
+
+    def has_embedding(self, text: str) -> bool:
+        return request_key(text) in self._embeddings
+
+    def embedder(self, embed: Callable[[str], Any]) -> Callable[[str], Any]:
+        """Wrap an embedding function so its calls go through the cassette."""
+        return lambda text: self.embedding(None, text, embed)
+
+    # Commands
+
+    def pre_command(
+        self, node, command: str, arguments: dict[str, Any]
+    ) -> tuple[str, dict[str, Any]]:
+        self._local.command = None
+        if command in self.live_commands:
+            return command, arguments
+        key = request_key(command, arguments)
+        if self.mode == RECORD:
+            self._local.command = (key, time.monotonic())
+            return command, arguments
+        entry = self._next(node, COMMAND, key)
+        # Before the first child is created there is no command to replay with
+        if entry is None or not self.commands_installed:
+            return command, arguments
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._replayed[token] = entry
+        return REPLAYED_RESULT_COMMAND, {"key": token}
+
+    def post_command(self, node, command: str, response: str) -> str:
+        pending, self._local.command = getattr(self._local, "command", None), None
+        if self.mode == RECORD and pending is not None:
+            self._record(node, COMMAND, pending[0], response, pending[1])
+        return response
+
+    def replayed_result(self, key: str, agent=None) -> str:
+        """Method of the dolly_replayed_result command."""
+        with self._lock:
+            entry = self._replayed.pop(key, None)
+        if entry is None:
+            return "Error: no recorded result for this command."
+        self._wait(entry)
+        return entry["result"]
+
+
+_active: Optional[Cassette] = None
+
+
+def install_cassette(cassette: Optional[Cassette]):
+    global _active
+    _active = cassette
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active
@@ -0,0 +1,103 @@
+"""Rolling compaction of a child agent's message history."""
+import json
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_NOTE = "(same output as an earlier cycle, omitted)"
+
+
+def _turns(messages: list) -> list[list]:
+    """Messages grouped into cycles, each starting at an assistant reply."""
+    turns = []
+    for message in messages:
+        if message.role == "assistant" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _describe(turn: list) -> str:
+    """One summary line for a cycle: the command it ran and how that went."""
+    action, outcome = "", ""
+    for message in turn:
+        if message.role == "assistant":
+            try:
+                command = json.loads(message.content)["command"]
+                action = f"{command['name']}({json.dumps(command.get('args', {}))})"
+            except (ValueError, KeyError, TypeError):
+                action = message.content.strip().replace("\n", " ")[:120]
+        elif not outcome:
+            outcome = message.content.strip().replace("\n", " ")[:160]
+    return f"- {action} -> {outcome}" if outcome else f"- {action}"
+
+
+class HistoryCompactor:
+    """Keeps the last turns verbatim and folds older ones into the running summary.
+
+    Folding only happens once the older turns hold `threshold` tokens, so the
+    summary is refreshed in batches rather than every cycle. Tool outputs that
+    repeat an earlier one are replaced by a short note.
+
+    Parameters:
+        keep_turns (int): Cycles kept verbatim.
+        threshold (int): Tokens in older cycles that trigger a fold.
+        count_tokens (Callable): Token counter for message contents.
+    """
+
+    def __init__(
+        self, keep_turns: int, threshold: int, count_tokens: Callable[[str], int]
+    ):
+        self.keep_turns = keep_turns
+        self.threshold = threshold
+        self.count_tokens = count_tokens
+        self.saved_total = 0
+
+    def _size(self, messages: list) -> int:
+        return sum(self.count_tokens(message.content) for message in messages)
+
+    def dedupe(self, messages: list) -> int:
+        """Replace repeated tool outputs, except the latest message; tokens saved."""
+        seen, saved = set(), 0
+        for message in messages[:-1]:
+            if message.role == "assistant" or message.content == DUPLICATE_NOTE:
+                continue
+            if message.content in seen:
+                saved += self.count_tokens(message.content)
+                saved -= self.count_tokens(DUPLICATE_NOTE)
+                message.content = DUPLICATE_NOTE
+            else:
+                seen.add(message.content)
+        return saved
+
+    def compact(self, history, name: str = "agent") -> int:
+        """Compact history in place and return the tokens saved this cycle.
+
+        history is the agent's message history: its `messages` list is trimmed,
+        the folded cycles are appended to its `summary`.
+        """
+        messages = history.messages
+        saved = self.dedupe(messages)
+
+        turns = _turns(messages)
+        older = [m for turn in turns[: -self.keep_turns] for m in turn]
+        if older and self._size(older) >= self.threshold:
+            lines = [_describe(turn) for turn in turns[: -self.keep_turns]]
+            folded = "\n".join(lines)
+            history.summary = f"{history.summary}\n{folded}".strip()
+            saved += self._size(older) - self.count_tokens(folded)
+            del messages[: len(older)]
+            # Auto-GPT summarizes trimmed messages from this index on
+            if hasattr(history, "last_trimmed_index"):
+                history.last_trimmed_index = max(
+                    0, history.last_trimmed_index - len(older)
+                )
+
+        if saved:
+            self.saved_total += saved
+            logger.info(
+                f"Dolly: compacted {name}'s history, {saved} tokens saved"
+                f" ({self.saved_total} in total)"
+            )
+        return saved
@@ -0,0 +1,276 @@
+"""AIMD controller for the number of agents a flock runs at once."""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+from .events import LIMITER, flock_events
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+class FlockAtCapacity(Exception):
+    """Raised when no agent slot frees up in time."""
+
+
+def host_load() -> tuple[float, float]:
+    """(CPU load per core, memory used percent) of the host."""
+    if psutil is not None:
+        return psutil.cpu_percent() / 100, psutil.virtual_memory().percent
+
+    cpu = 0.0
+    if hasattr(os, "getloadavg"):
+        cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    memory = 0.0
+    try:
+        lines = Path("/proc/meminfo").read_text().splitlines()
+        meminfo = dict(line.split(":", 1) for line in lines)
+        total = int(meminfo["MemTotal"].split()[0])
+        available = int(meminfo["MemAvailable"].split()[0])
+        memory = 100 * (total - available) / total
+    except (OSError, KeyError, ValueError):
+        pass
+    return cpu, memory
+
+
+class AdaptiveLimiter:
+    """Additive-increase/multiplicative-decrease limit on concurrent agents.
+
+    Every completed agent is a signal: the limit grows by `increase` when the
+    agent finished within `target_latency` on a healthy host, and is multiplied
+    by `decrease` when it was slow, hit rate limits, or the host was overloaded.
+    The limit always stays within [floor, ceiling].
+    """
+
+    def __init__(
+        self,
+        floor: int = 1,
+        ceiling: int = 5,
+        target_latency: float = 300.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        max_cpu_load: float = 0.9,
+        max_memory_percent: float = 90.0,
+        rate_limit_window: float = 60.0,
+    ):
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # How many slots each thread is inside of, nested agents included
+        self._held = threading.local()
+        self._rate_limits: deque[float] = deque()
+        self.decisions: deque[dict] = deque(maxlen=100)
+        self.counters = {"completions": 0, "increases": 0, "decreases": 0}
+        self._limit = float(ceiling)
+        self.configure(
+            floor=floor,
+            ceiling=ceiling,
+            target_latency=target_latency,
+            increase=increase,
+            decrease=decrease,
+            max_cpu_load=max_cpu_load,
+            max_memory_percent=max_memory_percent,
+            rate_limit_window=rate_limit_window,
+        )
+
+    def configure(self, **settings):
+        with self._cond:
+            for key, value in settings.items():
+                setattr(self, key, value)
+            if self.floor < 1 or self.ceiling < self.floor:
+                raise ValueError("Agent limits need 1 <= floor <= ceiling.")
+            self._limit = min(max(self._limit, self.floor), self.ceiling)
+            self._cond.notify_all()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(
+        self,
+        timeout: Optional[float] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        """Take a slot, giving up after timeout or once cancelled() is true."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._active >= self.limit:
+                    remaining = (
+                        deadline - time.monotonic() if deadline is not None else None
+                    )
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    if cancelled is not None:
+                        if cancelled():
+                            return False
+                        # Nothing notifies a cancellation, so look again shortly
+                        remaining = min(remaining or 1.0, 1.0)
+                    self._cond.wait(remaining)
+                self._active += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def release(self, latency: float, rate_limited: bool = False):
+        with self._cond:
+            self._active -= 1
+            self._complete(latency, rate_limited)
+            self._cond.notify_all()
+
+    def _complete(self, latency: float, rate_limited: bool):
+        if rate_limited:
+            self._rate_limits.append(time.monotonic())
+        self._adjust(latency)
+
+    def note_rate_limit(self):
+        """Record a 429 seen by any agent, outside of agent completion."""
+        with self._cond:
+            self._rate_limits.append(time.monotonic())
+
+    @contextmanager
+    def slot(
+        self,
+        timeout: Optional[float] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ):
+        """Hold an agent slot for the duration of the block.
+
+        An agent started inside a slot on the same thread is a nested child
+        its parent waits for, so it takes over the parent's slot instead of
+        queueing for another one. Its completion still adjusts the limit.
+        """
+        nested = getattr(self._held, "count", 0) > 0
+        if not nested and not self.acquire(timeout, cancelled):
+            if cancelled is not None and cancelled():
+                raise FlockAtCapacity("It was cancelled while waiting for a slot.")
+            raise FlockAtCapacity(
+                f"All {self.limit} agent slots stayed busy for {timeout}s."
+            )
+        self._held.count = getattr(self._held, "count", 0) + 1
+        started = time.monotonic()
+        rate_limited = False
+        try:
+            yield
+        except Exception as e:
+            rate_limited = "RateLimit" in type(e).__name__
+            raise
+        finally:
+            self._held.count -= 1
+            latency = time.monotonic() - started
+            if nested:
+                with self._cond:
+                    self._complete(latency, rate_limited)
+            else:
+                self.release(latency, rate_limited=rate_limited)
+
+    @contextmanager
+    def lend(self):
+        """Free this thread's slot while it waits on agents run by other threads.
+
+        The slot is taken back when the block ends, however long that takes.
+        """
+        held = getattr(self._held, "count", 0)
+        if held:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+            self._held.count = 0
+        try:
+            yield
+        finally:
+            if held:
+                self.acquire()
+                self._held.count = held
+
+    def _recent_rate_limits(self) -> int:
+        cutoff = time.monotonic() - self.rate_limit_window
+        while self._rate_limits and self._rate_limits[0] < cutoff:
+            self._rate_limits.popleft()
+        return len(self._rate_limits)
+
+    def _adjust(self, latency: float):
+        cpu, memory = host_load()
+        rate_limits = self._recent_rate_limits()
+        if rate_limits:
+            reason = f"{rate_limits} rate limits in {self.rate_limit_window:.0f}s"
+        elif cpu > self.max_cpu_load:
+            reason = f"cpu load {cpu:.2f}"
+        elif memory > self.max_memory_percent:
+            reason = f"memory {memory:.0f}%"
+        elif latency > self.target_latency:
+            reason = f"latency {latency:.1f}s"
+        else:
+            reason = None
+
+        previous = self._limit
+        self.counters["completions"] += 1
+        if reason:
+            self._limit = max(self.floor, self._limit * self.decrease)
+            self.counters["decreases"] += 1
+            action = "decrease"
+        else:
+            self._limit = min(self.ceiling, self._limit + self.increase)
+            self.counters["increases"] += 1
+            action = "increase"
+            reason = f"latency {latency:.1f}s"
+
+        decision = {
+            "time": time.time(),
+            "action": action,
+            "reason": reason,
+            "from": previous,
+            "to": self._limit,
+            "cpu_load": cpu,
+            "memory_percent": memory,
+        }
+        self.decisions.append(decision)
+        flock_events.emit(
+            LIMITER,
+            None,
+            limit=self.limit,
+            active=self._active,
+            waiting=self._waiting,
+            **decision,
+        )
+        if int(previous) != self.limit:
+            logger.info(f"Dolly agent limit {int(previous)} -> {self.limit} ({reason})")
+
+    def metrics(self) -> dict:
+        """A snapshot of the controller state, for dashboards and logs."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "floor": self.floor,
+                "ceiling": self.ceiling,
+                "active": self._active,
+                "waiting": self._waiting,
+                "rate_limits": self._recent_rate_limits(),
+                **self.counters,
+                "last_decision": self.decisions[-1] if self.decisions else None,
+            }
+
+
+class RateLimitLogHandler(logging.Handler):
+    """Feeds rate-limit warnings logged by Auto-GPT's retry logic to a limiter."""
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        super().__init__(level=logging.DEBUG)
+        self.limiter = limiter
+
+    def emit(self, record: logging.LogRecord):
+        if "rate limit" in record.getMessage().lower():
+            self.limiter.note_rate_limit()
+
+
+flock_limiter = AdaptiveLimiter()
@@ -0,0 +1,67 @@
+"""Warm-start context for clones: what the parent already knows, on a token budget."""
+from pathlib import Path
+from typing import Callable, Iterable
+
+# Workspace files that are flock bookkeeping rather than work
+SKIP_PREFIXES = ("dolly_", ".")
+
+
+def workspace_manifest(workspace: Path, limit: int = 50) -> list[str]:
+    """Most recently modified workspace files, with their size."""
+    files = [
+        path
+        for path in Path(workspace).rglob("*")
+        if path.is_file()
+        and not any(
+            part.startswith(SKIP_PREFIXES) for part in path.relative_to(workspace).parts
+        )
+    ]
+    files.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+    return [
+        f"{path.relative_to(workspace)} ({path.stat().st_size} bytes)"
+        for path in files[:limit]
+    ]
+
+
+def _fit(lines: Iterable[str], budget: int, count_tokens: Callable) -> list[str]:
+    kept = []
+    for line in lines:
+        cost = count_tokens(line)
+        if cost > budget:
+            break
+        kept.append(line)
+        budget -= cost
+    return kept
+
+
+def build_context_pack(
+    summary: str,
+    memories: list[str],
+    manifest: list[str],
+    budget: int,
+    count_tokens: Callable[[str], int],
+) -> str:
+    """Join the parent's summary, memory hits and file manifest within budget tokens.
+
+    The summary gets half of the budget, memories and files share what is left.
+    A section that does not fit is cut at a line boundary.
+    """
+    sections = []
+    remaining = budget
+    parts = (
+        ("What your parent agent has done so far", summary.splitlines(), 2),
+        ("Relevant memories", memories, 2),
+        ("Files in the workspace", manifest, 1),
+    )
+    for title, lines, share in parts:
+        lines = _fit(
+            [line for line in lines if line.strip()],
+            remaining // share - count_tokens(title),
+            count_tokens,
+        )
+        if not lines:
+            continue
+        section = f"{title}:\n" + "\n".join(lines)
+        remaining -= count_tokens(section)
+        sections.append(section)
+    return "\n\n".join(sections)
@@ -0,0 +1,142 @@
+"""Near-duplicate detection of agent goals with MinHash signatures."""
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Iterable, Optional
+
+from .lifecycle import AgentNode
+from .registry import ACTIVE_STATUSES, FlockRegistry
+
+NUM_PERM = 64
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are stored and compared across processes
+_rng = random.Random(1099609931)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)
+]
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with".split()
+)
+
+
+def shingles(goals: Iterable[str]) -> set[str]:
+    """Words and word pairs of the normalized goals, ignoring their order."""
+    result = set()
+    for goal in goals:
+        words = [
+            word
+            for word in re.findall(r"[a-z0-9]+", goal.lower())
+            if word not in STOPWORDS
+        ]
+        result.update(words)
+        result.update(" ".join(pair) for pair in zip(words, words[1:]))
+    return result
+
+
+def signature(goals: Iterable[str]) -> list[int]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+        for s in shingles(goals)
+    ]
+    if not hashes:
+        return [_PRIME] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(first: list[int], second: list[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(first, second)) / NUM_PERM
+
+
+class GoalIndex:
+    """Goal fingerprints of active and recently finished agents.
+
+    Parameters:
+        registry (FlockRegistry): Where fingerprints are stored, next to the agents.
+        threshold (float): Similarity from which goals count as duplicates.
+        window (float): How long, in seconds, finished agents stay matchable.
+    """
+
+    def __init__(
+        self, registry: FlockRegistry, threshold: float = 0.8, window: float = 3600
+    ):
+        self.registry = registry
+        self.threshold = threshold
+        self.window = window
+
+    def add(self, agent_id: str, goals: list[str]):
+        self.registry.set_fingerprint(agent_id, json.dumps(signature(goals)))
+
+    def match(
+        self, goals: list[str], exclude: Iterable[str] = ()
+    ) -> Optional[tuple[dict, float]]:
+        """The most similar duplicate agent and its similarity, if any."""
+        wanted = signature(goals)
+        exclude = set(exclude)
+        best = None
+        for record in self.registry.fingerprinted(time.time() - self.window):
+            if record["id"] in exclude:
+                continue
+            score = similarity(wanted, json.loads(record.pop("signature")))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (record, score)
+        return best
+
+    def wait(
+        self, agent_id: str, waiter: Optional[AgentNode], poll_interval: float = 1.0
+    ) -> Optional[dict]:
+        """The agent's record once it is no longer active or the waiter is stopped.
+
+        The wait is recorded in the registry so that agents of other trees can
+        tell when waiting on each other would never return; None means the agent
+        is, directly or through its children, waiting on the waiter. The waiter
+        stops waiting once it is cancelled or its deadline has passed, leaving
+        cancellation itself to its next checkpoint.
+        """
+        if waiter is None:
+            return self._poll(agent_id, lambda: False, poll_interval)
+        self.registry.set_wait(waiter.id, agent_id)
+        try:
+            if self.deadlocks(agent_id, waiter):
+                return None
+            return self._poll(
+                agent_id,
+                lambda: waiter.cancelled or waiter.remaining() == 0,
+                poll_interval,
+            )
+        finally:
+            self.registry.clear_wait(waiter.id)
+
+    def deadlocks(self, agent_id: str, waiter: AgentNode) -> bool:
+        """Whether the agent only finishes once the waiter, or an ancestor, does."""
+        blocked, ancestor = set(), waiter
+        while ancestor is not None:
+            blocked.add(ancestor.id)
+            ancestor = ancestor.parent
+        waits = self.registry.waits()
+        seen, pending = set(), [agent_id]
+        while pending:
+            current = pending.pop()
+            if current in blocked:
+                return True
+            if current in seen:
+                continue
+            seen.add(current)
+            # An agent finishes after its children and after whatever it waits on
+            if current in waits:
+                pending.append(waits[current])
+            pending.extend(
+                child["id"]
+                for child in self.registry.children(current, *ACTIVE_STATUSES)
+            )
+        return False
+
+    def _poll(self, agent_id: str, stopped, poll_interval: float) -> dict:
+        while True:
+            record = self.registry.get(agent_id)
+            if record["status"] not in ACTIVE_STATUSES or stopped():
+                return record
+            time.sleep(poll_interval)
+            self.registry.reap_dead()
@@ -0,0 +1,118 @@
+"""Detects child agents that met their goals but keep cycling."""
+import json
+import re
+from pathlib import Path
+from typing import Optional
+
+# Reason codes recorded in the flock registry
+COMPLETION_SIGNAL = "completion_signal"
+ARTIFACTS_PRESENT = "artifacts_present"
+NO_PROGRESS = "no_progress"
+# Registry status of a child stopped for each reason
+STOP_STATUSES = {
+    COMPLETION_SIGNAL: "finished",
+    ARTIFACTS_PRESENT: "finished",
+    NO_PROGRESS: "stalled",
+}
+
+# Only as a sentence of its own, so "once the task is done" does not count
+COMPLETION_PATTERN = re.compile(
+    r"(?:^|[.!?:;]\s+|\n\s*)"
+    r"(?:(?:all|my|the) (?:goals?|tasks?) (?:are|is|have been|has been)"
+    r" (?:now )?(?:complete|completed|accomplished|achieved|done)\b"
+    r"|(?:there is )?nothing (?:left|more|else) to do\b)",
+    re.IGNORECASE,
+)
+# Thoughts that state the agent's current view; plans and criticism look ahead
+STATEMENT_FIELDS = ("text", "reasoning", "speak")
+ARTIFACT_PATTERN = re.compile(
+    r"[\w./-]+\.(?:txt|md|json|csv|py|js|html|yaml|yml|xml|pdf|docx?)\b"
+)
+# Auto-GPT ends the agent itself on these
+FINISH_COMMANDS = ("goals_accomplished", "task_complete")
+
+
+class EarlyStop(SystemExit):
+    """Raised in a child's loop to end it (see STOP_STATUSES for the status)."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CompletionDetector:
+    """Watches a child's replies for signs that its work is done.
+
+    Parameters:
+        goals (list[str]): The child's goals; file names in them are the
+            artifacts it is expected to produce.
+        workspace (Path): Where the artifacts are looked for.
+        idle_cycles (int): Repeats of the previous command that count as no progress.
+    """
+
+    def __init__(self, goals: list[str], workspace: Path, idle_cycles: int = 3):
+        self.workspace = Path(workspace)
+        self.idle_cycles = idle_cycles
+        self.artifacts = sorted(set(ARTIFACT_PATTERN.findall("\n".join(goals))))
+        self.cycles = 0
+        self._last_command = None
+        self._repeats = 0
+        self._last_artifacts = None
+        # Files named in the goals that already exist are inputs until changed
+        self._initial = {artifact: self._stat(artifact) for artifact in self.artifacts}
+
+    def _stat(self, artifact: str) -> Optional[tuple[int, int]]:
+        path = self.workspace / artifact
+        if not path.is_file() or path.stat().st_size == 0:
+            return None
+        return path.stat().st_size, path.stat().st_mtime_ns
+
+    def _artifact_state(self) -> Optional[tuple]:
+        """Size and mtime of the artifacts the child produced.
+
+        None while any artifact missing at the start is still missing, or
+        while the child has neither created nor changed any of them.
+        """
+        state = []
+        for artifact in self.artifacts:
+            current = self._stat(artifact)
+            if current is None:
+                return None
+            if current != self._initial[artifact]:
+                state.append((artifact, *current))
+        return tuple(state) or None
+
+    def observe(self, response: str) -> Optional[str]:
+        """The reason code to stop on after this reply, or None to carry on."""
+        self.cycles += 1
+        try:
+            reply = json.loads(response)
+            command = reply.get("command") or {}
+            key = (command.get("name"), json.dumps(command.get("args"), sort_keys=True))
+        except (ValueError, AttributeError):
+            reply, key = None, (None, response)
+        if key[0] in FINISH_COMMANDS:
+            return None
+
+        statements = [response]
+        if reply:
+            thoughts = reply.get("thoughts") or {}
+            if isinstance(thoughts, dict):
+                statements = [str(thoughts.get(f) or "") for f in STATEMENT_FIELDS]
+            else:
+                statements = [str(thoughts)]
+        if any(COMPLETION_PATTERN.search(text.strip()) for text in statements):
+            return COMPLETION_SIGNAL
+
+        # Artifacts that exist and did not change over a whole cycle are done
+        if self.artifacts:
+            state = self._artifact_state()
+            if state is not None and state == self._last_artifacts:
+                return ARTIFACTS_PRESENT
+            self._last_artifacts = state
+
+        self._repeats = self._repeats + 1 if key == self._last_command else 0
+        self._last_command = key
+        if self.idle_cycles and self._repeats >= self.idle_cycles:
+            return NO_PROGRESS
+        return None
@@ -0,0 +1,213 @@
+"""Append-only JSONL log of agent lifecycle events, with a compact sidecar index.
+
+Every event is one JSON line carrying its type, the agent and parent ids, the
+wall-clock time and a monotonic timestamp. For each line a fixed-size record
+is appended to `<log>.idx`: the line's byte offset, its time and CRC32 keys of
+its agent id and type. Queries scan the small index and only read and parse
+the lines it points at.
+
+Rebuild the timeline of the flock tree an agent belongs to:
+
+    python -m autogpt_dolly_plugin.events <workspace>/dolly_events.jsonl \
+        --agent <id> --tree <workspace>/dolly_flock.sqlite3
+"""
+import argparse
+import json
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+# Event types, in the order an agent goes through them
+REQUESTED = "requested"
+QUEUED = "queued"
+PROVISIONING = "provisioning"
+STARTED = "started"
+CYCLE = "cycle"
+COMMAND = "command"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+REFUSED = "refused"
+# Stopped by early stop for making no progress (see earlystop.py)
+STALLED = "stalled"
+# What a child left behind (see memwatch.py)
+MEMORY = "memory"
+# An agent limit decision of the flock limiter (see concurrency.py)
+LIMITER = "limiter"
+# Registry statuses whose event is named differently
+STATUS_EVENTS = {"running": STARTED}
+
+INDEX_RECORD = struct.Struct("<QdII")
+
+
+def _key(value: Optional[str]) -> int:
+    return zlib.crc32((value or "").encode())
+
+
+class EventLog:
+    """Lifecycle events of every agent of this process, in one file.
+
+    Parameters:
+        path (Path): The JSONL file; the index is kept next to it.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._log = None
+        self._index = None
+        if path is not None:
+            self.configure(path)
+
+    def configure(self, path: Union[str, Path]):
+        with self._lock:
+            self._close()
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.index_path = self.path.with_name(self.path.name + ".idx")
+            self._log = open(self.path, "ab")
+            self._index = open(self.index_path, "ab")
+            self._catch_up()
+
+    def _catch_up(self):
+        """Index the lines written after the index was last flushed."""
+        records = self._records()
+        offset = 0
+        if records:
+            with open(self.path, "rb") as log:
+                log.seek(records[-1][0])
+                offset = records[-1][0] + len(log.readline())
+        # A torn index record is dropped and rewritten
+        self._index.truncate(len(records) * INDEX_RECORD.size)
+        with open(self.path, "rb") as log:
+            log.seek(offset)
+            for raw in log:
+                if not raw.endswith(b"\n"):
+                    break
+                event = json.loads(raw)
+                keys = _key(event["agent"]), _key(event["type"])
+                self._index.write(INDEX_RECORD.pack(offset, event["time"], *keys))
+                offset += len(raw)
+        self._index.flush()
+
+    def _close(self):
+        for file in (self._log, self._index):
+            if file is not None:
+                file.close()
+        self._log = self._index = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def emit(
+        self,
+        type: str,
+        agent: Optional[str],
+        parent: Optional[str] = None,
+        **data,
+    ) -> Optional[dict]:
+        """Append an event; does nothing until the log has a file."""
+        if self._log is None:
+            return None
+        event = {
+            "time": time.time(),
+            "mono": time.monotonic(),
+            "type": type,
+            "agent": agent,
+            "parent": parent,
+            **data,
+        }
+        line = (json.dumps(event, default=str) + "\n").encode()
+        with self._lock:
+            if self._log is None:
+                return None
+            offset = self._log.tell()
+            self._log.write(line)
+            self._log.flush()
+            self._index.write(
+                INDEX_RECORD.pack(offset, event["time"], _key(agent), _key(type))
+            )
+            self._index.flush()
+        return event
+
+    def node_event(self, type: str, node, **data) -> Optional[dict]:
+        """Append an event for a flock tree node."""
+        parent = node.parent.id if node.parent is not None else None
+        return self.emit(type, node.id, parent, name=node.name, **data)
+
+    def _records(self) -> list[tuple[int, float, int, int]]:
+        if not self.index_path.exists():
+            return []
+        data = self.index_path.read_bytes()
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        return list(INDEX_RECORD.iter_unpack(data[:usable]))
+
+    def query(
+        self,
+        agents: Optional[Iterable[str]] = None,
+        types: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> list[dict]:
+        """Events of the given agents and types between two times, oldest first."""
+        if self.path is None:
+            return []
+        agents = set(agents) if agents is not None else None
+        types = set(types) if types is not None else None
+        agent_keys = {_key(agent) for agent in agents} if agents is not None else None
+        type_keys = {_key(type) for type in types} if types is not None else None
+
+        offsets = [
+            offset
+            for offset, stamp, agent_key, type_key in self._records()
+            if (agent_keys is None or agent_key in agent_keys)
+            and (type_keys is None or type_key in type_keys)
+            and (since is None or stamp >= since)
+            and (until is None or stamp <= until)
+        ]
+        events = []
+        with open(self.path, "rb") as log:
+            for offset in offsets:
+                log.seek(offset)
+                event = json.loads(log.readline())
+                # Keys are hashes, so a match is confirmed on the event itself
+                if agents is not None and event["agent"] not in agents:
+                    continue
+                if types is not None and event["type"] not in types:
+                    continue
+                events.append(event)
+        return events
+
+
+flock_events = EventLog()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Query Dolly lifecycle events.")
+    parser.add_argument("path", help="The dolly_events.jsonl file of a workspace")
+    parser.add_argument("--agent", action="append", help="Agent id (repeatable)")
+    parser.add_argument("--type", action="append", help="Event type (repeatable)")
+    parser.add_argument("--since", type=float, help="Unix time to list events from")
+    parser.add_argument("--until", type=float, help="Unix time to list events to")
+    parser.add_argument(
+        "--tree",
+        help="The flock registry; --agent then selects the agents' whole trees",
+    )
+    args = parser.parse_args(argv)
+
+    agents = args.agent
+    if agents and args.tree:
+        from .registry import FlockRegistry
+
+        registry = FlockRegistry(args.tree)
+        agents = [found for agent in agents for found in registry.tree(agent)]
+    for event in EventLog(args.path).query(agents, args.type, args.since, args.until):
+        print(json.dumps(event))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Large read-only payloads handed between the agents of a flock by handle.
+
+A payload is written once to the flock's scratch area (in /dev/shm where
+there is one, so it never leaves memory) and memory-mapped read-only by every
+agent that opens it. Agents pass the handle, `payload-<16 hex digits>`, in
+goals and results instead of the data. In-process children share one mapping,
+so nothing is copied per agent.
+
+Each holder of a payload has a reference file naming its process. A payload
+is deleted once the last holder releases it, or once every process that held
+it has exited.
+
+The scratch directory is private to the user running the flock: it is created
+with mode 0700, and one that belongs to another user is refused.
+"""
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import stat
+import threading
+import uuid
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from .registry import _pid_alive
+
+PREFIX = "payload-"
+HANDLE_PATTERN = re.compile(rf"\b{PREFIX}[0-9a-f]{{16}}\b")
+SHARED_MEMORY = Path("/dev/shm")
+
+
+def default_root(workspace: Union[str, Path]) -> Path:
+    """The scratch area of the flock working in workspace."""
+    workspace = Path(workspace).resolve()
+    if SHARED_MEMORY.is_dir() and os.access(SHARED_MEMORY, os.W_OK):
+        flock = hashlib.sha256(str(workspace).encode()).hexdigest()[:12]
+        return SHARED_MEMORY / f"dolly-handoff-{flock}"
+    return workspace / "dolly_handoff"
+
+
+def _check_private(root: Path):
+    """Refuse a scratch directory another user could read or plant payloads in."""
+    info = os.lstat(root)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{root} is not a directory")
+    if not hasattr(os, "getuid"):
+        return
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{root} belongs to another user")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        os.chmod(root, 0o700)
+
+
+def handles_in(text: str) -> list[str]:
+    """The payload handles mentioned in text, in order."""
+    return list(dict.fromkeys(HANDLE_PATTERN.findall(text)))
+
+
+class HandoffStore:
+    """Reference-counted payloads in a scratch directory.
+
+    Parameters:
+        root (Path): The scratch directory, shared by the flock's processes.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        _check_private(self.root)
+        self._lock = threading.Lock()
+        # One read-only mapping per payload, shared by the agents of this process
+        self._maps: dict[str, mmap.mmap] = {}
+
+    def path(self, handle: str) -> Path:
+        if not HANDLE_PATTERN.fullmatch(handle):
+            raise KeyError(handle)
+        return self.root / handle
+
+    def _refs(self, handle: str) -> Path:
+        return self.root / f"{handle}.refs"
+
+    def has(self, handle: str) -> bool:
+        try:
+            return self.path(handle).exists()
+        except KeyError:
+            return False
+
+    def _store(self, digest: str, write, holders: Iterable[str]) -> str:
+        handle = PREFIX + digest[:16]
+        # Held before it appears, so another process's collect() never finds
+        # the new payload without holders
+        for holder in holders:
+            self._hold(handle, holder)
+        target = self.path(handle)
+        if not target.exists():
+            tmp = self.root / f".{handle}.{uuid.uuid4().hex}.tmp"
+            write(tmp)
+            os.chmod(tmp, stat.S_IRUSR)
+            os.replace(tmp, target)
+        return handle
+
+    def put(self, data: bytes, holders: Iterable[str]) -> str:
+        """Store data for holders; returns its handle."""
+        digest = hashlib.sha256(data).hexdigest()
+        return self._store(digest, lambda tmp: tmp.write_bytes(data), holders)
+
+    def put_file(self, path: Union[str, Path], holders: Iterable[str]) -> str:
+        """Store a file for holders without reading it into memory; returns its handle.
+
+        The file is copied, not linked, so later writes to it leave the payload alone.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return self._store(
+            digest.hexdigest(), lambda tmp: shutil.copyfile(path, tmp), holders
+        )
+
+    # References
+
+    def acquire(self, handle: str, holder: str):
+        """Keep a payload alive until holder releases it or its process exits."""
+        if not self.path(handle).exists():
+            raise KeyError(handle)
+        self._hold(handle, holder)
+
+    def _hold(self, handle: str, holder: str):
+        refs = self._refs(handle)
+        with self._lock:
+            refs.mkdir(exist_ok=True)
+            (refs / holder).write_text(str(os.getpid()))
+
+    def holders(self, handle: str) -> list[str]:
+        refs = self._refs(handle)
+        return sorted(ref.name for ref in refs.iterdir()) if refs.is_dir() else []
+
+    def release(self, handle: str, holder: str):
+        (self._refs(handle) / holder).unlink(missing_ok=True)
+        self._collect(handle)
+
+    def release_holder(self, holder: str):
+        """Release every payload holder has; called when an agent exits."""
+        for handle in self.handles():
+            if (self._refs(handle) / holder).exists():
+                self.release(handle, holder)
+
+    def handles(self) -> list[str]:
+        return sorted(path.name for path in self.root.glob(f"{PREFIX}*[0-9a-f]"))
+
+    def _collect(self, handle: str):
+        """Delete a payload nobody holds anymore."""
+        refs = self._refs(handle)
+        with self._lock:
+            if refs.is_dir():
+                for ref in refs.iterdir():
+                    try:
+                        pid = int(ref.read_text() or 0)
+                    except (OSError, ValueError):
+                        continue
+                    if not pid or _pid_alive(pid):
+                        return
+                    ref.unlink(missing_ok=True)
+            mapping = self._maps.pop(handle, None)
+            if mapping is not None:
+                try:
+                    mapping.close()
+                except BufferError:
+                    pass  # still viewed; the mapping outlives the file
+            try:
+                self.path(handle).unlink(missing_ok=True)
+            except OSError:
+                return  # still mapped elsewhere (Windows); collected later
+            shutil.rmtree(refs, ignore_errors=True)
+
+    def collect(self) -> int:
+        """Delete the payloads whose holders have all exited; how many were."""
+        before = len(self.handles())
+        for handle in self.handles():
+            self._collect(handle)
+        return before - len(self.handles())
+
+    # Reading
+
+    def open(self, handle: str) -> memoryview:
+        """A read-only view of a payload, mapped once per process."""
+        with self._lock:
+            mapping = self._maps.get(handle)
+            if mapping is None:
+                path = self.path(handle)
+                if not path.exists():
+                    raise KeyError(handle)
+                if path.stat().st_size == 0:
+                    return memoryview(b"")
+                with open(path, "rb") as file:
+                    mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[handle] = mapping
+        return memoryview(mapping)
+
+    def read(self, handle: str, start: int = 0, length: Optional[int] = None) -> bytes:
+        """A slice of a payload; only the slice is copied."""
+        view = self.open(handle)
+        end = len(view) if length is None else start + length
+        with view:
+            return bytes(view[start:end])
+
+    def size(self, handle: str) -> int:
+        return self.path(handle).stat().st_size
+
+
+_active: Optional[HandoffStore] = None
+
+
+def install_handoff(store: Optional[HandoffStore]):
+    global _active
+    _active = store
+
+
+def active_handoff() -> Optional[HandoffStore]:
+    return _active
@@ -0,0 +1,97 @@
+"""Hedged execution: a replica races an agent that runs longer than usual."""
+import math
+import threading
+from typing import Callable, Optional
+
+from .lifecycle import AgentNode
+
+
+def hedge_delay(
+    latencies: list[float], percentile: float, min_samples: int = 5
+) -> Optional[float]:
+    """The given percentile of past run times, or None without enough history."""
+    if not percentile or len(latencies) < min_samples:
+        return None
+    ordered = sorted(latencies)
+    rank = math.ceil(percentile / 100 * len(ordered)) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+class Hedge:
+    """Starts a replica of the primary agent if it is still running after `delay`.
+
+    Whichever finishes first with an acceptable result settles the race and
+    the other one is cancelled.
+
+    Parameters:
+        primary (AgentNode): The agent being hedged.
+        delay (float): Seconds to wait before starting the replica.
+        start_replica (Callable): Runs the replica on the calling thread and
+            returns its result, or None if it did not finish acceptably.
+    """
+
+    def __init__(
+        self,
+        primary: AgentNode,
+        delay: float,
+        start_replica: Callable[["Hedge"], Optional[str]],
+    ):
+        self.primary = primary
+        self.delay = delay
+        self.start_replica = start_replica
+        self.replica: Optional[AgentNode] = None
+        self.winner: Optional[str] = None
+        self.result: Optional[str] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(delay, self._launch)
+        self._timer.daemon = True
+
+    def start(self):
+        self._timer.start()
+
+    def _launch(self):
+        if self._closed or self.primary.cancelled:
+            return
+        threading.Thread(target=self._race, daemon=True).start()
+
+    def _race(self):
+        result = self.start_replica(self)
+        if result is not None:
+            self.settle("replica", result)
+
+    def attach(self, replica: AgentNode) -> bool:
+        """Register the replica's node; False if the race is already settled."""
+        with self._lock:
+            if self._closed:
+                return False
+            self.replica = replica
+            return True
+
+    def settle(self, winner: str, result: str) -> bool:
+        """Record the first acceptable result and cancel the other agent."""
+        with self._lock:
+            if self._closed:
+                return False
+            self._closed = True
+            self.winner = winner
+            self.result = result
+        self._timer.cancel()
+        if winner == "replica":
+            self.primary.cancel(f"hedge replica '{self.replica.name}' finished first")
+        elif self.replica is not None:
+            self.replica.cancel(f"primary '{self.primary.name}' finished first")
+        return True
+
+    def stop(self):
+        """End the race once the primary exits; a replica still running is cancelled."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._timer.cancel()
+        if self.replica is not None:
+            self.replica.cancel(f"primary '{self.primary.name}' exited")
+
+    def lost(self, winner: str) -> bool:
+        return self.winner is not None and self.winner != winner
@@ -0,0 +1,230 @@
+"""Knowledge index shared by the agents of a flock."""
+import hashlib
+import heapq
+import json
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+SCOPES = ("own", "siblings", "tree")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    hash TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS provenance (
+    hash TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    PRIMARY KEY (hash, agent_id)
+);
+CREATE INDEX IF NOT EXISTS provenance_agent ON provenance (agent_id);
+"""
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(" ".join(content.split()).encode()).hexdigest()
+
+
+def _norm(vector: array) -> float:
+    return math.sqrt(sum(x * x for x in vector))
+
+
+def _cosine(first: array, second: array, first_norm: float) -> float:
+    norm = first_norm * _norm(second)
+    return sum(x * y for x, y in zip(first, second)) / norm if norm else 0.0
+
+
+class FlockKnowledge:
+    """Findings of every agent, stored and embedded once per unique content.
+
+    Each agent that adds a finding gets a provenance row with its tags, so a
+    search can be limited to the findings of a set of agents.
+
+    Parameters:
+        path (Path): SQLite database file.
+        embed (Callable): Returns the embedding of a text.
+    """
+
+    def __init__(self, path: Union[str, Path], embed: Callable[[str], list[float]]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.embed = embed
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, content: str, agent_id: str, tags: Iterable[str] = ()) -> bool:
+        """Record a finding for agent_id; True if its content was new to the flock."""
+        key = content_hash(content)
+        known = self._connection().execute(
+            "SELECT 1 FROM provenance WHERE hash = ?", (key,)
+        ).fetchone()
+        self.embedding(content)
+        self._connection().execute(
+            "INSERT OR IGNORE INTO provenance VALUES (?, ?, ?, ?)",
+            (key, agent_id, ",".join(tags), time.time()),
+        )
+        return not known
+
+    def embedding(
+        self, content: str, embed: Optional[Callable[[str], list[float]]] = None
+    ) -> list[float]:
+        """The embedding of content, computed (by embed if given) only once.
+
+        Agents' memories embed their texts through here too, so each unique
+        text is embedded once per flock whichever agent wrote or looks it up.
+        """
+        key = content_hash(content)
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT embedding FROM documents WHERE hash = ?", (key,)
+        ).fetchone()
+        if row:
+            embedding = array("f")
+            embedding.frombytes(row[0])
+            return embedding.tolist()
+        embedding = (embed or self.embed)(content)
+        conn.execute(
+            "INSERT OR IGNORE INTO documents VALUES (?, ?, ?, ?)",
+            (key, content, array("f", embedding).tobytes(), time.time()),
+        )
+        return list(embedding)
+
+    def search(
+        self, query: str, agent_ids: Optional[Iterable[str]] = None, k: int = 5
+    ) -> list[dict]:
+        """The k findings most similar to query, from the given agents (or all).
+
+        The agents' findings are selected through the provenance index before
+        any embedding is read, so only those are scored.
+        """
+        sql = (
+            "SELECT documents.hash, content, embedding,"
+            " GROUP_CONCAT(agent_id), GROUP_CONCAT(tags)"
+            " FROM provenance JOIN documents ON documents.hash = provenance.hash"
+        )
+        params = ()
+        if agent_ids is not None:
+            agent_ids = list(agent_ids)
+            if not agent_ids:
+                return []
+            # One parameter however many agents: no limit on the scope's size
+            sql += " WHERE agent_id IN (SELECT value FROM json_each(?))"
+            params = (json.dumps(agent_ids),)
+        rows = self._connection().execute(sql + " GROUP BY documents.hash", params)
+
+        wanted = array("f", self.embed(query))
+        wanted_norm = _norm(wanted)
+        scored = []
+        for key, content, blob, agents, tags in rows:
+            embedding = array("f")
+            embedding.frombytes(blob)
+            score = _cosine(wanted, embedding, wanted_norm)
+            scored.append((score, key, content, agents, tags))
+        return [
+            {
+                "hash": key,
+                "content": content,
+                "score": score,
+                "agents": sorted(set(agents.split(","))),
+                "tags": sorted({tag for tag in tags.split(",") if tag}),
+            }
+            for score, key, content, agents, tags in heapq.nlargest(
+                k, scored, key=lambda row: row[0]
+            )
+        ]
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        (documents,) = conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+        (references,) = conn.execute("SELECT COUNT(*) FROM provenance").fetchone()
+        return {"documents": documents, "references": references}
+
+
+class FlockMemory:
+    """An agent memory shared by the agents of a flock, holding each text once.
+
+    Items whose content the memory already holds are not added again; all
+    else goes to the wrapped Auto-GPT memory backend.
+
+    Parameters:
+        memory (VectorMemoryProvider): The backend shared by the flock.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self._lock = threading.Lock()
+        self._held = {content_hash(item.raw_content) for item in memory}
+
+    def add(self, item):
+        key = content_hash(item.raw_content)
+        with self._lock:
+            if key in self._held:
+                return
+            self._held.add(key)
+        self.memory.add(item)
+
+    def discard(self, item):
+        with self._lock:
+            self._held.discard(content_hash(item.raw_content))
+        self.memory.discard(item)
+
+    def clear(self):
+        with self._lock:
+            self._held.clear()
+        self.memory.clear()
+
+    def __contains__(self, item) -> bool:
+        return item in self.memory
+
+    def __iter__(self):
+        return iter(self.memory)
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def __getattr__(self, name: str):
+        return getattr(self.memory, name)
+
+
+_indexes: dict[Path, FlockKnowledge] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_knowledge(
+    path: Union[str, Path], embed: Callable[[str], list[float]]
+) -> FlockKnowledge:
+    """The process-wide knowledge index stored at path."""
+    path = Path(path).resolve()
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = FlockKnowledge(path, embed)
+        return _indexes[path]
+
+
+_active: Optional[FlockKnowledge] = None
+
+
+def install_knowledge(index: FlockKnowledge):
+    global _active
+    _active = index
+
+
+def active_knowledge() -> Optional[FlockKnowledge]:
+    return _active
@@ -0,0 +1,279 @@
+"""Agent tree bookkeeping: wall-clock deadlines and cascading cancellation."""
+import ctypes
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+
+class AgentCancelled(BaseException):
+    """Raised inside an agent's interaction loop once it has been cancelled.
+
+    Not an Exception, so Auto-GPT's command error handling does not turn a
+    forced cancellation into a command result (EarlyStop does the same).
+    """
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AgentNode:
+    """One agent in a flock tree."""
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["AgentNode"] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.parent = parent
+        self.children: list[AgentNode] = []
+        # Children and descendants ever spawned, including finished ones
+        self.spawned = 0
+        self.spawned_total = 0
+        # Planning cycles run so far
+        self.cycles = 0
+        # Position among the parent's children, in spawn order
+        self.ordinal = 0
+        # Children ever added, team members included
+        self.added = 0
+        # Depth of a top-level agent in the tree that spawned it remotely
+        self.base_depth = 0
+        self.started_at = time.monotonic()
+
+        # A child can never outlive its parent's deadline, so the tightest of
+        # the inherited, the explicit and the per-agent deadline wins.
+        candidates = [deadline] if deadline else []
+        if timeout:
+            candidates.append(self.started_at + timeout)
+        if parent is not None and parent.deadline:
+            candidates.append(parent.deadline)
+        self.deadline: Optional[float] = min(candidates) if candidates else None
+
+        # The in-process Agent running as this node, for the per-cycle hooks
+        self.agent = None
+        self.thread_id: Optional[int] = None
+        self.cancel_reason: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def root(self) -> "AgentNode":
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    @property
+    def depth(self) -> int:
+        depth, node = 0, self
+        while node.parent is not None:
+            depth, node = depth + 1, node.parent
+        return depth + node.base_depth
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None when unbounded."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def descendants(self) -> list["AgentNode"]:
+        found = []
+        for child in list(self.children):
+            found.append(child)
+            found.extend(child.descendants())
+        return found
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel this agent and every descendant."""
+        for node in [self] + self.descendants():
+            if not node.cancelled:
+                node.cancel_reason = reason
+                node._cancelled.set()
+
+    def stopped(self) -> bool:
+        """Whether the agent has been cancelled, its deadline counting as such."""
+        if not self.cancelled and self.deadline and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self.cancelled
+
+    def check(self):
+        """Cooperative cancellation point, called between cycles."""
+        if self.stopped():
+            raise AgentCancelled(self.cancel_reason)
+
+
+class AgentTree:
+    """Tracks the running agents of a process and enforces their deadlines."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._roots: dict[int, AgentNode] = {}
+        self._nodes: dict[str, AgentNode] = {}
+
+    def _stack(self) -> list[AgentNode]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self) -> Optional[AgentNode]:
+        """The innermost agent running on this thread, if any."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def root_for(
+        self,
+        agent,
+        tree_timeout: Optional[float] = None,
+        depth: int = 0,
+        spawned: int = 0,
+        deadline: Optional[float] = None,
+    ) -> AgentNode:
+        """The node representing a top-level agent, created on first use.
+
+        An agent run on a remote worker is the top-level agent of its process.
+        depth, spawned (the agents its original tree already spawned) and
+        deadline (a time.time() timestamp) carry over its place in that tree.
+        """
+        with self._lock:
+            node = self._roots.get(id(agent))
+            if node is None:
+                if deadline:
+                    deadline = time.monotonic() + deadline - time.time()
+                node = AgentNode(
+                    agent.ai_config.ai_name, timeout=tree_timeout, deadline=deadline
+                )
+                node.base_depth = depth
+                node.spawned_total = spawned
+                self._roots[id(agent)] = node
+                self._nodes[node.id] = node
+            return node
+
+    def spawn(
+        self,
+        name: str,
+        parent: AgentNode,
+        timeout: Optional[float] = None,
+        quotas=None,
+        member: bool = False,
+    ) -> AgentNode:
+        """Add a child under parent, after checking it against the tree quotas.
+
+        Members of a team were counted, and checked, once for the whole team
+        by spawn_team.
+        """
+        with self._lock:
+            if not member:
+                if quotas is not None:
+                    quotas.check(parent)
+                self._count(parent)
+            node = AgentNode(name, parent=parent, timeout=timeout)
+            parent.children.append(node)
+            parent.added += 1
+            node.ordinal = parent.added
+            self._nodes[node.id] = node
+            return node
+
+    def spawn_team(self, parent: AgentNode, size: int, quotas=None):
+        """Count a team of size agents as a single child of parent."""
+        with self._lock:
+            if quotas is not None:
+                quotas.check_team(parent, size)
+            self._count(parent)
+
+    def _count(self, parent: AgentNode):
+        parent.spawned += 1
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.spawned_total += 1
+            ancestor = ancestor.parent
+
+    def get(self, node_id: str) -> Optional[AgentNode]:
+        return self._nodes.get(node_id)
+
+    def find(self, name: str) -> Optional[AgentNode]:
+        with self._lock:
+            return next((n for n in self._nodes.values() if n.name == name), None)
+
+    def cancel(self, node_id: str, reason: str = "cancelled") -> bool:
+        node = self.get(node_id)
+        if node is None:
+            return False
+        node.cancel(reason)
+        return True
+
+    def retire(self, node: AgentNode):
+        with self._lock:
+            self._nodes.pop(node.id, None)
+            if node.parent is not None and node in node.parent.children:
+                node.parent.children.remove(node)
+
+    def checkpoint(self):
+        """Raise AgentCancelled if the current child agent has been cancelled.
+
+        The top-level agent is never interrupted: its deadline only bounds the
+        children it spawns.
+        """
+        node = self.current()
+        if node is not None and node.parent is not None:
+            node.check()
+
+    @contextmanager
+    def running(self, node: AgentNode, grace: float = 30.0):
+        """Run an agent's loop on the current thread under its deadline.
+
+        When the deadline passes the node (and its subtree) is cancelled. A
+        cancelled node gets `grace` seconds to reach a checkpoint. After that
+        AgentCancelled is raised asynchronously in the thread, repeating every
+        `grace` seconds until the loop unwinds.
+        """
+        node.thread_id = threading.get_ident()
+        stack = self._stack()
+        stack.append(node)
+        done = threading.Event()
+        threading.Thread(
+            target=self._watch, args=(node, grace, done), daemon=True
+        ).start()
+        try:
+            yield node
+        finally:
+            with self._lock:
+                done.set()
+                # Drop a forced cancellation that has not been delivered yet.
+                _raise_in_thread(node.thread_id, None)
+            stack.remove(node)
+            self.retire(node)
+
+    def _watch(self, node: AgentNode, grace: float, done: threading.Event):
+        # Wake at the deadline, or shortly after the node is cancelled otherwise
+        while not node.cancelled:
+            remaining = node.remaining()
+            if remaining == 0:
+                node.cancel("deadline exceeded")
+                break
+            if done.wait(min(remaining or 1.0, 1.0)):
+                return
+        while not done.wait(grace):
+            with self._lock:
+                if not done.is_set():
+                    _raise_in_thread(node.thread_id, AgentCancelled)
+
+
+def _raise_in_thread(thread_id: int, exc_type: Optional[type]):
+    """Asynchronously raise exc_type in the given thread (None clears it)."""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id),
+        ctypes.py_object(exc_type) if exc_type is not None else None,
+    )
+
+
+flock_tree = AgentTree()
@@ -0,0 +1,528 @@
+"""Per-agent log streams: a ring buffer in memory, indexed segments on disk.
+
+Every line an agent writes gets a sequence number. Lines are appended to the
+agent's current segment file, `<first sequence number>.log`, and every
+INDEX_EVERY lines the sequence number, byte offset and time are appended to the
+segment's `.idx` file. Tailing reads the ring buffer, or seeks through the
+index, so it costs time in proportion to the lines asked for.
+
+Segments rotate by size and age. Rotated segments are compressed in the
+background (zstd when installed, gzip otherwise) one index block at a time,
+and the index is rewritten with compressed offsets, so any block can still be
+read without decompressing what comes before it. The oldest rotated segments
+are evicted once all logs exceed the disk quota.
+
+    python -m autogpt_dolly_plugin.logmux <workspace>/dolly_logs [name] -n 50 -f
+"""
+import argparse
+import gzip
+import heapq
+import io
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple, Optional, Union
+
+INDEX_EVERY = 64
+# First sequence number of a block of lines, its byte offset and timestamp
+INDEX_RECORD = struct.Struct("<QQd")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class LogLine(NamedTuple):
+    seq: int
+    time: float
+    agent: str
+    stream: str
+    text: str
+
+    def format(self) -> str:
+        stamp = time.strftime("%H:%M:%S", time.localtime(self.time))
+        return f"{stamp} {self.agent} [{self.stream}] {self.text}"
+
+
+def _safe_name(name: str) -> str:
+    return "".join("_" if c in '/\\:*?"<>|' else c for c in name)
+
+
+def _first_seq(path: Path) -> int:
+    return int(path.name.split(".")[0])
+
+
+def _index_path(path: Path) -> Path:
+    """`<first>.idx` for a plain segment, `<first>.gz.idx` for a compressed one."""
+    first, *suffixes = path.name.split(".")
+    return path.with_name(".".join([first, *suffixes[1:], "idx"]))
+
+
+def _index_records(path: Path) -> list[tuple[int, int, float]]:
+    index = _index_path(path)
+    if not index.exists():
+        return []
+    data = index.read_bytes()
+    usable = len(data) - len(data) % INDEX_RECORD.size
+    return list(INDEX_RECORD.iter_unpack(data[:usable]))
+
+
+def _open_at(path: Path, offset: int):
+    """A binary line reader over a segment, starting at an indexed offset."""
+    raw = open(path, "rb")
+    raw.seek(offset)
+    if path.suffix == ".gz":
+        return gzip.GzipFile(fileobj=raw)
+    if path.suffix == ".zst":
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            raw, read_across_frames=True, closefd=True
+        )
+        return io.BufferedReader(reader)
+    return raw
+
+
+def compress_segment(path: Path) -> Path:
+    """Compress a rotated segment block by block and rewrite its index."""
+    records = _index_records(path)
+    if not records:
+        path.unlink(missing_ok=True)
+        _index_path(path).unlink(missing_ok=True)
+        return path
+    if zstandard is not None:
+        suffix, compress = ".zst", zstandard.ZstdCompressor().compress
+    else:
+        suffix, compress = ".gz", gzip.compress
+    data = path.read_bytes()
+    target = path.with_name(path.name + suffix)
+    ends = [record[1] for record in records[1:]] + [len(data)]
+    index = []
+    with open(target.with_name(target.name + ".tmp"), "wb") as out:
+        for (seq, offset, stamp), end in zip(records, ends):
+            index.append(INDEX_RECORD.pack(seq, out.tell(), stamp))
+            out.write(compress(data[offset:end]))
+    # The compressed index goes first, so the segment is never seen without it
+    _index_path(target).write_bytes(b"".join(index))
+    os.replace(target.with_name(target.name + ".tmp"), target)
+    path.unlink()
+    _index_path(path).unlink(missing_ok=True)
+    return target
+
+
+class AgentLog:
+    """The log of one agent.
+
+    Parameters:
+        directory (Path): Where the agent's segments are kept.
+        name (str): The agent's name, stored with every line.
+        ring_size (int): Lines kept in memory for fast tails.
+        max_bytes (int): Size at which the segment rotates (0 never).
+        max_age (float): Seconds after which the segment rotates (0 never).
+        on_rotate (Callable): Receives each rotated segment; compresses it
+            in place when not given.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        name: str,
+        ring_size: int = 1000,
+        max_bytes: int = 0,
+        max_age: float = 0,
+        on_rotate: Optional[Callable[[Path], None]] = None,
+    ):
+        self.directory = Path(directory)
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.on_rotate = on_rotate or compress_segment
+        self.ring: deque[LogLine] = deque(maxlen=ring_size)
+        self._cond = threading.Condition()
+        self._partial: dict[str, str] = {}
+        # Nothing is created on disk until the first write
+        self._segment: Optional[Path] = None
+        self._log = self._index = None
+        self.next_seq = self._disk_next_seq(self.segments())
+
+    # Segments
+
+    def segments(self) -> list[Path]:
+        """Segment files, oldest first; the last one may be being written."""
+        found: dict[int, Path] = {}
+        if not self.directory.is_dir():
+            return []
+        for path in self.directory.glob("*.log*"):
+            if path.suffix == ".tmp":
+                continue
+            # While a segment is being compressed both files exist
+            first = _first_seq(path)
+            if first not in found or found[first].suffix == ".log":
+                found[first] = path
+        return [found[first] for first in sorted(found)]
+
+    def _open_segment(self, path: Optional[Path] = None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if path is None:
+            segments = self.segments()
+            if segments and segments[-1].suffix == ".log":
+                path = segments[-1]
+            else:
+                path = self.directory / f"{self._disk_next_seq(segments):020d}.log"
+        self.next_seq = self._last_seq(path) + 1 if path.exists() else _first_seq(path)
+        self._segment = path
+        self._segment_started = time.time()
+        self._log = open(path, "ab")
+        self._index = open(_index_path(path), "ab")
+
+    def _disk_next_seq(self, segments: list[Path]) -> int:
+        return self._last_seq(segments[-1]) + 1 if segments else 0
+
+    @staticmethod
+    def _last_seq(path: Path) -> int:
+        """The sequence number of the last line in a segment (first - 1 if empty)."""
+        records = _index_records(path)
+        seq, offset = records[-1][:2] if records else (_first_seq(path), 0)
+        with _open_at(path, offset) as segment:
+            return seq + sum(1 for _ in segment) - 1
+
+    def _rotate(self):
+        rotated = self._segment
+        self._log.close()
+        self._index.close()
+        self._open_segment(self.directory / f"{self.next_seq:020d}.log")
+        self.on_rotate(rotated)
+
+    # Writing
+
+    def write(self, stream: str, data: Union[bytes, str]):
+        """Append output; lines are split on newlines, partial lines are held."""
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="replace")
+        with self._cond:
+            if self._log is None:
+                self._open_segment()
+            lines = (self._partial.pop(stream, "") + data).split("\n")
+            if lines[-1]:
+                self._partial[stream] = lines[-1]
+            for text in lines[:-1]:
+                self._append(stream, text.rstrip("\r"))
+            self._log.flush()
+            self._index.flush()
+            if (self.max_bytes and self._log.tell() >= self.max_bytes) or (
+                self.max_age and time.time() - self._segment_started >= self.max_age
+            ):
+                self._rotate()
+            self._cond.notify_all()
+
+    def _append(self, stream: str, text: str):
+        line = LogLine(self.next_seq, time.time(), self.name, stream, text)
+        if (line.seq - _first_seq(self._segment)) % INDEX_EVERY == 0:
+            self._index.write(INDEX_RECORD.pack(line.seq, self._log.tell(), line.time))
+        self._log.write(f"{line.time:.6f}\t{stream}\t{text}\n".encode())
+        self.ring.append(line)
+        self.next_seq += 1
+
+    def close(self):
+        with self._cond:
+            if self._log is None:
+                return
+            for stream in list(self._partial):
+                self._append(stream, self._partial.pop(stream))
+            self._log.close()
+            self._index.close()
+
+    # Reading
+
+    def _parse(self, seq: int, raw: bytes) -> LogLine:
+        stamp, stream, text = raw.decode("utf-8", errors="replace").split("\t", 2)
+        return LogLine(seq, float(stamp), self.name, stream, text.rstrip("\n"))
+
+    def _read_segment(
+        self, path: Path, before: Callable[[tuple], bool]
+    ) -> Iterator[LogLine]:
+        """Lines of a segment from its last index record for which before holds."""
+        for _ in range(2):
+            seq, offset = _first_seq(path), 0
+            for record in _index_records(path):
+                if not before(record):
+                    break
+                seq, offset = record[:2]
+            try:
+                segment = _open_at(path, offset)
+                break
+            except FileNotFoundError:
+                # Compressed meanwhile; evicted segments have no lines left
+                path = next(
+                    (p for p in self.segments() if _first_seq(p) == _first_seq(path)),
+                    None,
+                )
+                if path is None:
+                    return
+        else:
+            return
+        with segment:
+            for raw in segment:
+                yield self._parse(seq, raw)
+                seq += 1
+
+    def read(self, start: int, stop: Optional[int] = None) -> list[LogLine]:
+        """Lines with start <= seq < stop from disk (up to the end without stop)."""
+        segments = self.segments()
+        firsts = [_first_seq(path) for path in segments]
+        lines = []
+        for i, path in enumerate(segments):
+            if i + 1 < len(firsts) and firsts[i + 1] <= start:
+                continue
+            if stop is not None and firsts[i] >= stop:
+                break
+            for line in self._read_segment(path, lambda record: record[0] <= start):
+                if stop is not None and line.seq >= stop:
+                    break
+                if line.seq >= start:
+                    lines.append(line)
+        return lines
+
+    def between(self, since: float, until: Optional[float] = None) -> list[LogLine]:
+        """Lines logged between two times, found through the index timestamps."""
+        segments = self.segments()
+        starts = [_index_records(path)[:1] for path in segments]
+        lines = []
+        for i, path in enumerate(segments):
+            following = starts[i + 1] if i + 1 < len(starts) else None
+            if following and following[0][2] <= since:
+                continue
+            if until is not None and starts[i] and starts[i][0][2] > until:
+                break
+            for line in self._read_segment(path, lambda record: record[2] <= since):
+                if until is not None and line.time > until:
+                    return lines
+                if line.time >= since:
+                    lines.append(line)
+        return lines
+
+    def tail(self, n: int) -> list[LogLine]:
+        with self._cond:
+            if n <= len(self.ring):
+                return list(islice(reversed(self.ring), n))[::-1]
+            stop = self.next_seq
+        return self.read(max(0, stop - n), stop)
+
+    def follow(self, after: int = -1, timeout: Optional[float] = None) -> list[LogLine]:
+        """Lines after sequence number `after`, waiting up to timeout for new ones."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.next_seq > after + 1, timeout)
+            if self.ring and self.ring[0].seq <= after + 1:
+                return [line for line in self.ring if line.seq > after]
+            stop = self.next_seq
+        return self.read(after + 1, stop)
+
+
+class FlockLogHandler(logging.Handler):
+    """Copies log records of in-process child agents into their log.
+
+    Parameters:
+        mux (LogMux): Where the records go.
+        current_agent (Callable): The name of the child running on the calling
+            thread, or None outside children.
+    """
+
+    def __init__(self, mux: "LogMux", current_agent: Callable[[], Optional[str]]):
+        super().__init__(level=logging.INFO)
+        self.mux = mux
+        self.current_agent = current_agent
+
+    def emit(self, record: logging.LogRecord):
+        name = self.current_agent()
+        if name is None or self.mux.root is None:
+            return
+        try:
+            self.mux.write(name, record.levelname.lower(), self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+class LogMux:
+    """The logs of every agent of this process, under one directory."""
+
+    def __init__(self):
+        self.root: Optional[Path] = None
+        self.ring_size = 1000
+        self.max_bytes = 0
+        self.max_age = 0.0
+        self.quota = 0
+        self._logs: dict[str, AgentLog] = {}
+        self._lock = threading.Lock()
+        self._compressor: Optional[ThreadPoolExecutor] = None
+
+    def configure(
+        self,
+        root: Union[str, Path],
+        ring_size: int = 1000,
+        max_bytes: int = 0,
+        max_age: float = 0,
+        quota: int = 0,
+    ):
+        """Set where logs go, their rotation limits and the total disk quota."""
+        self.root = Path(root)
+        self.ring_size = ring_size
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.quota = quota
+
+    def log(self, name: str) -> AgentLog:
+        with self._lock:
+            if name not in self._logs:
+                if self.root is None:
+                    raise RuntimeError("The log multiplexer has no directory yet")
+                self._logs[name] = AgentLog(
+                    self.root / _safe_name(name),
+                    name,
+                    self.ring_size,
+                    max_bytes=self.max_bytes,
+                    max_age=self.max_age,
+                    on_rotate=self._rotated,
+                )
+            return self._logs[name]
+
+    def release(self, name: str):
+        """Close an agent's log; it is reopened from disk if read again."""
+        with self._lock:
+            log = self._logs.pop(name, None)
+        if log is not None:
+            log.close()
+
+    def existing(self, name: str) -> Optional[AgentLog]:
+        """The log of an agent that has logged, without creating one otherwise."""
+        with self._lock:
+            if name in self._logs:
+                return self._logs[name]
+        if self.root is None or not (self.root / _safe_name(name)).is_dir():
+            return None
+        return self.log(name)
+
+    def _rotated(self, path: Path):
+        with self._lock:
+            if self._compressor is None:
+                self._compressor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="dolly-logs"
+                )
+        self._compressor.submit(self._compress, path)
+
+    def _compress(self, path: Path):
+        try:
+            compress_segment(path)
+            self.enforce_quota()
+        except Exception:
+            logging.getLogger(__name__).exception(f"Could not compress {path}")
+
+    def enforce_quota(self) -> int:
+        """Evict the oldest rotated segments while all logs exceed the quota."""
+        if not self.quota or self.root is None:
+            return 0
+        files = [path for path in self.root.glob("*/*") if path.is_file()]
+        total = sum(path.stat().st_size for path in files)
+        current = {log._segment for log in list(self._logs.values())}
+        rotated = [
+            path
+            for path in files
+            if path.suffix in (".log", ".gz", ".zst") and path not in current
+        ]
+        # Agents' segment names only order within an agent, so go by age
+        rotated.sort(key=lambda path: path.stat().st_mtime)
+        evicted = 0
+        for path in rotated:
+            if total <= self.quota:
+                break
+            index = _index_path(path)
+            for victim in (path, index):
+                if victim.exists():
+                    total -= victim.stat().st_size
+                    victim.unlink()
+            evicted += 1
+        return evicted
+
+    def write(self, name: str, stream: str, data: Union[bytes, str]):
+        self.log(name).write(stream, data)
+
+    def tail(self, name: str, n: int = 20) -> list[LogLine]:
+        log = self.existing(name)
+        return log.tail(n) if log is not None else []
+
+    def follow(
+        self, name: str, after: int = -1, timeout: Optional[float] = None
+    ) -> list[LogLine]:
+        return self.log(name).follow(after, timeout)
+
+    def names(self) -> list[str]:
+        """Agents with logs in this process or on disk."""
+        known = set(self._logs)
+        if self.root is not None and self.root.exists():
+            on_disk = {path.name for path in self.root.iterdir() if path.is_dir()}
+            known |= on_disk - {_safe_name(name) for name in known}
+        return sorted(known)
+
+    def merged(self, n: int = 50, names: Optional[list[str]] = None) -> list[LogLine]:
+        """The last n lines across agents, ordered by time."""
+        tails = [self.tail(name, n) for name in names or self.names()]
+        return list(heapq.merge(*tails, key=lambda line: line.time))[-n:]
+
+    def between(
+        self,
+        since: float,
+        until: Optional[float] = None,
+        names: Optional[list[str]] = None,
+    ) -> list[LogLine]:
+        """Lines of every agent between two times, ordered by time."""
+        names = names or self.names()
+        logs = [self.existing(name) for name in names]
+        ranges = [log.between(since, until) for log in logs if log is not None]
+        return list(heapq.merge(*ranges, key=lambda line: line.time))
+
+
+flock_logs = LogMux()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Tail Dolly agent logs.")
+    parser.add_argument("root", help="The dolly_logs directory of a workspace")
+    parser.add_argument("name", nargs="?", help="An agent; all agents when omitted")
+    parser.add_argument("-n", "--lines", type=int, default=20)
+    parser.add_argument("-f", "--follow", action="store_true")
+    parser.add_argument("--since", type=float, help="Unix time to print lines from")
+    parser.add_argument("--until", type=float, help="Unix time to print lines to")
+    args = parser.parse_args(argv)
+
+    mux = LogMux()
+    mux.configure(args.root)
+    if args.since is not None:
+        names = [args.name] if args.name else None
+        for line in mux.between(args.since, args.until, names):
+            print(line.format())
+        return
+    if args.name is None:
+        for line in mux.merged(args.lines):
+            print(line.format())
+        return
+    log = mux.existing(args.name)
+    if log is None:
+        parser.exit(1, f"There is no log for agent '{args.name}'.\n")
+    lines = log.tail(args.lines)
+    after = lines[-1].seq if lines else -1
+    while True:
+        for line in lines:
+            print(line.format(), flush=True)
+        if not args.follow:
+            return
+        time.sleep(0.5)
+        lines = log.read(after + 1)
+        after = lines[-1].seq if lines else after
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Declarative teams: the agents of a flock, their goals and dependencies in one file.
+
+    team: market-study
+    defaults:
+      persona: analyst
+      limits: {timeout: 900, cycles: 20}
+    agents:
+      - name: scraper
+        role: collects product pages
+        goals: [Save the 20 best selling products to products.csv]
+      - name: reporter
+        role: writes market reports
+        goals: [Write report.md from products.csv]
+        depends_on: [scraper]
+        model: gpt-4
+
+Manifests are YAML (or JSON) and are validated as a whole when loaded.
+Provisioning renders every agent's ai_settings.yaml from one compiled template
+and writes the agents' directories on a thread pool. Launching (see
+Shepherd.launch_team) starts each agent as soon as its dependencies finish.
+
+Validate a manifest and provision its agents without running them:
+
+    python -m autogpt_dolly_plugin.manifest team.yaml --workspace auto_gpt_workspace
+"""
+import argparse
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+from .resources import flock_resources
+
+DEFAULT_TEMPLATE = Path(__file__).parent / "resources" / "ai_settings_template.yaml"
+PLACEHOLDER = re.compile(r"<([A-Z_]+)>")
+# Placeholders a team template can use
+FIELDS = ("NAME", "ROLE", "GOALS", "TEAM")
+AGENT_KEYS = {"name", "role", "goals", "persona", "model", "depends_on", "limits"}
+LIMITS = {"timeout": float, "cycles": int}
+NAME_PATTERN = re.compile(r"[A-Za-z0-9][\w.-]*")
+PROVISION_THREADS = 16
+
+
+class ManifestError(ValueError):
+    """A manifest or template that cannot be used; lists every problem found."""
+
+
+class AgentSpec(NamedTuple):
+    name: str
+    role: str
+    goals: tuple[str, ...]
+    persona: str
+    model: Optional[str]
+    depends_on: tuple[str, ...]
+    # Seconds the agent may run for (None: the flock's agent timeout)
+    timeout: Optional[float]
+    # Cycles the agent may run for (None: the parent's continuous limit)
+    cycles: Optional[int]
+
+
+class TeamManifest(NamedTuple):
+    team: str
+    # In dependency order: every agent comes after the agents it depends on
+    agents: list[AgentSpec]
+
+    def get(self, name: str) -> AgentSpec:
+        return next(spec for spec in self.agents if spec.name == name)
+
+
+def _read(path: Path) -> dict:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return json.loads(text)
+    try:
+        import yaml
+    except ImportError:
+        raise ManifestError("PyYAML is needed for YAML manifests")
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ManifestError(str(e)) from e
+
+
+def _limits(where: str, limits, errors: list[str]) -> dict:
+    if not isinstance(limits, dict):
+        errors.append(f"{where}: limits must be a mapping")
+        return {}
+    parsed = {}
+    for key, value in limits.items():
+        if key not in LIMITS:
+            errors.append(f"{where}: unknown limit '{key}' ({', '.join(LIMITS)})")
+            continue
+        try:
+            parsed[key] = LIMITS[key](value)
+        except (TypeError, ValueError):
+            errors.append(f"{where}: limit '{key}' must be a number")
+    return parsed
+
+
+def _dependency_order(specs: list[AgentSpec], errors: list[str]) -> list[AgentSpec]:
+    """Every spec after its dependencies, keeping the manifest order otherwise."""
+    ordered, placed = [], set()
+    pending = list(specs)
+    while pending:
+        ready = [spec for spec in pending if placed.issuperset(spec.depends_on)]
+        if not ready:
+            errors.append(
+                "dependency cycle between "
+                + ", ".join(sorted(spec.name for spec in pending))
+            )
+            break
+        ordered.extend(ready)
+        placed.update(spec.name for spec in ready)
+        pending = [spec for spec in pending if spec.name not in placed]
+    return ordered
+
+
+def parse_manifest(document: dict) -> TeamManifest:
+    """Validate a manifest document; raises ManifestError with every problem."""
+    if not isinstance(document, dict):
+        raise ManifestError("a manifest must be a mapping")
+    errors = []
+    team = str(document.get("team") or "team")
+    if not NAME_PATTERN.fullmatch(team):
+        errors.append(f"team '{team}': use letters, digits, '.', '_', '-'")
+    defaults = document.get("defaults") or {}
+    if not isinstance(defaults, dict):
+        errors.append("defaults must be a mapping")
+        defaults = {}
+    default_limits = _limits("defaults", defaults.get("limits") or {}, errors)
+    entries = document.get("agents")
+    if not isinstance(entries, list) or not entries:
+        raise ManifestError("a manifest needs a non-empty list of agents")
+
+    specs, names = [], set()
+    for index, entry in enumerate(entries):
+        where = f"agents[{index}]"
+        if not isinstance(entry, dict):
+            errors.append(f"{where}: must be a mapping")
+            continue
+        name = str(entry.get("name") or "")
+        where = f"agent '{name}'" if name else where
+        if not NAME_PATTERN.fullmatch(name):
+            errors.append(f"{where}: needs a name of letters, digits, '.', '_', '-'")
+        elif name in names:
+            errors.append(f"{where}: listed twice")
+        names.add(name)
+        unknown = set(entry) - AGENT_KEYS
+        if unknown:
+            errors.append(f"{where}: unknown keys {', '.join(sorted(unknown))}")
+
+        goals = entry.get("goals")
+        if isinstance(goals, str):
+            goals = [goals]
+        if not isinstance(goals, list) or not goals:
+            errors.append(f"{where}: needs at least one goal")
+            goals = []
+        elif not all(isinstance(goal, str) and goal.strip() for goal in goals):
+            errors.append(f"{where}: goals must be non-empty strings")
+        depends_on = entry.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        limits = {
+            **default_limits,
+            **_limits(where, entry.get("limits") or {}, errors),
+        }
+        specs.append(
+            AgentSpec(
+                name=name,
+                role=str(entry.get("role") or defaults.get("role") or ""),
+                goals=tuple(str(goal) for goal in goals),
+                persona=str(entry.get("persona") or defaults.get("persona") or ""),
+                model=entry.get("model") or defaults.get("model"),
+                depends_on=tuple(str(dependency) for dependency in depends_on),
+                timeout=limits.get("timeout"),
+                cycles=limits.get("cycles"),
+            )
+        )
+
+    for spec in specs:
+        for dependency in spec.depends_on:
+            if dependency == spec.name:
+                errors.append(f"agent '{spec.name}': depends on itself")
+            elif dependency not in names:
+                errors.append(f"agent '{spec.name}': unknown dependency '{dependency}'")
+    if not errors:
+        specs = _dependency_order(specs, errors)
+    if errors:
+        raise ManifestError("; ".join(errors))
+    return TeamManifest(team, specs)
+
+
+def load_manifest(path: Union[str, Path]) -> TeamManifest:
+    path = Path(path)
+    try:
+        document = _read(path)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"{path}: {e}") from e
+    try:
+        return parse_manifest(document)
+    except ManifestError as e:
+        raise ManifestError(f"{path}: {e}") from None
+
+
+class SettingsTemplate:
+    """An ai_settings template with <FIELD> placeholders, parsed once.
+
+    Values are written as JSON strings, which are valid YAML scalars whatever
+    they contain.
+    """
+
+    def __init__(self, text: str):
+        # Literal text at even indexes, placeholder names at odd ones
+        self._parts = PLACEHOLDER.split(text)
+        unknown = set(self._parts[1::2]) - set(FIELDS)
+        if unknown:
+            raise ManifestError(
+                f"unknown template placeholders: {', '.join(sorted(unknown))}"
+                f" (use {', '.join(FIELDS)})"
+            )
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = DEFAULT_TEMPLATE) -> "SettingsTemplate":
+        """The template in path, compiled once per process."""
+        path = Path(path).resolve()
+        return flock_resources.get(
+            ("settings_template", str(path)),
+            lambda: cls(path.read_text(encoding="utf-8")),
+        )
+
+    def render(self, spec: AgentSpec, team: str = "") -> str:
+        values = {
+            "NAME": json.dumps(spec.name),
+            "ROLE": json.dumps(spec.role),
+            "GOALS": "\n".join(f"- {json.dumps(goal)}" for goal in spec.goals),
+            "TEAM": json.dumps(team),
+        }
+        parts = list(self._parts)
+        parts[1::2] = [values[field] for field in parts[1::2]]
+        return "".join(parts)
+
+
+def provision(
+    manifest: TeamManifest,
+    root: Union[str, Path],
+    template: Optional[SettingsTemplate] = None,
+) -> dict[str, Path]:
+    """Write each agent's directory and settings under root/<team>/<agent>.
+
+    Returns the settings file of each agent, by name.
+    """
+    template = template or SettingsTemplate.load()
+    team_dir = Path(root) / manifest.team
+    rendered = {
+        spec.name: template.render(spec, manifest.team) for spec in manifest.agents
+    }
+
+    def write(name: str) -> Path:
+        home = team_dir / name
+        home.mkdir(parents=True, exist_ok=True)
+        settings = home / "ai_settings.yaml"
+        settings.write_text(rendered[name], encoding="utf-8")
+        return settings
+
+    with ThreadPoolExecutor(
+        max_workers=min(PROVISION_THREADS, len(rendered)),
+        thread_name_prefix="dolly-provision",
+    ) as pool:
+        return dict(zip(rendered, pool.map(write, rendered)))
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Validate a Dolly team manifest and provision its agents."
+    )
+    parser.add_argument("manifest", type=Path)
+    parser.add_argument("--workspace", type=Path, help="Write the agents' settings")
+    parser.add_argument("--template", type=Path, default=DEFAULT_TEMPLATE)
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = load_manifest(args.manifest)
+        template = SettingsTemplate.load(args.template)
+    except (ManifestError, OSError) as e:
+        parser.exit(1, f"Invalid manifest: {e}\n")
+    for spec in manifest.agents:
+        after = f" after {', '.join(spec.depends_on)}" if spec.depends_on else ""
+        print(f"{spec.name}{after}")
+    if args.workspace:
+        settings = provision(manifest, args.workspace, template)
+        team_dir = args.workspace / manifest.team
+        print(f"\nProvisioned {len(settings)} agents in {team_dir}")
+
+
+if __name__ == "__main__":
+    main()
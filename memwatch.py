@@ -0,0 +1,128 @@
+"""Memory accounting for in-process child agents.
+
+A tracemalloc snapshot is taken before a child starts and after it has been
+torn down. Their difference is the memory the spawn left behind. Objects
+handed to `track` (the child's Agent, its Config copy and its memory backend)
+should be unreachable once the child is torn down. Any that survive are
+reported with the types of the objects still referring to them.
+
+Children running at the same time allocate into the same snapshots, so the
+retained memory is exact when children run one at a time, and an upper
+bound otherwise.
+"""
+import gc
+import logging
+import threading
+import tracemalloc
+import types
+import weakref
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tracemalloc's own bookkeeping and the import system are noise here
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class SpawnReport(NamedTuple):
+    name: str
+    # Net growth of traced memory from before the spawn to after its teardown
+    retained_bytes: int
+    # "file:line: +size" for the largest retained allocation sites
+    top: list[str]
+    # Tracked objects still alive after teardown, with their referrers' types
+    survivors: list[str]
+
+
+def _referrers(obj, limit: int = 5) -> str:
+    kinds = [
+        type(referrer).__name__
+        for referrer in gc.get_referrers(obj)
+        if not isinstance(referrer, (weakref.ReferenceType, types.FrameType))
+    ]
+    return ", ".join(sorted(set(kinds))[:limit]) or "nothing"
+
+
+class MemoryAccountant:
+    """Attributes the memory retained after each child's exit to its spawn.
+
+    Parameters:
+        frames (int): Traceback depth tracemalloc records per allocation.
+        top (int): Allocation sites listed per report.
+    """
+
+    def __init__(self, frames: int = 1, top: int = 5):
+        self.frames = frames
+        self.top = top
+        self.reports: list[SpawnReport] = []
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, tracemalloc.Snapshot] = {}
+        self._tracked: dict[str, list[tuple[str, weakref.ref]]] = {}
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def before(self, node):
+        """Start accounting for a child, before anything is built for it."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        gc.collect()
+        snapshot = self._snapshot()
+        with self._lock:
+            self._snapshots[node.id] = snapshot
+            self._tracked[node.id] = []
+
+    def track(self, node, **objects):
+        """Objects of the child that its teardown must release, by label."""
+        with self._lock:
+            tracked = self._tracked.setdefault(node.id, [])
+            for label, obj in objects.items():
+                try:
+                    tracked.append((label, weakref.ref(obj)))
+                except TypeError:
+                    logger.debug(f"Dolly: cannot watch {label} of {node.name}")
+
+    def after(self, node) -> Optional[SpawnReport]:
+        """Finish accounting for a child, after its teardown."""
+        with self._lock:
+            before = self._snapshots.pop(node.id, None)
+            tracked = self._tracked.pop(node.id, [])
+        if before is None:
+            return None
+        gc.collect()
+        stats = self._snapshot().compare_to(before, "lineno")
+        retained = [stat for stat in stats if stat.size_diff > 0]
+        survivors = []
+        for label, ref in tracked:
+            obj = ref()
+            if obj is not None:
+                survivors.append(f"{label} (held by {_referrers(obj)})")
+            del obj
+
+        report = SpawnReport(
+            name=node.name,
+            retained_bytes=sum(stat.size_diff for stat in stats),
+            top=[
+                f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}:"
+                f" +{stat.size_diff / 1024:.1f} KiB"
+                for stat in retained[: self.top]
+            ],
+            survivors=survivors,
+        )
+        with self._lock:
+            self.reports.append(report)
+        log = logger.warning if survivors else logger.info
+        log(
+            f"Dolly: {node.name} left {report.retained_bytes / 1024:.1f} KiB behind"
+            + (f", still alive: {'; '.join(survivors)}" if survivors else "")
+        )
+        return report
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -110,6 +110,25 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
             os.getenv("DOLLY_ENABLE_NEW_TERMINAL_EXPERIMENT", "False") == "True"
         )
 
+        # Per-child resource limits (0 disables).
+        # CPU time in seconds, address space in MB and open files are applied as
+        # rlimits. If a cgroup v2 directory is given, each clone is placed in its
+        # own group underneath it, with memory.max set from the memory limit.
+        self.child_cpu_seconds = int(os.getenv("DOLLY_CHILD_CPU_SECONDS", "0"))
+        self.child_memory_mb = int(os.getenv("DOLLY_CHILD_MEMORY_MB", "0"))
+        self.child_max_files = int(os.getenv("DOLLY_CHILD_MAX_FILES", "0"))
+        self.child_cgroup = os.getenv("DOLLY_CHILD_CGROUP", "")
+
+        # Runaway watchdog (0 disables a check).
+        # Samples each clone's RSS and CPU every interval, and kills or pauses
+        # (DOLLY_WATCHDOG_ACTION=kill|pause) any clone above the ceilings.
+        self.watchdog_interval = float(os.getenv("DOLLY_WATCHDOG_INTERVAL", "5"))
+        self.watchdog_max_rss_mb = int(os.getenv("DOLLY_WATCHDOG_MAX_RSS_MB", "0"))
+        self.watchdog_max_cpu_percent = float(
+            os.getenv("DOLLY_WATCHDOG_MAX_CPU_PERCENT", "0")
+        )
+        self.watchdog_action = os.getenv("DOLLY_WATCHDOG_ACTION", "kill")
+
         # Print out a summary of the settings
         print(f"Auto-GPT Dolly Plugin Settings (v {self._version}):")
         print("==============================================")
@@ -125,6 +144,11 @@ class AutoGPTDollyPlugin(AutoGPTPluginTemplate):
         print(
             f"  - Separate Instructions Per Agent: {'Configured (See .env)' if self.separate_instructions else 'None'}"
         )
+        print(
+            f"  - Child Limits: cpu={self.child_cpu_seconds or '-'}s,"
+            f" mem={self.child_memory_mb or '-'}MB, files={self.child_max_files or '-'},"
+            f" cgroup={self.child_cgroup or '-'}"
+        )
 
     def post_prompt(self, prompt: PromptGenerator) -> PromptGenerator:
         """
@@ -2,6 +2,8 @@ import logging
 import os
 import platform
 import subprocess
+import threading
+import uuid
 from pathlib import Path
 
 try:
@@ -13,6 +15,8 @@ except ImportError:
 
 
 from . import AutoGPTDollyPlugin
+from ..logmux import flock_logs
+from .governor import ResourceLimits
 
 plugin = AutoGPTDollyPlugin()
 cfg = Config()
@@ -33,6 +37,7 @@ class Dolly:
         character_attributes: list[str] = ["helpful", "encouraging", "accurate"],
     ):
         # Attributes
+        self.id = uuid.uuid4().hex[:12]
         self.name = name
         self.role = role
         self.goals = goals
@@ -42,6 +47,8 @@ class Dolly:
         self.character_attributes = character_attributes
         self.workspace_path = Path(cfg.workspace_path)
         self.settings_filepath = None 
+        self.status = "created"
+        self.stop_reason = None
 
         # Flags to track if we've been dispersed yet.
         self._process: subprocess.Popen = None
@@ -233,17 +240,31 @@ class Dolly:
         self._shell_cmd = cmd
         self._shell_env_vars = env_vars
 
-        stdout_file = self.workspace_path / self.name / "output.txt"
-        stderr_file = self.workspace_path / self.name / "error.txt"
-
-        # stdout_file = subprocess.PIPE
-        # stderr_file = subprocess.PIPE
-
         print(f"Dolly: Running Command: {' '.join(cmd)}")
         print(
             f"Dolly: Environment Variables: {', '.join(f'{k}={v}' for k, v in env_vars.items())}"
         )
-        with open(stdout_file, "w") as fout, open(stderr_file, "w") as ferr:
-            self.process = subprocess.Popen(
-                cmd, stdin=subprocess.PIPE, stdout=fout, stderr=ferr, env=env_vars
-            )
+        limits = ResourceLimits.from_plugin(plugin)
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env_vars,
+        )
+        limits.apply(self.process.pid)
+        limits.place_in_cgroup(self.process.pid, self.name)
+        # Both streams go to the clone's log, see logmux.py
+        if flock_logs.root is None:
+            flock_logs.configure(self.workspace_path / "dolly_logs")
+        streams = (("stdout", self.process.stdout), ("stderr", self.process.stderr))
+        for stream, pipe in streams:
+            threading.Thread(
+                target=self._pump, args=(stream, pipe), daemon=True
+            ).start()
+        self.status = "running"
+
+    def _pump(self, stream: str, pipe):
+        for chunk in iter(lambda: pipe.read1(65536), b""):
+            flock_logs.write(self.name, stream, chunk)
+        pipe.close()
@@ -1,8 +1,13 @@
 import logging
+import threading
+from pathlib import Path
 
 from autogpt.singleton import Singleton
 
-from .dolly import Dolly
+from ..events import FAILED, REQUESTED, STARTED, flock_events
+from ..registry import FlockRegistry, get_registry
+from .dolly import Dolly, cfg, plugin
+from .governor import Watchdog
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +16,13 @@ class Flock(metaclass=Singleton):
     def __init__(self, max_size: int = 0):
         self._max_size: int = max_size
         self._members: list[Dolly] = []
+        self._watchdog: Watchdog = None
+        self._lock = threading.RLock()
+        self.registry: FlockRegistry = get_registry(
+            Path(cfg.workspace_path) / "dolly_flock.sqlite3"
+        )
+        if flock_events.path is None:
+            flock_events.configure(Path(cfg.workspace_path) / "dolly_events.jsonl")
 
     @property
     def max_size(self):
@@ -28,22 +40,65 @@ class Flock(metaclass=Singleton):
         return len(self._members)
 
     def add_member(self, member: Dolly):
-        if member.index is not None:
-            raise ValueError("Member already in a flock.")
+        with self._lock:
+            if member.index is not None:
+                raise ValueError("Member already in a flock.")
 
-        if self.size == self.max_size:
-            raise ValueError("Max flock size reached.")
+            if self.size == self.max_size:
+                raise ValueError("Max flock size reached.")
 
-        member.index = self.size
-        self._members.append(member)
+            member.index = self.size
+            self._members.append(member)
+            self.registry.register(member.id, member.name)
+            flock_events.emit(
+                REQUESTED, member.id, name=member.name, goals=member.goals
+            )
 
     def disperse(self):
         pids = []
-        for member in self._members:
-            if not member.dispersed:
-                try:
-                    pid = member.disperse()
-                    pids.append(pid)
-                except:
-                    logger.exception(f"Failed to deploy {member.name}")
+        with self._lock:
+            pending = [member for member in self._members if not member.dispersed]
+        for member in pending:
+            try:
+                pid = member.disperse()
+                pids.append(pid)
+            except:
+                logger.exception(f"Failed to deploy {member.name}")
+                self.registry.update(member.id, status="failed", reason="deploy failed")
+                flock_events.emit(FAILED, member.id, reason="deploy failed")
+                continue
+            self.registry.update(
+                member.id,
+                status="running",
+                pid=pid,
+                result=str(member.workspace_path / member.name),
+            )
+            flock_events.emit(
+                STARTED,
+                member.id,
+                name=member.name,
+                pid=pid,
+                command=getattr(member, "_shell_cmd", None),
+            )
+            if member.process is not None:
+                self.watchdog.watch(member)
         return pids
+
+    def find(self, name: str) -> list[dict]:
+        """Registry records of members with this name, across restarts."""
+        return self.registry.find(name)
+
+    @property
+    def watchdog(self) -> Watchdog:
+        if self._watchdog is None:
+            self._watchdog = Watchdog.from_plugin(plugin, on_breach=self.record_stop)
+            if self._watchdog.enabled:
+                self._watchdog.start()
+        return self._watchdog
+
+    def record_stop(self, member: Dolly, reason: str):
+        member.status = "paused" if self.watchdog.action == "pause" else "killed"
+        member.stop_reason = reason
+        self.registry.update(member.id, status=member.status, reason=reason)
+        flock_events.emit(member.status, member.id, reason=reason)
+        logger.warning(f"Flock member {member.name} {member.status}: {reason}")
@@ -0,0 +1,232 @@
+import logging
+import os
+import signal
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class ResourceLimits:
+    """Per-child limits, applied with rlimits and optionally a cgroup v2 group."""
+
+    def __init__(
+        self,
+        cpu_seconds: int = 0,
+        memory_mb: int = 0,
+        max_files: int = 0,
+        cgroup_root: str = "",
+    ):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_files = max_files
+        self.cgroup_root = cgroup_root
+
+    @classmethod
+    def from_plugin(cls, plugin) -> "ResourceLimits":
+        return cls(
+            cpu_seconds=plugin.child_cpu_seconds,
+            memory_mb=plugin.child_memory_mb,
+            max_files=plugin.child_max_files,
+            cgroup_root=plugin.child_cgroup,
+        )
+
+    @property
+    def rlimits(self) -> dict[int, int]:
+        if resource is None:
+            return {}
+        limits = {}
+        if self.cpu_seconds:
+            limits[resource.RLIMIT_CPU] = self.cpu_seconds
+        if self.memory_mb:
+            limits[resource.RLIMIT_AS] = self.memory_mb * MB
+        if self.max_files:
+            limits[resource.RLIMIT_NOFILE] = self.max_files
+        return limits
+
+    def apply(self, pid: int) -> bool:
+        """Apply the rlimits to a started child; False where that is unsupported.
+
+        Setting them from outside with prlimit(2) avoids a preexec_fn, which is
+        unsafe once the plugin has threads running.
+        """
+        limits = self.rlimits
+        if not limits:
+            return True
+        if not hasattr(resource, "prlimit"):
+            logger.warning("Dolly: per-child rlimits need Linux, not applying them")
+            return False
+        for limit, value in limits.items():
+            _, hard = resource.prlimit(pid, limit)
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            resource.prlimit(pid, limit, (value, hard))
+        return True
+
+    def place_in_cgroup(self, pid: int, name: str) -> Optional[Path]:
+        """Move a child into its own cgroup v2 group under cgroup_root."""
+        if not self.cgroup_root:
+            return None
+        group = Path(self.cgroup_root) / "".join(
+            c if c.isalnum() or c in "-_." else "_" for c in name
+        )
+        try:
+            group.mkdir(parents=True, exist_ok=True)
+            if self.memory_mb:
+                (group / "memory.max").write_text(str(self.memory_mb * MB))
+            (group / "cgroup.procs").write_text(str(pid))
+        except OSError:
+            logger.exception(f"Could not place PID {pid} in cgroup {group}")
+            return None
+        return group
+
+
+class ProcessSample:
+    def __init__(self, rss_bytes: int, cpu_seconds: float):
+        self.rss_bytes = rss_bytes
+        self.cpu_seconds = cpu_seconds
+
+
+def sample_process(pid: int) -> Optional[ProcessSample]:
+    """Current RSS and total CPU time of a process, or None if it is gone."""
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            times = proc.cpu_times()
+            return ProcessSample(proc.memory_info().rss, times.user + times.system)
+        except psutil.Error:
+            return None
+
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    # Fields after the parenthesised command name; utime and stime are 14 and 15
+    fields = stat.rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+    rss_kb = next(
+        (
+            int(line.split()[1])
+            for line in status.splitlines()
+            if line.startswith("VmRSS:")
+        ),
+        0,
+    )
+    return ProcessSample(rss_kb * 1024, cpu_seconds)
+
+
+class Watchdog(threading.Thread):
+    """Samples every watched child and stops any that breaches the policy.
+
+    Parameters:
+        interval (float): Seconds between samples.
+        max_rss_mb (int): RSS ceiling per child, 0 to disable.
+        max_cpu_percent (float): CPU ceiling per child per interval, 0 to disable.
+        action (str): "kill" to terminate a runaway child, "pause" to SIGSTOP it.
+        on_breach (callable): Called with (member, reason) after acting.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        max_rss_mb: int = 0,
+        max_cpu_percent: float = 0,
+        action: str = "kill",
+        on_breach: Optional[Callable] = None,
+    ):
+        super().__init__(name="dolly-watchdog", daemon=True)
+        if action not in ("kill", "pause"):
+            raise ValueError(f"Unknown watchdog action: {action}")
+        self.interval = interval
+        self.max_rss_mb = max_rss_mb
+        self.max_cpu_percent = max_cpu_percent
+        self.action = action
+        self.on_breach = on_breach
+        self._members = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_plugin(cls, plugin, on_breach: Optional[Callable] = None) -> "Watchdog":
+        return cls(
+            interval=plugin.watchdog_interval,
+            max_rss_mb=plugin.watchdog_max_rss_mb,
+            max_cpu_percent=plugin.watchdog_max_cpu_percent,
+            action=plugin.watchdog_action,
+            on_breach=on_breach,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_rss_mb or self.max_cpu_percent)
+
+    def watch(self, member):
+        with self._lock:
+            self._members[member.process.pid] = (member, None)
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                watched = list(self._members.items())
+            for pid, (member, previous) in watched:
+                self._check(pid, member, previous)
+
+    def _check(self, pid: int, member, previous: Optional[ProcessSample]):
+        if member.process.poll() is not None:
+            with self._lock:
+                self._members.pop(pid, None)
+            return
+
+        sample = sample_process(pid)
+        if sample is None:
+            return
+        with self._lock:
+            self._members[pid] = (member, sample)
+
+        reason = None
+        if self.max_rss_mb and sample.rss_bytes > self.max_rss_mb * MB:
+            reason = f"rss {sample.rss_bytes // MB}MB > {self.max_rss_mb}MB"
+        elif self.max_cpu_percent and previous is not None:
+            cpu_percent = (
+                100 * (sample.cpu_seconds - previous.cpu_seconds) / self.interval
+            )
+            if cpu_percent > self.max_cpu_percent:
+                reason = f"cpu {cpu_percent:.0f}% > {self.max_cpu_percent:.0f}%"
+
+        if reason:
+            self._enforce(pid, member, reason)
+
+    def _enforce(self, pid: int, member, reason: str):
+        logger.warning(f"Dolly watchdog: {self.action} {member.name} ({pid}): {reason}")
+        with self._lock:
+            self._members.pop(pid, None)
+        if self.action == "pause":
+            os.kill(pid, signal.SIGSTOP)
+        else:
+            member.process.terminate()
+            try:
+                member.process.wait(timeout=self.interval)
+            except subprocess.TimeoutExpired:
+                member.process.kill()
+        if self.on_breach:
+            verb = "paused" if self.action == "pause" else "killed"
+            self.on_breach(member, f"{verb} by watchdog: {reason}")
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt_dolly_plugin.old.governor import ResourceLimits, Watchdog, resource
+
+CHILD = (
+    "import resource, sys; sys.stdin.readline();"
+    " print(resource.getrlimit(resource.RLIMIT_NOFILE)[0])"
+)
+
+
+@pytest.mark.skipif(not hasattr(resource, "prlimit"), reason="prlimit needs Linux")
+def test_rlimits_are_applied_to_a_started_child():
+    limits = ResourceLimits(max_files=64)
+    process = subprocess.Popen(
+        [sys.executable, "-c", CHILD],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert limits.apply(process.pid)
+    output, _ = process.communicate("go\n", timeout=30)
+    assert int(output) == 64
+
+
+def test_watchdog_stops_a_child_over_its_rss_ceiling():
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    member = SimpleNamespace(name="runaway", process=process)
+    breached = threading.Event()
+    reasons = []
+
+    def on_breach(breaching, reason):
+        reasons.append((breaching.name, reason))
+        breached.set()
+
+    watchdog = Watchdog(interval=0.05, max_rss_mb=1, on_breach=on_breach)
+    watchdog.watch(member)
+    watchdog.start()
+    try:
+        assert breached.wait(10)
+    finally:
+        watchdog.stop()
+        process.kill()
+    assert process.wait(timeout=10) is not None
+    assert reasons[0][0] == "runaway"
+    assert reasons[0][1].startswith("killed by watchdog: rss")
@@ -0,0 +1,61 @@
+"""Tree-aware limits on how many agents a flock may spawn."""
+from .lifecycle import AgentNode
+
+
+class QuotaExceeded(Exception):
+    """Raised instead of spawning an agent that would break a tree quota."""
+
+
+class TreeQuotas:
+    """Limits checked before a child agent is built (0 disables a limit).
+
+    Parameters:
+        max_depth (int): How deep below the top-level agent children may nest.
+        max_descendants (int): Total agents ever spawned under one top-level agent.
+        max_fanout (int): Total children ever spawned by a single agent.
+        max_team_size (int): Agents in a single team. A team counts as one child
+            of the agent launching it, towards max_fanout and max_descendants.
+    """
+
+    def __init__(
+        self,
+        max_depth: int = 0,
+        max_descendants: int = 0,
+        max_fanout: int = 0,
+        max_team_size: int = 0,
+    ):
+        self.max_depth = max_depth
+        self.max_descendants = max_descendants
+        self.max_fanout = max_fanout
+        self.max_team_size = max_team_size
+
+    @classmethod
+    def from_plugin(cls, plugin) -> "TreeQuotas":
+        return cls(
+            max_depth=getattr(plugin, "max_depth", 0),
+            max_descendants=getattr(plugin, "max_descendants", 0),
+            max_fanout=getattr(plugin, "max_fanout", 0),
+            max_team_size=getattr(plugin, "max_team_size", 0),
+        )
+
+    def check(self, parent: AgentNode):
+        """Raise QuotaExceeded if parent may not spawn another child."""
+        if self.max_depth and parent.depth + 1 > self.max_depth:
+            raise QuotaExceeded(
+                f"agents may only be nested {self.max_depth} levels deep"
+            )
+        if self.max_fanout and parent.spawned >= self.max_fanout:
+            raise QuotaExceeded(
+                f"'{parent.name}' already spawned its {self.max_fanout} agents"
+            )
+        root = parent.root
+        if self.max_descendants and root.spawned_total >= self.max_descendants:
+            raise QuotaExceeded(
+                f"this agent tree already spawned its {self.max_descendants} agents"
+            )
+
+    def check_team(self, parent: AgentNode, size: int):
+        """Raise QuotaExceeded if parent may not launch a team of size agents."""
+        if self.max_team_size and size > self.max_team_size:
+            raise QuotaExceeded(f"teams may have at most {self.max_team_size} agents")
+        self.check(parent)
@@ -0,0 +1,247 @@
+"""Persistent, concurrency-safe registry of flock members backed by SQLite."""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+ACTIVE_STATUSES = ("requested", "running", "paused")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    name TEXT NOT NULL,
+    persona TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL,
+    reason TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS agents_status ON agents (status);
+CREATE INDEX IF NOT EXISTS agents_parent_status ON agents (parent_id, status);
+CREATE INDEX IF NOT EXISTS agents_name ON agents (name);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    agent_id TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waits (
+    waiter_id TEXT PRIMARY KEY,
+    agent_id TEXT NOT NULL
+);
+"""
+
+
+class FlockRegistry:
+    """Agents of every flock, keyed by id and indexed by status, parent and name.
+
+    The database runs in WAL mode so that several processes (a parent and its
+    subprocess clones) can read while one writes. Each thread gets its own
+    connection.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def register(
+        self,
+        agent_id: str,
+        name: str,
+        parent_id: Optional[str] = None,
+        persona: str = "",
+        status: str = "requested",
+        pid: Optional[int] = None,
+    ) -> dict:
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO agents"
+            " (id, parent_id, name, persona, status, pid, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (agent_id, parent_id, name, persona or "", status, pid, now, now),
+        )
+        return self.get(agent_id)
+
+    def update(
+        self,
+        agent_id: str,
+        status: Optional[str] = None,
+        pid: Optional[int] = None,
+        reason: Optional[str] = None,
+        result: Optional[str] = None,
+    ):
+        """Record a status change; started_at and finished_at are set on the way."""
+        now = time.time()
+        fields = {"updated_at": now}
+        if status is not None:
+            fields["status"] = status
+            if status == "running":
+                fields["started_at"] = now
+            elif status not in ACTIVE_STATUSES:
+                fields["finished_at"] = now
+        for key, value in (("pid", pid), ("reason", reason), ("result", result)):
+            if value is not None:
+                fields[key] = value
+
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._connection().execute(
+            f"UPDATE agents SET {assignments} WHERE id = ?",
+            (*fields.values(), agent_id),
+        )
+
+    def _query(self, where: str = "", params: tuple = ()) -> list[dict]:
+        sql = "SELECT * FROM agents"
+        if where:
+            sql += f" WHERE {where}"
+        rows = self._connection().execute(sql + " ORDER BY created_at", params)
+        return [dict(row) for row in rows]
+
+    def get(self, agent_id: str) -> Optional[dict]:
+        rows = self._query("id = ?", (agent_id,))
+        return rows[0] if rows else None
+
+    def find(self, name: str) -> list[dict]:
+        return self._query("name = ?", (name,))
+
+    def by_status(self, *statuses: str) -> list[dict]:
+        marks = ", ".join("?" * len(statuses))
+        return self._query(f"status IN ({marks})", statuses)
+
+    def children(self, parent_id: str, *statuses: str) -> list[dict]:
+        if not statuses:
+            return self._query("parent_id = ?", (parent_id,))
+        marks = ", ".join("?" * len(statuses))
+        return self._query(
+            f"parent_id = ? AND status IN ({marks})", (parent_id, *statuses)
+        )
+
+    def tree(self, agent_id: str) -> list[str]:
+        """Ids of every agent in the same tree as agent_id, top-level agent included."""
+        rows = self._connection().execute(
+            "WITH RECURSIVE"
+            " up(id, parent_id) AS ("
+            "  SELECT id, parent_id FROM agents WHERE id = ?"
+            "  UNION SELECT agents.id, agents.parent_id FROM agents"
+            "  JOIN up ON agents.id = up.parent_id),"
+            " down(id) AS ("
+            "  SELECT id FROM up WHERE parent_id IS NULL"
+            "  UNION SELECT agents.id FROM agents"
+            "  JOIN down ON agents.parent_id = down.id)"
+            " SELECT id FROM down",
+            (agent_id,),
+        )
+        return [row[0] for row in rows]
+
+    def running_children(self, parent_id: str) -> list[dict]:
+        return self.children(parent_id, "running")
+
+    def active(self) -> list[dict]:
+        return self.by_status(*ACTIVE_STATUSES)
+
+    def latencies(self, limit: int = 100) -> list[float]:
+        """Run times of the most recently finished agents, in seconds."""
+        rows = self._connection().execute(
+            "SELECT finished_at - started_at FROM agents"
+            " WHERE status = 'finished' AND started_at IS NOT NULL"
+            " ORDER BY finished_at DESC LIMIT ?",
+            (limit,),
+        )
+        return [row[0] for row in rows]
+
+    def set_fingerprint(self, agent_id: str, signature: str):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO fingerprints VALUES (?, ?)", (agent_id, signature)
+        )
+
+    def fingerprinted(self, finished_since: float) -> list[dict]:
+        """Active agents and those finished since then, with their goal signature."""
+        marks = ", ".join("?" * len(ACTIVE_STATUSES))
+        rows = self._connection().execute(
+            "SELECT agents.*, fingerprints.signature FROM agents"
+            " JOIN fingerprints ON fingerprints.agent_id = agents.id"
+            f" WHERE agents.status IN ({marks})"
+            " OR (agents.status = 'finished' AND agents.finished_at >= ?)"
+            " ORDER BY agents.created_at",
+            (*ACTIVE_STATUSES, finished_since),
+        )
+        return [dict(row) for row in rows]
+
+    def set_wait(self, waiter_id: str, agent_id: str):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO waits VALUES (?, ?)", (waiter_id, agent_id)
+        )
+
+    def clear_wait(self, waiter_id: str):
+        self._connection().execute(
+            "DELETE FROM waits WHERE waiter_id = ?", (waiter_id,)
+        )
+
+    def waits(self) -> dict[str, str]:
+        """The agent each waiter is waiting on, leaving out waiters no longer active."""
+        marks = ", ".join("?" * len(ACTIVE_STATUSES))
+        rows = self._connection().execute(
+            "SELECT waits.waiter_id, waits.agent_id FROM waits"
+            " LEFT JOIN agents ON agents.id = waits.waiter_id"
+            f" WHERE agents.status IS NULL OR agents.status IN ({marks})",
+            ACTIVE_STATUSES,
+        )
+        return {row[0]: row[1] for row in rows}
+
+    def reap_dead(self) -> int:
+        """Mark active agents whose process no longer exists as lost."""
+        lost = 0
+        for record in self.active():
+            if record["pid"] and not _pid_alive(record["pid"]):
+                self.update(record["id"], status="lost", reason="process exited")
+                lost += 1
+        return lost
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_registries: dict[Path, FlockRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path: Union[str, Path]) -> FlockRegistry:
+    """The process-wide registry stored at path.
+
+    Opening it marks agents left active by processes that have since died as lost.
+    """
+    path = Path(path).resolve()
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = FlockRegistry(path)
+            _registries[path].reap_dead()
+        return _registries[path]
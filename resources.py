@@ -0,0 +1,86 @@
+"""Process-wide resources that in-process children borrow instead of rebuilding.
+
+Each resource is built once, on first use, under a per-key lock, and handed
+out as is to every agent. Only read-only values go in: tokenizer encodings,
+the triggering prompt of a prompt settings file, loaded persona files and
+compiled command entries. An agent's own state never does.
+"""
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+# Encoding for models tiktoken does not know
+DEFAULT_ENCODING = "cl100k_base"
+
+
+class ResourceHub:
+    """Builds each resource once and counts how often it is borrowed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+        self._resources: dict[Hashable, Any] = {}
+        self._stats: dict[Hashable, list] = {}
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """The resource under key, built by build() the first time."""
+        try:
+            value = self._resources[key]
+        except KeyError:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            # Other resources can be built meanwhile, this one only once
+            with key_lock:
+                if key not in self._resources:
+                    started = time.perf_counter()
+                    self._resources[key] = build()
+                    self._stats[key] = [time.perf_counter() - started, 0]
+            value = self._resources[key]
+        stats = self._stats.get(key)
+        if stats is not None:
+            stats[1] += 1  # unlocked, so approximate under contention
+        return value
+
+    def stats(self) -> dict[Hashable, dict]:
+        """Seconds spent building each resource, and how often it was borrowed."""
+        return {
+            key: {"build_seconds": seconds, "borrows": borrows}
+            for key, (seconds, borrows) in self._stats.items()
+        }
+
+    def clear(self):
+        with self._lock:
+            self._resources.clear()
+            self._stats.clear()
+
+    # Common resources
+
+    def encoding(self, model: str):
+        """The tiktoken encoding of a model (None without tiktoken)."""
+
+        def build():
+            try:
+                import tiktoken
+            except ImportError:
+                return None
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+        return self.get(("encoding", model), build)
+
+    def token_counter(self, model: str) -> Callable[[str], int]:
+        """Counts the tokens of a text for a model, estimating without tiktoken."""
+
+        def build():
+            encoding = self.encoding(model)
+            if encoding is None:
+                return lambda text: max(1, (len(text) + 3) // 4)
+            # Unlike encode, encode_ordinary does not fail on special tokens
+            return lambda text: len(encoding.encode_ordinary(text))
+
+        return self.get(("token_counter", model), build)
+
+
+flock_resources = ResourceHub()
@@ -0,0 +1,229 @@
+"""Per-agent model routing from persona, goal and configurable rules."""
+import json
+import logging
+import re
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Goals that mostly move data around run fine on the fast model.
+# Hints match whole words only, so list the forms to match.
+FAST_HINTS = (
+    "download",
+    "fetch",
+    "search",
+    "browse",
+    "save",
+    "list",
+    "read",
+    "copy",
+    "summarize",
+    "collect",
+)
+# Goals that need reasoning get the smart model
+SMART_HINTS = (
+    "analyze",
+    "analyse",
+    "analysis",
+    "design",
+    "plan",
+    "planning",
+    "architect",
+    "architecture",
+    "debug",
+    "write code",
+    "implement",
+    "refactor",
+    "prove",
+    "evaluate",
+    "compare",
+    "strategy",
+)
+
+
+def _hint_pattern(hints: tuple[str, ...]) -> re.Pattern:
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, hints)) + r")\b")
+
+
+FAST_PATTERN = _hint_pattern(FAST_HINTS)
+SMART_PATTERN = _hint_pattern(SMART_HINTS)
+
+
+class RoutingDecision:
+    def __init__(self, tier: str, model: str, reason: str, features: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.tier = tier
+        self.model = model
+        self.reason = reason
+        self.features = features
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "tier": self.tier,
+            "model": self.model,
+            "reason": self.reason,
+            "features": self.features,
+        }
+
+
+RULE_FIELDS = ("name", "role", "goals", "persona")
+# Problems with rules files already logged, so each is reported once
+_reported: set[str] = set()
+
+
+def load_rules(path: str) -> tuple[dict, ...]:
+    """Routing rules from a JSON list of {"field", "pattern", "model"} objects.
+
+    field is one of name, role, goals or persona; model is "fast", "smart" or a
+    model name. The first rule whose pattern matches wins. The file is parsed
+    again whenever it changes. A missing or invalid file is logged and routes
+    on complexity alone.
+    """
+    if not path:
+        return ()
+    try:
+        return _parse_rules(path, Path(path).stat().st_mtime_ns)
+    except (OSError, ValueError) as e:
+        problem = f"Dolly: ignoring routing rules {path}: {e}"
+        if problem not in _reported:
+            _reported.add(problem)
+            logger.error(problem)
+        return ()
+
+
+@lru_cache(maxsize=8)
+def _parse_rules(path: str, mtime_ns: int) -> tuple[dict, ...]:
+    rules = json.loads(Path(path).read_text())
+    if not isinstance(rules, list):
+        raise ValueError("the file must hold a JSON list of rules")
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise ValueError(f"rule {index} is not an object")
+        if rule.get("field") not in RULE_FIELDS:
+            raise ValueError(f"rule {index}: field must be one of {RULE_FIELDS}")
+        if not isinstance(rule.get("model"), str) or not rule["model"]:
+            raise ValueError(f"rule {index}: needs a model")
+        if not isinstance(rule.get("pattern"), str):
+            raise ValueError(f"rule {index}: needs a pattern")
+        try:
+            re.compile(rule["pattern"])
+        except re.error as e:
+            raise ValueError(f"rule {index}: invalid pattern: {e}") from e
+    return tuple(rules)
+
+
+class ModelRouter:
+    """Picks the fast or smart model for each spawned agent.
+
+    Parameters:
+        fast_model (str): The parent's fast_llm.
+        smart_model (str): The parent's smart_llm.
+        rules (tuple[dict]): Explicit rules, see load_rules.
+        threshold (int): Complexity score at which the smart model is used.
+        log_path (Path): JSONL file receiving decisions and outcomes.
+    """
+
+    def __init__(
+        self,
+        fast_model: str,
+        smart_model: str,
+        rules: tuple = (),
+        threshold: int = 2,
+        log_path: Optional[Path] = None,
+    ):
+        self.fast_model = fast_model
+        self.smart_model = smart_model
+        self.rules = rules
+        self.threshold = threshold
+        self.log_path = Path(log_path) if log_path else None
+
+    def _model(self, tier: str) -> str:
+        return {"fast": self.fast_model, "smart": self.smart_model}.get(tier, tier)
+
+    @staticmethod
+    def features(name: str, role: str, goals: list[str], persona: str) -> dict:
+        text = " ".join([role] + list(goals)).lower()
+        words = len(text.split())
+        fast_hits = len(FAST_PATTERN.findall(text))
+        smart_hits = len(SMART_PATTERN.findall(text))
+        score = smart_hits - fast_hits
+        score += 1 if words > 60 else 0
+        score += 1 if len(goals) > 3 else 0
+        return {
+            "goals": len(goals),
+            "words": words,
+            "fast_hits": fast_hits,
+            "smart_hits": smart_hits,
+            "persona": persona or "",
+            "score": score,
+        }
+
+    def route(
+        self, name: str, role: str, goals: list[str], persona: str = ""
+    ) -> RoutingDecision:
+        features = self.features(name, role, goals, persona)
+        fields = {
+            "name": name,
+            "role": role,
+            "goals": "\n".join(goals),
+            "persona": persona or "",
+        }
+        for index, rule in enumerate(self.rules):
+            if re.search(rule["pattern"], fields[rule["field"]], re.IGNORECASE):
+                tier = rule["model"]
+                reason = f"rule {index}: {rule['field']} ~ {rule['pattern']}"
+                break
+        else:
+            tier = "smart" if features["score"] >= self.threshold else "fast"
+            reason = f"complexity {features['score']} (threshold {self.threshold})"
+
+        decision = RoutingDecision(tier, self._model(tier), reason, features)
+        self._log({"event": "decision", "agent": name, **decision.as_dict()})
+        return decision
+
+    def record_outcome(self, decision: RoutingDecision, status: str, latency: float):
+        """Log how the routed agent fared, for tuning the rules."""
+        self._log(
+            {
+                "event": "outcome",
+                "id": decision.id,
+                "status": status,
+                "latency": round(latency, 3),
+            }
+        )
+
+    def _log(self, entry: dict):
+        if self.log_path is None:
+            return
+        entry["time"] = time.time()
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a") as log:
+            log.write(json.dumps(entry) + "\n")
+
+
+def summarize(log_path: Path) -> dict:
+    """Outcomes per model tier: agents, finished share and mean latency."""
+    decisions, summary = {}, {}
+    for line in Path(log_path).read_text().splitlines():
+        entry = json.loads(line)
+        if entry["event"] == "decision":
+            decisions[entry["id"]] = entry
+            continue
+        decision = decisions.get(entry["id"])
+        if decision is None:
+            continue
+        stats = summary.setdefault(
+            decision["tier"], {"agents": 0, "finished": 0, "latency": 0.0}
+        )
+        stats["agents"] += 1
+        stats["finished"] += entry["status"] == "finished"
+        stats["latency"] += entry["latency"]
+    for stats in summary.values():
+        stats["finished_share"] = stats["finished"] / stats["agents"]
+        stats["mean_latency"] = stats.pop("latency") / stats["agents"]
+    return summary
@@ -0,0 +1,159 @@
+"""Prompt entries of Dolly's commands, compiled once per process.
+
+Every cycle of every agent pays for the command list in prompt tokens. Each
+command is listed under the cheapest of its name and aliases that no other
+command answers to, with the cheapest of its description wordings. Parameters
+come from the signature of the command's method and every one of them must be
+annotated.
+"""
+import inspect
+import logging
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+from .resources import flock_resources
+
+# Passed in by Auto-GPT, never written by the model
+IMPLICIT_PARAMS = ("cls", "self", "agent")
+# All chat models Dolly runs share its tokenizer
+CHAT_MODEL = "gpt-4"
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaError(ValueError):
+    """A command that cannot be listed in the prompt."""
+
+
+class CommandSchema(NamedTuple):
+    name: str
+    label: str
+    description: str
+    params: dict[str, str]
+    # Prompt tokens of the entry
+    tokens: int
+    # Tokens measured for every candidate label and description
+    candidates: dict[str, int]
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Tokens of text for the OpenAI chat models (estimated without tiktoken)."""
+    return flock_resources.token_counter(CHAT_MODEL)(text)
+
+
+def _annotation(annotation) -> str:
+    if isinstance(annotation, str):
+        return annotation
+    return annotation.__name__ if isinstance(annotation, type) else str(annotation)
+
+
+def command_params(method: Callable) -> dict[str, str]:
+    """The model-facing parameters of a command method, by name."""
+    params = {}
+    for name, parameter in inspect.signature(method).parameters.items():
+        if name in IMPLICIT_PARAMS:
+            continue
+        if parameter.annotation is inspect.Parameter.empty:
+            raise SchemaError(f"{method.__qualname__}: '{name}' has no annotation")
+        params[name] = _annotation(parameter.annotation)
+    return params
+
+
+def _cheapest(candidates: list[str], count: Callable[[str], int]) -> str:
+    # Fewest tokens, then fewest characters, then the first listed
+    return min(candidates, key=lambda text: (count(text), len(text)))
+
+
+def compile_command(
+    name: str,
+    attrs: dict,
+    method: Callable,
+    taken: dict[str, set[str]],
+    count: Callable[[str], int] = count_tokens,
+) -> CommandSchema:
+    """The prompt entry of one command.
+
+    Parameters:
+        name (str): The command.
+        attrs (dict): Its COMMANDS entry: description (one wording or a list)
+            and aliases.
+        method (Callable): The method the command runs.
+        taken (dict): The commands answering to each name and alias.
+        count (Callable): Token counter.
+    """
+    # A label others answer to as well is ambiguous, unless it is the name
+    labels = [
+        label
+        for label in dict.fromkeys([name, *attrs.get("aliases", [])])
+        if label == name or taken.get(label, {name}) == {name}
+    ]
+    descriptions = attrs["description"]
+    if isinstance(descriptions, str):
+        descriptions = [descriptions]
+    if not descriptions or not all(d.strip() for d in descriptions):
+        raise SchemaError(f"{name}: empty description")
+    params = command_params(method)
+
+    label = _cheapest(labels, count)
+    description = _cheapest(descriptions, count)
+    entry = f'{label}: "{description}", params: ' + ", ".join(
+        f'"{param}": "{kind}"' for param, kind in params.items()
+    )
+    return CommandSchema(
+        name=name,
+        label=label,
+        description=description,
+        params=params,
+        tokens=count(entry),
+        candidates={text: count(text) for text in [*labels, *descriptions]},
+    )
+
+
+def compile_commands(
+    commands: dict[str, dict],
+    owner,
+    count: Callable[[str], int] = count_tokens,
+    strict: bool = False,
+) -> list[CommandSchema]:
+    """Prompt entries for commands run by owner's methods of the same name.
+
+    Invalid commands are logged and left out, or raise SchemaError if strict.
+    """
+    taken: dict[str, set[str]] = {}
+    for name, attrs in commands.items():
+        for label in [name, *attrs.get("aliases", [])]:
+            taken.setdefault(label, set()).add(name)
+
+    schemas = []
+    for name, attrs in commands.items():
+        try:
+            method = getattr(owner, name, None)
+            if method is None:
+                raise SchemaError(f"{name}: {owner.__name__} has no such method")
+            schema = compile_command(name, attrs, method, taken, count)
+            if any(schema.description == other.description for other in schemas):
+                raise SchemaError(f"{name}: description shared with another command")
+        except SchemaError as e:
+            if strict:
+                raise
+            logger.error(f"Dolly: not listing a command, {e}")
+            continue
+        schemas.append(schema)
+    return schemas
+
+
+def compiled_commands(
+    commands: dict[str, dict], owner, count: Optional[Callable[[str], int]] = None
+) -> list[CommandSchema]:
+    """compile_commands, done once per commands and owner."""
+
+    def build():
+        schemas = compile_commands(commands, owner, count or count_tokens)
+        logger.debug(
+            "Dolly: command entries use"
+            f" {sum(schema.tokens for schema in schemas)} prompt tokens"
+        )
+        return schemas
+
+    return flock_resources.get(("command_schemas", id(commands), id(owner)), build)
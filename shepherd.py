@@ -1,27 +1,443 @@
+# Auto-GPT is imported where it is used, so that loading the plugin stays
+# cheap; the first create_agent pays for it (see startup.py)
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import deepcopy
 from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .artifacts import ArtifactStore, active_store, install_store
+from .cache import (
+    CACHED_RESULT_COMMAND,
+    CommandCache,
+    active_cache,
+    install,
+    parse_ttls,
+)
+from .cassette import (
+    REPLAY,
+    REPLAYED_RESULT_COMMAND,
+    Cassette,
+    active_cassette,
+    install_cassette,
+)
+from .compaction import HistoryCompactor
+from .concurrency import FlockAtCapacity, RateLimitLogHandler, flock_limiter
+from .contextpack import build_context_pack, workspace_manifest
+from .dedup import GoalIndex
+from .earlystop import STOP_STATUSES, CompletionDetector, EarlyStop
+from .events import (
+    COMMAND,
+    CYCLE,
+    MEMORY,
+    PROVISIONING,
+    QUEUED,
+    REQUESTED,
+    STATUS_EVENTS,
+    flock_events,
+)
+from .handoff import (
+    HandoffStore,
+    active_handoff,
+    default_root,
+    handles_in,
+    install_handoff,
+)
+from .hedging import Hedge, hedge_delay
+from .knowledge import (
+    SCOPES,
+    FlockKnowledge,
+    FlockMemory,
+    active_knowledge,
+    get_knowledge,
+    install_knowledge,
+)
+from .lifecycle import AgentCancelled, AgentNode, flock_tree
+from .logmux import FlockLogHandler, flock_logs
+from .manifest import (
+    DEFAULT_TEMPLATE,
+    AgentSpec,
+    ManifestError,
+    SettingsTemplate,
+    load_manifest,
+    provision,
+)
+from .memwatch import MemoryAccountant
+from .quotas import QuotaExceeded, TreeQuotas
+from .registry import FlockRegistry, get_registry
+from .resources import flock_resources
+from .routing import ModelRouter, load_rules
+from .workers import RemoteDispatcher, WorkerError
+
+if TYPE_CHECKING:
+    from autogpt.agents import Agent
+    from autogpt.config import Config
 
-from autogpt.agents import Agent
-from autogpt.app.configurator import create_config
-from autogpt.app.main import construct_main_ai_config, run_interaction_loop
-from autogpt.config.config import GPT_3_MODEL, GPT_4_MODEL
-from autogpt.config.prompt_config import PromptConfig
-from autogpt.memory.vector import get_memory
-from turbo.personas.manager import PersonaManager
+# Bytes read_payload returns at most, so a payload never floods the prompt
+MAX_PAYLOAD_READ = 8000
 
 
 class Shepherd:
+    # The plugin instance whose settings govern spawned agents
+    plugin = None
+    # History compactors of the in-process children, by node id
+    _compactors: dict[str, HistoryCompactor] = {}
+    _detectors: dict[str, CompletionDetector] = {}
+    _accountant: Optional[MemoryAccountant] = None
+    # Limits launch_team sets for the next create_agent on the same thread
+    _launch = threading.local()
+
+    @classmethod
+    def configure(cls, plugin):
+        if cls.plugin is None:
+            logging.getLogger().addHandler(RateLimitLogHandler(flock_limiter))
+            logging.getLogger().addHandler(
+                FlockLogHandler(flock_logs, cls._current_child)
+            )
+        cls.plugin = plugin
+        flock_limiter.configure(
+            floor=plugin.min_agents,
+            ceiling=plugin.max_agents,
+            target_latency=plugin.target_latency,
+        )
+        if plugin.model_routing:
+            # Reports a bad rules file at startup rather than on the first spawn
+            load_rules(plugin.routing_rules)
+        if plugin.cassette and active_cassette() is None:
+            from . import COMMANDS
+
+            # Dolly's commands spawn the children, so they always run for real
+            live = {CACHED_RESULT_COMMAND}
+            for command, attrs in COMMANDS.items():
+                live.update([command, *attrs["aliases"]])
+            install_cassette(
+                Cassette(
+                    plugin.cassette,
+                    plugin.cassette_mode,
+                    latency=plugin.replay_latency,
+                    live_commands=live,
+                )
+            )
+
+    @staticmethod
+    def _current_child() -> Optional[str]:
+        node = flock_tree.current()
+        return node.name if node is not None and node.parent is not None else None
+
+    @classmethod
+    def setting(cls, name: str, default=None):
+        return getattr(cls.plugin, name, default)
+
+    @classmethod
+    def registry(cls, agent: Agent) -> FlockRegistry:
+        path = cls.setting("registry_path") or (
+            Path(agent.config.workspace_path) / "dolly_flock.sqlite3"
+        )
+        return get_registry(path)
+
+    @classmethod
+    def node_for(cls, agent: Agent) -> AgentNode:
+        """The flock node of the agent running on this thread."""
+        return flock_tree.current() or flock_tree.root_for(
+            agent,
+            tree_timeout=cls.setting("tree_timeout"),
+            depth=cls.setting("tree_depth", 0),
+            spawned=cls.setting("tree_spawned", 0),
+            deadline=cls.setting("tree_deadline"),
+        )
+
+    @classmethod
+    def register_root(cls, registry: FlockRegistry, node: AgentNode):
+        if node.parent is None and registry.get(node.id) is None:
+            registry.register(node.id, node.name, status="running", pid=os.getpid())
+            flock_events.node_event(STATUS_EVENTS["running"], node, pid=os.getpid())
+
+    @classmethod
+    def transition(
+        cls, registry: FlockRegistry, node: AgentNode, status: str, **fields
+    ):
+        """Record a status change in the registry and the event log."""
+        registry.update(node.id, status=status, **fields)
+        flock_events.node_event(STATUS_EVENTS.get(status, status), node, **fields)
+
+    @classmethod
+    def knowledge(cls, agent: Agent) -> FlockKnowledge:
+        index = get_knowledge(
+            Path(agent.config.workspace_path) / "dolly_knowledge.sqlite3",
+            cls.embedder(agent),
+        )
+        # From now on the text_embedding hooks embed each text once per flock
+        if active_knowledge() is None:
+            install_knowledge(index)
+        return index
+
+    @classmethod
+    def memory(cls, agent: Agent, config: Config):
+        """The memory of a new child: the flock's, unless each agent has its own."""
+        from autogpt.memory.vector import get_memory
+
+        if cls.setting("separate_memory_index", False) or agent.memory is None:
+            return get_memory(config)
+        if not isinstance(agent.memory, FlockMemory):
+            agent.memory = FlockMemory(agent.memory)
+        return agent.memory
+
+    @classmethod
+    def embedder(cls, agent: Agent):
+        from autogpt.memory.vector.utils import get_embedding
+
+        embed = partial(get_embedding, config=agent.config)
+        cassette = active_cassette()
+        return cassette.embedder(embed) if cassette is not None else embed
+
+    @staticmethod
+    def live_embedding(text: str) -> list[float]:
+        """An embedding from the OpenAI API itself, for the cassette to record."""
+        import openai
+
+        response = openai.Embedding.create(
+            input=[text.replace("\n", " ")],
+            model=os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002"),
+        )
+        return response["data"][0]["embedding"]
+
+    @classmethod
+    def artifacts(cls, agent: Agent) -> ArtifactStore:
+        store = active_store()
+        if store is None:
+            workspace = Path(agent.config.workspace_path)
+            store = ArtifactStore(workspace / "dolly_artifacts", workspace)
+            install_store(store)
+        return store
+
+    @classmethod
+    def handoff(cls, agent: Agent) -> HandoffStore:
+        store = active_handoff()
+        if store is None:
+            store = HandoffStore(
+                cls.setting("handoff_dir") or default_root(agent.config.workspace_path)
+            )
+            install_handoff(store)
+        return store
+
+    @classmethod
+    def logs(cls, agent: Agent):
+        """Point the log multiplexer at the workspace, once."""
+        if flock_logs.root is None:
+            flock_logs.configure(
+                Path(agent.config.workspace_path) / "dolly_logs",
+                ring_size=cls.setting("log_ring_lines", 1000),
+                max_bytes=int(cls.setting("log_segment_mb", 16) * 1024 * 1024),
+                max_age=cls.setting("log_segment_minutes", 60) * 60,
+                quota=int(cls.setting("log_quota_mb", 1024) * 1024 * 1024),
+            )
+
+    @classmethod
+    def events(cls, agent: Agent):
+        """Point the lifecycle event log at the workspace, once."""
+        if flock_events.path is None:
+            flock_events.configure(
+                Path(agent.config.workspace_path) / "dolly_events.jsonl"
+            )
+
+    @classmethod
+    def record_cycle(cls, node: Optional[AgentNode]):
+        if node is not None:
+            node.cycles += 1
+            flock_events.node_event(CYCLE, node, cycle=node.cycles)
+
+    @classmethod
+    def record_command(cls, node: Optional[AgentNode], command_name: str):
+        if node is not None:
+            flock_events.node_event(COMMAND, node, command=command_name)
+
+    @classmethod
+    def router(cls, agent: Agent) -> Optional[ModelRouter]:
+        if not cls.setting("model_routing", False):
+            return None
+        return ModelRouter(
+            agent.config.fast_llm,
+            agent.config.smart_llm,
+            rules=load_rules(cls.setting("routing_rules", "")),
+            threshold=cls.setting("routing_threshold", 2),
+            log_path=Path(agent.config.workspace_path) / "dolly_routing.jsonl",
+        )
+
     @classmethod
-    def clone_agent(cls, goals: list[str], agent: Agent) -> str:
+    def goal_index(cls, registry: FlockRegistry) -> Optional[GoalIndex]:
+        threshold = cls.setting("dedup_threshold", 0)
+        if not threshold:
+            return None
+        return GoalIndex(
+            registry, threshold=threshold, window=cls.setting("dedup_window", 3600)
+        )
+
+    @classmethod
+    def install_cache(cls, agent: Agent):
+        """Share a command result cache with every agent using this registry."""
+        if not cls.setting("command_cache", False) or active_cache() is not None:
+            return
+        from autogpt.models.command import Command
+        from autogpt.models.command_parameter import CommandParameter
+
+        workspace = Path(agent.config.workspace_path)
+        cache = CommandCache(
+            workspace / "dolly_cache.sqlite3",
+            workspace,
+            ttls=parse_ttls(cls.setting("cache_ttls", "")),
+            max_bytes=cls.setting("cache_max_mb", 64) * 1024 * 1024,
+        )
+        agent.command_registry.register(
+            Command(
+                name=CACHED_RESULT_COMMAND,
+                description="Return the cached result of a command",
+                method=cache.cached_result,
+                parameters=[CommandParameter("key", "string", "Cache key", True)],
+                # Only reachable through pre_command, never listed in the prompt
+                available=False,
+            )
+        )
+        install(cache)
+
+    @classmethod
+    def install_replay(cls, command_registry):
+        """Let a replaying cassette stand in for the commands of every agent.
+
+        Called from post_prompt, before the top-level agent runs its first
+        command, with the command registry its children share.
+        """
+        cassette = active_cassette()
+        if (
+            command_registry is None
+            or cassette is None
+            or cassette.mode != REPLAY
+            or cassette.commands_installed
+        ):
+            return
+        from autogpt.models.command import Command
+        from autogpt.models.command_parameter import CommandParameter
+
+        command_registry.register(
+            Command(
+                name=REPLAYED_RESULT_COMMAND,
+                description="Return the recorded result of a command",
+                method=cassette.replayed_result,
+                parameters=[CommandParameter("key", "string", "Replay key", True)],
+                available=False,
+            )
+        )
+        cassette.commands_installed = True
+
+    @classmethod
+    def context_pack(cls, goals: list[str], agent: Agent) -> str:
+        """What the parent already knows, for a clone to start from."""
+        budget = cls.setting("warm_start_tokens", 0)
+        if not budget:
+            return ""
+        memories = []
+        try:
+            hits = agent.memory.get_relevant("\n".join(goals), 5, agent.config)
+            memories = [f"- {hit.memory_item.summary}" for hit in hits]
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"No memories for the context pack: {e}")
+        workspace = Path(agent.config.workspace_path)
+        pack = build_context_pack(
+            summary=agent.history.summary,
+            memories=memories,
+            manifest=[f"- {line}" for line in workspace_manifest(workspace)],
+            budget=budget,
+            count_tokens=flock_resources.token_counter(agent.config.fast_llm),
+        )
+        if not pack:
+            return ""
+        return f"starting from this context of the agent that cloned you:\n\n{pack}"
+
+    @classmethod
+    def compact_history(cls, node: Optional[AgentNode]):
+        """Compact the history of the in-process child running as node."""
+        keep_turns = cls.setting("compact_keep_turns", 0)
+        if node is None or node.agent is None or not keep_turns:
+            return
+        compactor = cls._compactors.get(node.id)
+        if compactor is None:
+            compactor = cls._compactors[node.id] = HistoryCompactor(
+                keep_turns,
+                cls.setting("compact_threshold", 1000),
+                flock_resources.token_counter(node.agent.config.fast_llm),
+            )
+        compactor.compact(node.agent.history, name=node.name)
+
+    @classmethod
+    def memory_accountant(cls) -> Optional[MemoryAccountant]:
+        if not cls.setting("memory_accounting", False):
+            return None
+        if cls._accountant is None:
+            cls._accountant = MemoryAccountant(frames=cls.setting("memory_frames", 1))
+        return cls._accountant
+
+    @classmethod
+    def teardown(cls, node: AgentNode):
+        """Release what the flock holds for a child that has exited."""
+        cls._compactors.pop(node.id, None)
+        cls._detectors.pop(node.id, None)
+        flock_logs.release(node.name)
+        store = active_handoff()
+        if store is not None:
+            store.release_holder(node.id)
+        agent, node.agent = node.agent, None
+        if agent is not None:
+            # Anything still holding the Agent no longer keeps these alive
+            agent.history.messages.clear()
+            agent.memory = None
+
+    @classmethod
+    def account(cls, node: AgentNode, accountant: Optional[MemoryAccountant]):
+        """Report what a torn down child left behind."""
+        report = accountant.after(node) if accountant else None
+        if report:
+            flock_events.node_event(
+                MEMORY,
+                node,
+                retained_bytes=report.retained_bytes,
+                top=report.top,
+                survivors=report.survivors,
+            )
+
+    @classmethod
+    def check_completion(cls, node: Optional[AgentNode], response: str):
+        """End the in-process child running as node once its work looks done."""
+        if node is None or node.agent is None or not cls.setting("early_stop", False):
+            return
+        detector = cls._detectors.get(node.id)
+        if detector is None:
+            detector = cls._detectors[node.id] = CompletionDetector(
+                node.agent.ai_config.ai_goals,
+                node.agent.config.workspace_path,
+                idle_cycles=cls.setting("idle_cycles", 3),
+            )
+        reason = detector.observe(response)
+        if reason:
+            raise EarlyStop(reason)
+
+    @classmethod
+    def clone_agent(cls, goals: list[str], agent: Agent, force: bool = False) -> str:
         new_name = f"{agent.ai_config.ai_name}-c[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]"
         return cls.create_agent(
             name=new_name,
             role=agent.ai_config.ai_role,
             goals=goals,
-            backstory="",
+            backstory=cls.context_pack(goals, agent),
             persona="",
             personality="",
             agent=agent,
+            force=force,
         )
 
     @classmethod
@@ -34,18 +450,646 @@ class Shepherd:
         persona: str,
         personality: str,
         agent: Agent,
+        force: bool = False,
+    ) -> str:
+        overrides = getattr(cls._launch, "overrides", None) or {}
+        cls._launch.overrides = None
+        # Team members are created on pool threads, away from their parent's
+        parent_node = overrides.get("parent") or cls.node_for(agent)
+        if parent_node.cancelled:
+            return f"Agent '{name}' was not created: {parent_node.cancel_reason}."
+        cls.install_cache(agent)
+        cls.install_replay(agent.command_registry)
+        cls.knowledge(agent)
+        cls.logs(agent)
+        cls.events(agent)
+
+        registry = cls.registry(agent)
+        goal_index = cls.goal_index(registry)
+        if goal_index and str(force).lower() != "true":
+            # A child waiting on one of its own ancestors would never return
+            lineage, ancestor = [], parent_node
+            while ancestor is not None:
+                lineage.append(ancestor.id)
+                ancestor = ancestor.parent
+            duplicate = goal_index.match(goals, exclude=lineage)
+            attached = duplicate and cls._attach(
+                name, *duplicate, goal_index, parent_node
+            )
+            if attached:
+                return attached
+
+        try:
+            node = flock_tree.spawn(
+                name,
+                parent=parent_node,
+                timeout=overrides.get("timeout", cls.setting("agent_timeout")),
+                quotas=TreeQuotas.from_plugin(cls.plugin),
+                member="team" in overrides,
+            )
+        except QuotaExceeded as e:
+            return (
+                f"Agent '{name}' was not created: {e}."
+                " Complete the task without creating more agents."
+            )
+
+        cls.register_root(registry, parent_node)
+        registry.register(
+            node.id, name, parent_id=parent_node.id, persona=persona, pid=os.getpid()
+        )
+        flock_events.node_event(REQUESTED, node, goals=goals, persona=persona)
+        cls.hold_payloads(node, goals, agent)
+        if goal_index:
+            goal_index.add(node.id, goals)
+
+        # Routing sees the role as given: a clone's backstory is the parent's
+        # context pack, whose length and keywords would pass for complexity
+        router = cls.router(agent)
+        decision = None
+        if router and "model" not in overrides:
+            decision = router.route(name, role, goals, persona)
+        model = decision.model if decision else overrides.get("model")
+
+        # only combine role, backstory and personality if they are not empty
+        if backstory:
+            role = ", ".join([role, backstory])
+        if personality:
+            role = ", ".join([role, personality])
+        started = time.monotonic()
+
+        hedge = None
+        delay = hedge_delay(registry.latencies(), cls.setting("hedge_percentile", 0))
+        if delay is not None:
+            # The replica gets the smart model when the primary was routed to fast
+            replica_model = model
+            if decision and decision.tier == "fast":
+                replica_model = agent.config.smart_llm
+            hedge = Hedge(
+                node,
+                delay,
+                partial(
+                    cls._run_replica,
+                    parent_node,
+                    name,
+                    role,
+                    goals,
+                    persona,
+                    replica_model,
+                    agent,
+                    registry,
+                    overrides=overrides,
+                ),
+            )
+
+        accountant = cls.memory_accountant()
+        if accountant:
+            accountant.before(node)
+
+        # TODO: Make run_interactive_loop async
+        try:
+            flock_events.node_event(QUEUED, node)
+            # The child's Agent is only built once it has a slot to run in.
+            # Team members are all started at once, so they wait until their
+            # deadline instead of being refused after the queue timeout
+            # whenever the limit is below the team's size.
+            queue_timeout = (
+                None if "team" in overrides else cls.setting("queue_timeout")
+            )
+            with flock_limiter.slot(timeout=queue_timeout, cancelled=node.stopped):
+                workspace, run = cls._provision(
+                    node, name, role, goals, persona, model, agent, overrides
+                )
+                cls.transition(registry, node, "running")
+                with flock_tree.running(node, grace=cls.setting("cancel_grace", 30.0)):
+                    if hedge:
+                        hedge.start()
+                    message = run()
+        except FlockAtCapacity as e:
+            flock_tree.retire(node)
+            if node.cancelled:
+                cls.transition(registry, node, "cancelled", reason=node.cancel_reason)
+                return f"Agent '{name}' was cancelled: {node.cancel_reason}."
+            cls.transition(registry, node, "refused", reason=str(e))
+            return f"Agent '{name}' was not created: {e}"
+        except EarlyStop as e:
+            status = STOP_STATUSES.get(e.reason, "finished")
+            cls.transition(
+                registry, node, status, reason=e.reason, result=str(workspace)
+            )
+            if status != "finished":
+                # A stuck child is no result, so it never settles a hedge
+                return (
+                    f"Agent '{name}' stopped without finishing its goals"
+                    f" ({e.reason}); its partial work is in {workspace}."
+                )
+            message = f"Agent '{name}' finished its goals ({e.reason})."
+            if hedge:
+                hedge.settle("primary", message)
+            return message
+        except SystemExit:
+            cls.transition(registry, node, "finished", result=str(workspace))
+            message = f"Agent '{name}' run and exited successfully."
+            if hedge:
+                hedge.settle("primary", message)
+            return message
+        except AgentCancelled as e:
+            cls.transition(
+                registry, node, "cancelled", reason=node.cancel_reason or e.reason
+            )
+            if hedge and hedge.lost("primary"):
+                return hedge.result
+            if not node.cancelled:
+                raise
+            return f"Agent '{name}' was cancelled: {node.cancel_reason}."
+        except WorkerError as e:
+            flock_tree.retire(node)
+            cls.transition(registry, node, "failed", reason=str(e))
+            return f"Agent '{name}' failed: {e}"
+        except Exception as e:
+            flock_tree.retire(node)
+            cls.transition(registry, node, "failed", reason=repr(e))
+            raise
+        else:
+            cls.transition(registry, node, "finished", result=str(workspace))
+            if hedge:
+                hedge.settle("primary", message)
+            return message
+        finally:
+            # run holds the child's Agent, which must be gone before accounting
+            run = None
+            cls.teardown(node)
+            if hedge:
+                hedge.stop()
+            if decision:
+                router.record_outcome(
+                    decision,
+                    registry.get(node.id)["status"],
+                    time.monotonic() - started,
+                )
+            cls.account(node, accountant)
+
+    @classmethod
+    def launch_team(cls, manifest: str, agent: Agent) -> str:
+        """Run the agents of a team manifest, each once its dependencies finished."""
+        workspace = Path(agent.config.workspace_path)
+        parent = cls.node_for(agent)
+        try:
+            team = load_manifest(workspace / manifest)
+        except ManifestError as e:
+            return f"Could not launch {manifest}: {e}"
+        try:
+            flock_tree.spawn_team(
+                parent, len(team.agents), quotas=TreeQuotas.from_plugin(cls.plugin)
+            )
+        except QuotaExceeded as e:
+            return f"Could not launch {manifest}: {e}."
+        try:
+            template = SettingsTemplate.load(
+                cls.setting("settings_template") or DEFAULT_TEMPLATE
+            )
+            settings = provision(team, workspace, template)
+        except (ManifestError, OSError) as e:
+            return f"Could not launch {manifest}: {e}"
+        registry = cls.registry(agent)
+        futures: dict[str, Future] = {}
+
+        def launch(spec: AgentSpec) -> tuple[bool, str]:
+            reports = []
+            for dependency in spec.depends_on:
+                finished, message = futures[dependency].result()
+                if not finished:
+                    return False, f"not started, {dependency} did not finish"
+                reports.append(f"{dependency} reported: {message}")
+            overrides = {
+                "team": team.team,
+                "parent": parent,
+                "ai_settings_file": str(settings[spec.name]),
+            }
+            for key in ("model", "timeout", "cycles"):
+                if getattr(spec, key) is not None:
+                    overrides[key] = getattr(spec, key)
+            cls._launch.overrides = overrides
+            try:
+                message = cls.create_agent(
+                    name=spec.name,
+                    role=spec.role,
+                    goals=list(spec.goals),
+                    backstory=" ".join(reports),
+                    persona=spec.persona,
+                    personality="",
+                    agent=agent,
+                    force=True,
+                )
+            except AgentCancelled as e:
+                return False, f"cancelled: {e.reason}"
+            except Exception as e:
+                return False, f"failed: {e!r}"
+            records = registry.find(spec.name)
+            return bool(records) and records[-1]["status"] == "finished", message
+
+        # No more members run at once than the flock has slots. Members are
+        # submitted in dependency order, so a member waiting on another never
+        # holds the thread that one needs. The caller's slot is free meanwhile.
+        with flock_limiter.lend(), ThreadPoolExecutor(
+            max_workers=min(len(team.agents), flock_limiter.ceiling),
+            thread_name_prefix="dolly-team",
+        ) as pool:
+            for spec in team.agents:
+                futures[spec.name] = pool.submit(launch, spec)
+        lines = [f"Team '{team.team}' ran {len(team.agents)} agents:"]
+        for name, future in futures.items():
+            lines.append(f"- {name}: {future.result()[1]}")
+        return "\n".join(lines)
+
+    @classmethod
+    def share_finding(cls, finding: str, tags: str, agent: Agent) -> str:
+        node = cls.node_for(agent)
+        cls.register_root(cls.registry(agent), node)
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        new = cls.knowledge(agent).add(finding, node.id, tags)
+        if not new:
+            return "Finding shared; the flock already knew it."
+        return "Finding shared with the flock."
+
+    @classmethod
+    def search_findings(cls, query: str, scope: str, agent: Agent) -> str:
+        if scope not in SCOPES:
+            return f"Unknown scope '{scope}', use one of: {', '.join(SCOPES)}."
+        node = cls.node_for(agent)
+        registry = cls.registry(agent)
+        cls.register_root(registry, node)
+        if scope == "own":
+            agent_ids = [node.id]
+        elif scope == "siblings":
+            parent_id = registry.get(node.id)["parent_id"]
+            agent_ids = (
+                [record["id"] for record in registry.children(parent_id)]
+                if parent_id
+                else [node.id]
+            )
+        else:
+            agent_ids = registry.tree(node.id)
+
+        results = cls.knowledge(agent).search(query, agent_ids)
+        if not results:
+            return "No findings shared yet."
+        lines = []
+        for result in results:
+            names = ", ".join(registry.get(i)["name"] for i in result["agents"])
+            lines.append(f"- {result['content']} (from {names})")
+        return "\n".join(lines)
+
+    @classmethod
+    def publish_artifact(cls, filename: str, agent: Agent) -> str:
+        node = cls.node_for(agent)
+        cls.register_root(cls.registry(agent), node)
+        try:
+            digest = cls.artifacts(agent).publish(node.id, filename)
+        except (OSError, ValueError) as e:
+            return f"Could not publish {filename}: {e}"
+        return (
+            f"Published {filename} as artifact {digest}. Other agents can fetch it"
+            f" by this digest or as '{node.name}/{filename}'."
+        )
+
+    @classmethod
+    def fetch_artifact(cls, artifact: str, filename: str, agent: Agent) -> str:
+        """Copy an artifact, by digest or as "<agent name>/<file>", into filename."""
+        store = cls.artifacts(agent)
+        digest = artifact
+        if "/" in artifact:
+            name, _, published = artifact.partition("/")
+            for record in reversed(cls.registry(agent).find(name)):
+                digest = store.manifest(record["id"]).get(published)
+                if digest:
+                    break
+            else:
+                return f"Agent '{name}' did not publish {published}."
+        try:
+            store.fetch(cls.node_for(agent).id, digest, filename)
+        except KeyError:
+            return f"There is no artifact {artifact}."
+        except (OSError, ValueError) as e:
+            return f"Could not fetch {artifact}: {e}"
+        return f"Artifact {artifact} is now available as {filename}."
+
+    @classmethod
+    def hold_payloads(cls, node: AgentNode, goals: list[str], agent: Agent):
+        """Keep the payloads named in a child's goals until the child exits."""
+        handles = handles_in("\n".join(goals))
+        if not handles:
+            return
+        try:
+            store = cls.handoff(agent)
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Dolly: no payload store: {e}")
+            return
+        for handle in handles:
+            try:
+                store.acquire(handle, node.id)
+            except KeyError:
+                logging.getLogger(__name__).warning(
+                    f"Dolly: {node.name} was given unknown {handle}"
+                )
+
+    @classmethod
+    def hand_off(cls, filename: str, agent: Agent) -> str:
+        """Store a workspace file as a payload held by the agent and its parent."""
+        node = cls.node_for(agent)
+        cls.register_root(cls.registry(agent), node)
+        workspace = Path(agent.config.workspace_path).resolve()
+        path = (workspace / filename).resolve()
+        if workspace not in path.parents:
+            return f"Could not hand off {filename}: it is outside the workspace."
+        holders = [node.id] + ([node.parent.id] if node.parent else [])
+        try:
+            store = cls.handoff(agent)
+            handle = store.put_file(path, holders)
+        except OSError as e:
+            return f"Could not hand off {filename}: {e}"
+        return (
+            f"{filename} ({store.size(handle)} bytes) is now {handle}. Put this"
+            " handle in goals or results instead of the content; read_payload"
+            " reads parts of it."
+        )
+
+    @classmethod
+    def read_payload(cls, handle: str, start: int, length: int, agent: Agent) -> str:
+        start = max(0, int(start))
+        length = min(max(1, int(length)), MAX_PAYLOAD_READ)
+        try:
+            store = cls.handoff(agent)
+            size = store.size(handle)
+            data = store.read(handle, start, length)
+        except (KeyError, FileNotFoundError):
+            return f"There is no payload {handle}."
+        except OSError as e:
+            return f"Could not read {handle}: {e}"
+        end = start + len(data)
+        return f"Bytes {start}-{end} of {size}:\n" + data.decode(errors="replace")
+
+    @classmethod
+    def tail_agent(cls, name: str, lines: int, agent: Agent) -> str:
+        """The last lines logged by an agent, or by the whole flock for "*"."""
+        cls.logs(agent)
+        lines = int(lines)
+        if name == "*":
+            found = flock_logs.merged(lines)
+        elif name in flock_logs.names():
+            found = flock_logs.tail(name, lines)
+        else:
+            return f"There is no log for agent '{name}'."
+        return "\n".join(line.format() for line in found) or "Nothing logged yet."
+
+    @classmethod
+    def _provision(
+        cls,
+        node: AgentNode,
+        name: str,
+        role: str,
+        goals: list[str],
+        persona: str,
+        model: Optional[str],
+        agent: Agent,
+        overrides: Optional[dict] = None,
+    ) -> tuple[Path, partial]:
+        """The workspace of a child, and what runs it.
+
+        overrides holds the settings file and cycle limit of a team member.
+        """
+        overrides = overrides or {}
+        flock_events.node_event(PROVISIONING, node, model=model)
+        if cls.setting("coordinator_url"):
+            return Path(agent.config.workspace_path), partial(
+                cls._run_remote,
+                node,
+                name,
+                role,
+                goals,
+                model,
+                agent,
+                overrides.get("cycles"),
+            )
+        from autogpt.app.main import run_interaction_loop
+
+        new_agent = cls._build_agent(
+            name,
+            role,
+            goals,
+            persona,
+            model,
+            agent,
+            ai_settings_file=overrides.get("ai_settings_file"),
+            continuous_limit=overrides.get("cycles"),
+        )
+        node.agent = new_agent
+        accountant = cls.memory_accountant()
+        if accountant:
+            accountant.track(
+                node,
+                agent=new_agent,
+                config=new_agent.config,
+                memory=new_agent.memory,
+            )
+        return new_agent.config.workspace_path, partial(run_interaction_loop, new_agent)
+
+    @classmethod
+    def _run_replica(
+        cls,
+        parent_node: AgentNode,
+        name: str,
+        role: str,
+        goals: list[str],
+        persona: str,
+        model: Optional[str],
+        agent: Agent,
+        registry: FlockRegistry,
+        hedge: Hedge,
+        overrides: Optional[dict] = None,
+    ) -> Optional[str]:
+        """Race a replica of a slow agent; its result, or None if it lost or failed.
+
+        overrides are the primary's, so a team member's replica runs with the
+        same settings file and limits.
+        """
+        overrides = overrides or {}
+        name = f"{name}-hedge"
+        try:
+            node = flock_tree.spawn(
+                name,
+                parent=parent_node,
+                timeout=overrides.get("timeout", cls.setting("agent_timeout")),
+                quotas=TreeQuotas.from_plugin(cls.plugin),
+            )
+        except QuotaExceeded:
+            return None
+        if not hedge.attach(node):
+            flock_tree.retire(node)
+            return None
+        registry.register(
+            node.id, name, parent_id=parent_node.id, persona=persona, pid=os.getpid()
+        )
+        flock_events.node_event(REQUESTED, node, goals=goals, replica=True)
+        cls.hold_payloads(node, goals, agent)
+        accountant = cls.memory_accountant()
+        if accountant:
+            accountant.before(node)
+
+        try:
+            # Replicas only use spare capacity, they never queue
+            with flock_limiter.slot(timeout=0):
+                workspace, run = cls._provision(
+                    node, name, role, goals, persona, model, agent, overrides
+                )
+                cls.transition(registry, node, "running")
+                with flock_tree.running(node, grace=cls.setting("cancel_grace", 30.0)):
+                    message = run()
+        except EarlyStop as e:
+            status = STOP_STATUSES.get(e.reason, "finished")
+            if status != "finished":
+                cls.transition(registry, node, status, reason=e.reason)
+                return None
+            message = f"Agent '{name}' finished its goals ({e.reason})."
+        except SystemExit:
+            message = f"Agent '{name}' run and exited successfully."
+        except FlockAtCapacity as e:
+            flock_tree.retire(node)
+            cls.transition(registry, node, "refused", reason=str(e))
+            return None
+        except AgentCancelled as e:
+            cls.transition(
+                registry, node, "cancelled", reason=node.cancel_reason or e.reason
+            )
+            return None
+        except Exception as e:
+            flock_tree.retire(node)
+            cls.transition(registry, node, "failed", reason=repr(e))
+            return None
+        finally:
+            run = None
+            cls.teardown(node)
+            cls.account(node, accountant)
+        cls.transition(registry, node, "finished", result=str(workspace))
+        return message
+
+    @classmethod
+    def _attach(
+        cls,
+        name: str,
+        record: dict,
+        score: float,
+        goal_index: GoalIndex,
+        waiter: AgentNode,
+    ) -> Optional[str]:
+        """Hand the caller the result of an agent already working on its goals.
+
+        None when that agent is itself waiting on the caller, in which case the
+        caller creates its own agent instead.
+        """
+        original = f"agent '{record['name']}' ({score:.0%} similar goals)"
+        record = goal_index.wait(record["id"], waiter)
+        if record is None:
+            return None
+        if record["status"] != "finished":
+            return (
+                f"Agent '{name}' was not created: {original} is {record['status']}."
+                " Pass force=true to create it anyway."
+            )
+        return (
+            f"Agent '{name}' was not created: {original} finished."
+            f" Its results are in {record['result']}."
+            " Pass force=true to create it anyway."
+        )
+
+    @classmethod
+    def _run_remote(
+        cls,
+        node: AgentNode,
+        name: str,
+        role: str,
+        goals: list[str],
+        model: Optional[str],
+        agent: Agent,
+        cycles: Optional[int] = None,
     ) -> str:
+        """Run the agent on a remote worker against a copy of the workspace.
+
+        The remote agent's plugin starts from the node's place in the tree, so
+        the tree's quotas and the node's deadline still bound its children.
+        """
+        env = {
+            "DOLLY_MAX_DEPTH": cls.setting("max_depth", 0),
+            "DOLLY_MAX_DESCENDANTS": cls.setting("max_descendants", 0),
+            "DOLLY_MAX_FANOUT": cls.setting("max_fanout", 0),
+            "DOLLY_TREE_DEPTH": node.depth,
+            "DOLLY_TREE_SPAWNED": node.root.spawned_total,
+        }
+        if node.deadline:
+            env["DOLLY_TREE_DEADLINE"] = time.time() + node.remaining()
+        if model:
+            env["SMART_LLM"] = model
+        dispatcher = RemoteDispatcher(
+            cls.setting("coordinator_url"), token=cls.setting("worker_token")
+        )
+        info = dispatcher.run(
+            {
+                "id": node.id,
+                "name": name,
+                "role": role,
+                "goals": goals,
+                "continuous_limit": cycles or agent.config.continuous_limit,
+                "env": env,
+            },
+            Path(agent.config.workspace_path),
+            on_output=partial(flock_logs.write, name, "stdout"),
+            cancelled=lambda: node.cancelled,
+        )
+        if node.cancelled:
+            raise AgentCancelled(node.cancel_reason)
+        if info["status"] != "finished":
+            raise WorkerError(
+                f"{info['status']} on worker {info['worker']}"
+                f" (exit code {info['returncode']})"
+            )
+        changed = ", ".join(sorted(info.get("changed", {}))) or "none"
+        return (
+            f"Agent '{name}' finished on worker {info['worker']}."
+            f" Files changed: {changed}."
+        )
+
+    @classmethod
+    def _build_agent(
+        cls,
+        name: str,
+        role: str,
+        goals: list[str],
+        persona: str,
+        model: Optional[str],
+        agent: Agent,
+        ai_settings_file: Optional[str] = None,
+        continuous_limit: Optional[int] = None,
+    ) -> Agent:
+        from autogpt.agents import Agent
+        from autogpt.app.configurator import create_config
+        from autogpt.app.main import construct_main_ai_config
+        from autogpt.config.config import GPT_3_MODEL, GPT_4_MODEL
+        from autogpt.config.prompt_config import PromptConfig
+        from turbo.personas.manager import PersonaManager
+
         if persona:
-            ai_settings_file, prompt_settings_file = PersonaManager.load(persona)
+            persona_settings_file, prompt_settings_file = flock_resources.get(
+                ("persona", persona), partial(PersonaManager.load, persona)
+            )
         else:
-            ai_settings_file = agent.config.ai_settings_file
+            persona_settings_file = agent.config.ai_settings_file
             prompt_settings_file = agent.config.prompt_settings_file
+        ai_settings_file = ai_settings_file or persona_settings_file
 
         config = deepcopy(agent.config)
         create_config(
             config=config,
             continuous=config.continuous_mode,
-            continuous_limit=config.continuous_limit,
+            continuous_limit=continuous_limit or config.continuous_limit,
             ai_settings_file=ai_settings_file,
             prompt_settings_file=prompt_settings_file,
             skip_reprompt=config.skip_reprompt,
@@ -62,12 +1106,8 @@ class Shepherd:
             allow_downloads=config.allow_downloads,
             skip_news=config.skip_news,
         )
-
-        # only combine role, backstory and personality if they are not empty
-        if backstory:
-            role = ", ".join([role, backstory])
-        if personality:
-            role = ", ".join([role, personality])
+        if model:
+            config.smart_llm = model
 
         ai_config = construct_main_ai_config(
             config,
@@ -78,18 +1118,13 @@ class Shepherd:
 
         ai_config.command_registry = agent.command_registry
         new_agent = Agent(
-            memory=get_memory(config),
+            memory=cls.memory(agent, config),
             command_registry=ai_config.command_registry,
             ai_config=ai_config,
             config=config,
-            triggering_prompt=PromptConfig(
-                config.prompt_settings_file
-            ).triggering_prompt,
+            triggering_prompt=flock_resources.get(
+                ("triggering_prompt", str(config.prompt_settings_file)),
+                lambda: PromptConfig(config.prompt_settings_file).triggering_prompt,
+            ),
         )
-
-        # TODO: Make run_interactive_loop async
-        try:
-            run_interaction_loop(new_agent)
-        except SystemExit:
-            return f"Agent '{name}' run and exited successfully."
-        return None
+        return new_agent
@@ -0,0 +1,145 @@
+"""What the plugin costs Auto-GPT at startup, and how to move that cost.
+
+Loading the plugin only imports the standard library and the plugin template.
+Auto-GPT's agent machinery is imported by the first create_agent. With
+DOLLY_PREWARM those imports run on a background thread once the first cycle
+starts instead.
+
+Report the import time the plugin adds to the host, failing above a budget:
+
+    python -m autogpt_dolly_plugin.startup --budget-ms 50
+"""
+import argparse
+import importlib
+import logging
+import subprocess
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+# Imported by the first create_agent
+HEAVY_MODULES = (
+    "autogpt.agents",
+    "autogpt.app.configurator",
+    "autogpt.app.main",
+    "autogpt.config.prompt_config",
+    "autogpt.llm.utils",
+    "autogpt.memory.vector",
+    "autogpt.models.command",
+    "turbo.personas.manager",
+)
+MARKER = "dolly-startup"
+
+logger = logging.getLogger(__name__)
+_prewarm: Optional[threading.Thread] = None
+prewarm_times: dict[str, float] = {}
+
+
+def prewarm(modules=HEAVY_MODULES) -> threading.Thread:
+    """Import modules on a daemon thread, once; the thread doing it."""
+    global _prewarm
+    if _prewarm is None:
+
+        def run():
+            for module in modules:
+                started = time.perf_counter()
+                try:
+                    importlib.import_module(module)
+                except ImportError as e:
+                    logger.debug(f"Dolly: not prewarming {module}: {e}")
+                    continue
+                prewarm_times[module] = time.perf_counter() - started
+
+        _prewarm = threading.Thread(target=run, name="dolly-prewarm", daemon=True)
+        _prewarm.start()
+    return _prewarm
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    # Nesting level: 0 for the modules imported by the plugin itself
+    level: int
+
+
+class StartupReport(NamedTuple):
+    imports: list[ImportTime]
+    init_seconds: float
+
+    @property
+    def import_us(self) -> int:
+        return sum(i.cumulative_us for i in self.imports if i.level == 0)
+
+    def heavy(self) -> list[str]:
+        """Heavy modules the plugin imported at load time (should be none)."""
+        loaded = {i.module for i in self.imports}
+        return [module for module in HEAVY_MODULES if module in loaded]
+
+
+def measure(package: str = __package__) -> StartupReport:
+    """Import and construct the plugin in a fresh interpreter.
+
+    The plugin template is imported first, as the host does, so only the
+    imports the plugin adds are reported.
+    """
+    code = "\n".join(
+        [
+            "import sys, time",
+            "import auto_gpt_plugin_template",
+            f"sys.stderr.write('{MARKER}\\n')",
+            "started = time.perf_counter()",
+            f"import {package}",
+            f"{package}.AutoGPTDollyPlugin()",
+            f"sys.stderr.write(f'{MARKER} {{time.perf_counter() - started}}\\n')",
+        ]
+    )
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    imports, init_seconds, measuring = [], 0.0, False
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            if measuring:
+                init_seconds = float(line.split()[1])
+            measuring = not measuring
+        elif measuring and line.startswith("import time:") and "|" in line:
+            own, cumulative, name = line[len("import time:") :].split("|")
+            if not own.strip().isdigit():
+                continue  # the header line
+            level = (len(name) - len(name.lstrip()) - 1) // 2
+            imports.append(ImportTime(name.strip(), int(own), int(cumulative), level))
+    return StartupReport(imports, init_seconds)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Show the startup time the Dolly plugin adds to Auto-GPT."
+    )
+    parser.add_argument("-n", "--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, help="Fail above this import time")
+    args = parser.parse_args(argv)
+
+    report = measure()
+    print(f"{'self (us)':>10} {'total (us)':>11}  module")
+    slowest = sorted(report.imports, key=lambda i: i.self_us, reverse=True)
+    for entry in slowest[: args.top]:
+        print(f"{entry.self_us:>10} {entry.cumulative_us:>11}  {entry.module}")
+    import_ms = report.import_us / 1000
+    print(
+        f"\n{len(report.imports)} modules, {import_ms:.1f} ms of imports,"
+        f" {report.init_seconds * 1000:.1f} ms to import and construct the plugin"
+    )
+    if report.heavy():
+        print(f"Heavy modules imported at load: {', '.join(report.heavy())}")
+    if args.budget_ms is not None and (import_ms > args.budget_ms or report.heavy()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
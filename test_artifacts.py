@@ -0,0 +1,39 @@
+import pytest
+
+from autogpt_dolly_plugin.artifacts import ArtifactStore
+
+
+def test_publish_and_fetch_share_one_blob(tmp_path):
+    store = ArtifactStore(tmp_path / "dolly_artifacts", tmp_path)
+    (tmp_path / "a1").mkdir()
+    (tmp_path / "a1" / "data.csv").write_text("x,y\n1,2\n")
+
+    digest = store.publish("a1", "a1/data.csv")
+    assert store.manifest("a1") == {"a1/data.csv": digest}
+    method = store.fetch("a2", digest, "a2/input.csv")
+    assert method in ("reflink", "copy")
+    assert (tmp_path / "a2" / "input.csv").read_text() == "x,y\n1,2\n"
+    assert store.manifest("a2") == {"a2/input.csv": digest}
+    assert len(list((tmp_path / "dolly_artifacts").glob("??/*"))) == 1
+
+    # Whatever writes to a fetched file, even through chmod, leaves the blob alone
+    fetched = tmp_path / "a2" / "input.csv"
+    assert fetched.stat().st_ino != store.path(digest).stat().st_ino
+    fetched.chmod(0o644)
+    fetched.write_text("changed")
+    assert store.path(digest).read_text() == "x,y\n1,2\n"
+    assert (tmp_path / "a1" / "data.csv").read_text() == "x,y\n1,2\n"
+
+
+def test_corrupted_blobs_are_not_fetched(tmp_path):
+    store = ArtifactStore(tmp_path / "dolly_artifacts", tmp_path)
+    (tmp_path / "data.csv").write_text("x,y\n1,2\n")
+    digest = store.publish("a1", "data.csv")
+    blob = store.path(digest)
+    blob.chmod(0o644)
+    blob.write_text("tampered")
+
+    with pytest.raises(ValueError, match="corrupted"):
+        store.fetch("a2", digest, "input.csv")
+    assert not (tmp_path / "input.csv").exists()
+    assert not store.has(digest)
@@ -0,0 +1,33 @@
+import time
+
+from autogpt_dolly_plugin.cache import CACHED_RESULT_COMMAND, CommandCache
+
+
+def test_cache_hit_and_file_validation(tmp_path):
+    cache = CommandCache(tmp_path / "cache.sqlite3", tmp_path)
+    arguments = {"query": "dolly  the sheep"}
+
+    assert cache.pre_command("web_search", arguments) == ("web_search", arguments)
+    cache.post_command("web_search", "results")
+    command, hit = cache.pre_command("web_search", {"query": "dolly the sheep"})
+    assert command == CACHED_RESULT_COMMAND
+    assert cache.cached_result(**hit) == "results"
+
+    (tmp_path / "notes.txt").write_text("v1")
+    cache.pre_command("read_file", {"filename": "notes.txt"})
+    cache.post_command("read_file", "v1")
+    assert cache.lookup("read_file", {"filename": "notes.txt"})
+    time.sleep(0.01)
+    (tmp_path / "notes.txt").write_text("v2!")
+    assert cache.lookup("read_file", {"filename": "notes.txt"}) is None
+
+
+def test_cache_skips_errors_and_evicts(tmp_path):
+    cache = CommandCache(tmp_path / "cache.sqlite3", tmp_path, max_bytes=10)
+    cache.store("web_search", {"query": "a"}, "Error: offline")
+    assert cache.lookup("web_search", {"query": "a"}) is None
+
+    cache.store("web_search", {"query": "a"}, "123456")
+    cache.store("web_search", {"query": "b"}, "123456")
+    assert cache.lookup("web_search", {"query": "a"}) is None
+    assert cache.lookup("web_search", {"query": "b"})
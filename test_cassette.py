@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from autogpt_dolly_plugin.cassette import (
+    RECORD,
+    REPLAY,
+    REPLAYED_RESULT_COMMAND,
+    Cassette,
+    track,
+)
+
+
+def test_track_follows_spawn_order():
+    root = SimpleNamespace(parent=None, ordinal=0)
+    child = SimpleNamespace(parent=root, ordinal=2)
+    assert track(None) == track(root) == "0"
+    assert track(SimpleNamespace(parent=child, ordinal=1)) == "0.2.1"
+
+
+def test_replay_returns_recorded_results(tmp_path):
+    path = tmp_path / "run.jsonl"
+    child = SimpleNamespace(parent=SimpleNamespace(parent=None), ordinal=1)
+    recorder = Cassette(path, RECORD, live_commands=["create_agent"])
+    assert not recorder.before_chat(child, [{"content": "hi"}], "gpt-4")
+    assert recorder.after_chat(child, "reply") == "reply"
+    recorder.pre_command(child, "web_search", {"query": "x"})
+    recorder.post_command(child, "web_search", "results")
+    recorder.pre_command(child, "create_agent", {"name": "a"})
+    recorder.post_command(child, "create_agent", "spawned")
+    assert recorder.embedder(lambda text: [0.5, 0.5])("text") == [0.5, 0.5]
+    recorder.close()
+
+    player = Cassette(path, REPLAY, latency=False, live_commands=["create_agent"])
+    player.commands_installed = True
+    assert player.before_chat(child, [{"content": "hi"}], "gpt-4")
+    assert player.chat_result() == "reply"
+    command, arguments = player.pre_command(child, "web_search", {"query": "x"})
+    assert command == REPLAYED_RESULT_COMMAND
+    assert player.replayed_result(**arguments) == "results"
+    assert player.pre_command(child, "create_agent", {"name": "a"})[0] == "create_agent"
+    assert player.embedder(lambda text: None)("text") == [0.5, 0.5]
+    # Once its tape runs out an agent goes back to the model
+    assert not player.before_chat(child, [{"content": "more"}], "gpt-4")
+    assert (player.misses, player.diverged) == (1, 0)
+
+
+def test_embeddings_are_recorded_once_when_the_hooks_nest(tmp_path):
+    path = tmp_path / "run.jsonl"
+    recorder = Cassette(path, RECORD)
+
+    # get_embedding asking the plugin's text_embedding hook, which records too
+    def through_hooks(text):
+        return recorder.embedding(None, text, lambda text: [1.0, 0.0])
+
+    assert recorder.embedder(through_hooks)("text") == [1.0, 0.0]
+    assert recorder.embedding(None, "other", lambda text: [0.0, 1.0]) == [0.0, 1.0]
+    recorder.close()
+
+    player = Cassette(path, REPLAY, latency=False)
+    assert player.has_embedding("text") and player.has_embedding("other")
+    assert len(path.read_text().splitlines()) == 2
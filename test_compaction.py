@@ -0,0 +1,46 @@
+import json
+from types import SimpleNamespace
+
+from autogpt_dolly_plugin.compaction import DUPLICATE_NOTE, HistoryCompactor
+
+
+def message(role, content):
+    return SimpleNamespace(role=role, content=content)
+
+
+def cycle(n, output):
+    reply = json.dumps({"command": {"name": "web_search", "args": {"query": n}}})
+    return [message("assistant", reply), message("system", output)]
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def test_older_turns_fold_once_threshold_is_crossed():
+    history = SimpleNamespace(
+        messages=[m for n in range(3) for m in cycle(n, f"result {n} " * 20)],
+        summary="I was created",
+        last_trimmed_index=4,
+    )
+    compactor = HistoryCompactor(keep_turns=2, threshold=80, count_tokens=count_words)
+    assert compactor.compact(history) == 0
+    assert len(history.messages) == 6
+
+    history.messages += cycle(3, "result 3 " * 20)
+    saved = compactor.compact(history)
+    assert saved > 0 and compactor.saved_total == saved
+    assert len(history.messages) == 4
+    assert history.last_trimmed_index == 0
+    assert history.summary.splitlines()[1].startswith('- web_search({"query": 0})')
+
+
+def test_repeated_outputs_are_deduped():
+    history = SimpleNamespace(
+        messages=cycle(0, "same page") + cycle(1, "same page") + cycle(2, "same page"),
+        summary="",
+    )
+    compactor = HistoryCompactor(keep_turns=10, threshold=1000, count_tokens=len)
+    compactor.compact(history)
+    outputs = [m.content for m in history.messages if m.role == "system"]
+    assert outputs == ["same page", DUPLICATE_NOTE, "same page"]
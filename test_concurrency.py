@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+from autogpt_dolly_plugin import concurrency
+from autogpt_dolly_plugin.concurrency import AdaptiveLimiter, FlockAtCapacity
+from autogpt_dolly_plugin.events import LIMITER, EventLog
+
+
+@pytest.fixture(autouse=True)
+def idle_host(monkeypatch):
+    monkeypatch.setattr(concurrency, "host_load", lambda: (0.1, 10.0))
+
+
+def test_limit_grows_additively_up_to_ceiling():
+    limiter = AdaptiveLimiter(floor=1, ceiling=3, target_latency=10)
+    limiter._limit = 1
+    for _ in range(5):
+        assert limiter.acquire(timeout=0)
+        limiter.release(latency=1)
+    assert limiter.limit == 3
+    assert limiter.metrics()["increases"] == 5
+
+
+def test_slow_or_rate_limited_completions_halve_the_limit():
+    limiter = AdaptiveLimiter(floor=1, ceiling=8, target_latency=10)
+    limiter.acquire()
+    limiter.release(latency=60)
+    assert limiter.limit == 4
+
+    limiter.acquire()
+    limiter.release(latency=1, rate_limited=True)
+    assert limiter.limit == 2
+    assert limiter.metrics()["last_decision"]["action"] == "decrease"
+
+
+def test_limit_never_drops_below_floor():
+    limiter = AdaptiveLimiter(floor=2, ceiling=4, target_latency=1)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(latency=5)
+    assert limiter.limit == 2
+
+
+def test_slot_refuses_when_flock_is_full():
+    limiter = AdaptiveLimiter(floor=1, ceiling=1)
+    refused = []
+
+    def other_agent():
+        try:
+            with limiter.slot(timeout=0.01):
+                pass
+        except FlockAtCapacity as e:
+            refused.append(e)
+
+    with limiter.slot():
+        thread = threading.Thread(target=other_agent)
+        thread.start()
+        thread.join()
+    assert len(refused) == 1
+    assert limiter.metrics()["active"] == 0
+
+
+def test_nested_children_take_over_their_parents_slot():
+    limiter = AdaptiveLimiter(floor=1, ceiling=1, target_latency=10)
+    with limiter.slot():
+        # A child and grandchild run on their parent's thread while it waits
+        with limiter.slot(timeout=0):
+            with limiter.slot(timeout=0):
+                assert limiter.metrics()["active"] == 1
+    metrics = limiter.metrics()
+    assert metrics["active"] == 0 and metrics["completions"] == 3
+
+
+def test_a_waiting_agent_lends_its_slot_to_other_threads():
+    limiter = AdaptiveLimiter(floor=1, ceiling=1)
+    ran = []
+
+    def member():
+        with limiter.slot(timeout=1):
+            ran.append(limiter.metrics()["active"])
+
+    with limiter.slot():
+        with limiter.lend():
+            thread = threading.Thread(target=member)
+            thread.start()
+            thread.join()
+        assert limiter.metrics()["active"] == 1
+    assert ran == [1] and limiter.metrics()["active"] == 0
+
+
+def test_a_cancelled_agent_stops_waiting_for_a_slot():
+    limiter = AdaptiveLimiter(floor=1, ceiling=1)
+    cancelled = threading.Event()
+    refused = []
+
+    def member():
+        try:
+            with limiter.slot(cancelled=cancelled.is_set):
+                pass
+        except FlockAtCapacity as e:
+            refused.append(str(e))
+
+    with limiter.slot():
+        thread = threading.Thread(target=member)
+        thread.start()
+        cancelled.set()
+        thread.join(timeout=5)
+    assert refused == ["It was cancelled while waiting for a slot."]
+    assert limiter.metrics()["active"] == 0
+
+
+def test_limit_decisions_are_logged_as_events(tmp_path, monkeypatch):
+    events = EventLog(tmp_path / "events.jsonl")
+    monkeypatch.setattr(concurrency, "flock_events", events)
+    limiter = AdaptiveLimiter(floor=1, ceiling=4, target_latency=10)
+    with limiter.slot():
+        pass
+    limiter.acquire()
+    limiter.release(latency=60)
+
+    decisions = events.query(types=[LIMITER])
+    assert [event["action"] for event in decisions] == ["increase", "decrease"]
+    assert decisions[-1]["limit"] == 2 and decisions[-1]["active"] == 0
@@ -0,0 +1,26 @@
+from autogpt_dolly_plugin.contextpack import build_context_pack, workspace_manifest
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_context_pack_stays_within_budget():
+    summary = "\n".join(f"Step {n}: searched and saved results" for n in range(50))
+    memories = [f"- fact number {n}" for n in range(50)]
+    pack = build_context_pack(summary, memories, ["- notes.txt"], 60, count_words)
+    assert count_words(pack) <= 60
+    assert pack.startswith("What your parent agent has done so far:\nStep 0")
+    assert "Relevant memories:\n- fact number 0" in pack
+    assert build_context_pack("", [], [], 60, count_words) == ""
+
+
+def test_manifest_lists_recent_work_files(tmp_path):
+    (tmp_path / "report.md").write_text("# Report")
+    (tmp_path / "dolly_flock.sqlite3").write_text("")
+    (tmp_path / "child").mkdir()
+    (tmp_path / "child" / "output.txt").write_text("done")
+    assert sorted(workspace_manifest(tmp_path)) == [
+        "child/output.txt (4 bytes)",
+        "report.md (8 bytes)",
+    ]
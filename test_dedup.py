@@ -0,0 +1,50 @@
+from autogpt_dolly_plugin.dedup import GoalIndex, signature, similarity
+from autogpt_dolly_plugin.lifecycle import AgentNode
+from autogpt_dolly_plugin.registry import FlockRegistry
+
+
+def test_similarity_ignores_case_punctuation_and_goal_order():
+    goals = ["Search the web for Dolly the sheep.", "Save a summary to dolly.txt"]
+    rephrased = ["save a summary to Dolly.txt", "search web for dolly the sheep!"]
+    other = ["Write a Python web scraper", "Run its unit tests"]
+    assert similarity(signature(goals), signature(rephrased)) == 1.0
+    assert similarity(signature(goals), signature(other)) < 0.3
+
+
+def test_goal_index_matches_active_and_recent_agents(tmp_path):
+    registry = FlockRegistry(tmp_path / "flock.sqlite3")
+    index = GoalIndex(registry, threshold=0.8, window=3600)
+    goals = ["Research cloning history", "Write a report on cloning history"]
+    registry.register("a1", "researcher")
+    index.add("a1", goals)
+
+    record, score = index.match(goals + ["Write a report"])
+    assert record["id"] == "a1" and score >= 0.8
+    assert index.match(goals, exclude=["a1"]) is None
+    assert index.match(["Design a logo"]) is None
+
+    registry.update("a1", status="finished", result="/workspace/researcher")
+    assert index.wait("a1", waiter=None)["result"] == "/workspace/researcher"
+    assert index.match(goals)[0]["id"] == "a1"
+    registry.update("a1", status="failed")
+    assert index.match(goals) is None
+
+
+def test_wait_returns_none_when_the_duplicate_waits_on_the_waiter(tmp_path):
+    registry = FlockRegistry(tmp_path / "flock.sqlite3")
+    index = GoalIndex(registry)
+    first, second = AgentNode("first"), AgentNode("second")
+    first_child = AgentNode("first child", parent=first)
+    for node in (first, second, first_child):
+        parent_id = node.parent.id if node.parent else None
+        registry.register(node.id, node.name, parent_id=parent_id, status="running")
+
+    # The first agent's child waits on the second agent, which now asks for
+    # the first agent's result: neither would ever finish
+    registry.set_wait(first_child.id, second.id)
+    assert index.wait(first.id, second) is None
+    assert second.id not in registry.waits()
+
+    registry.clear_wait(first_child.id)
+    expired = AgentNode("expired", parent=second, deadline=0.001)
+    assert index.wait(first.id, expired)["status"] == "running"
@@ -0,0 +1,70 @@
+import json
+
+from autogpt_dolly_plugin.earlystop import (
+    ARTIFACTS_PRESENT,
+    COMPLETION_SIGNAL,
+    NO_PROGRESS,
+    CompletionDetector,
+)
+
+
+def reply(command="web_search", args=None, text="Searching"):
+    return json.dumps(
+        {
+            "thoughts": {"text": text, "plan": "- search"},
+            "command": {"name": command, "args": args or {"query": "dolly"}},
+        }
+    )
+
+
+def test_completion_signal_and_no_progress(tmp_path):
+    detector = CompletionDetector(["Find facts about Dolly"], tmp_path, idle_cycles=2)
+    assert detector.observe(reply(args={"query": "a"})) is None
+    assert detector.observe(reply()) is None
+    assert detector.observe(reply()) is None
+    assert detector.observe(reply()) == NO_PROGRESS
+
+    detector = CompletionDetector(["Find facts about Dolly"], tmp_path)
+    assert detector.observe(reply(text="All goals are now complete.")) == (
+        COMPLETION_SIGNAL
+    )
+    assert detector.observe(reply("goals_accomplished", text="Goals done")) is None
+
+
+def test_artifacts_from_goals_must_exist_and_settle(tmp_path):
+    detector = CompletionDetector(["Write a summary to notes/dolly.md"], tmp_path)
+    assert detector.artifacts == ["notes/dolly.md"]
+    assert detector.observe(reply(args={"query": "a"})) is None
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "notes" / "dolly.md").write_text("# Dolly")
+    assert detector.observe(reply(args={"query": "b"})) is None
+    assert detector.observe(reply(args={"query": "c"})) == ARTIFACTS_PRESENT
+
+
+def test_only_sentences_stating_completion_count(tmp_path):
+    detector = CompletionDetector(["Find facts about Dolly"], tmp_path)
+    hedged = reply(text="I will write the file once the task is done.")
+    assert detector.observe(hedged) is None
+    plan = json.dumps(
+        {
+            "thoughts": {"text": "Searching", "plan": "- stop. All goals are done"},
+            "command": {"name": "web_search", "args": {"query": "x"}},
+        }
+    )
+    assert detector.observe(plan) is None
+    assert detector.observe(reply(text="Saved it. The task is done.")) == (
+        COMPLETION_SIGNAL
+    )
+
+
+def test_existing_inputs_are_not_artifacts_until_changed(tmp_path):
+    (tmp_path / "sales.csv").write_text("q1,10\n")
+    detector = CompletionDetector(["Analyze sales.csv"], tmp_path)
+    assert detector.observe(reply(args={"query": "a"})) is None
+    assert detector.observe(reply(args={"query": "b"})) is None
+    assert detector.observe(reply(args={"query": "c"})) is None
+
+    detector = CompletionDetector(["Analyze sales.csv into report.md"], tmp_path)
+    (tmp_path / "report.md").write_text("# Sales")
+    assert detector.observe(reply(args={"query": "a"})) is None
+    assert detector.observe(reply(args={"query": "b"})) == ARTIFACTS_PRESENT
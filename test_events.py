@@ -0,0 +1,33 @@
+from autogpt_dolly_plugin.events import CYCLE, FINISHED, REQUESTED, EventLog
+
+
+def test_query_by_agent_type_and_time(tmp_path):
+    log = EventLog(tmp_path / "events.jsonl")
+    log.emit(REQUESTED, "a1", None, name="root")
+    log.emit(REQUESTED, "a2", "a1", name="child")
+    middle = log.emit(CYCLE, "a2", "a1", cycle=1)["time"]
+    log.emit(FINISHED, "a2", "a1", result="done")
+
+    assert [e["type"] for e in log.query(agents=["a2"])] == [
+        REQUESTED,
+        CYCLE,
+        FINISHED,
+    ]
+    assert [e["agent"] for e in log.query(types=[REQUESTED])] == ["a1", "a2"]
+    assert [e["type"] for e in log.query(since=middle)] == [CYCLE, FINISHED]
+    assert log.query(agents=["a2"], types=[FINISHED])[0]["parent"] == "a1"
+
+
+def test_index_catches_up_with_unindexed_lines(tmp_path):
+    log = EventLog(tmp_path / "events.jsonl")
+    log.emit(REQUESTED, "a1")
+    log.emit(FINISHED, "a1")
+    log.close()
+    # Lose the second index record and tear the first
+    index = tmp_path / "events.jsonl.idx"
+    index.write_bytes(index.read_bytes()[:30])
+
+    reopened = EventLog(tmp_path / "events.jsonl")
+    assert [e["type"] for e in reopened.query(agents=["a1"])] == [REQUESTED, FINISHED]
+    reopened.emit(CYCLE, "a1", cycle=1)
+    assert len(reopened.query()) == 3
@@ -0,0 +1,69 @@
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from autogpt_dolly_plugin.handoff import HandoffStore, handles_in
+
+
+def test_payloads_are_shared_and_deleted_with_their_last_holder(tmp_path):
+    store = HandoffStore(tmp_path / "scratch")
+    (tmp_path / "corpus.txt").write_bytes(b"0123456789" * 1000)
+    handle = store.put_file(tmp_path / "corpus.txt", ["parent", "child"])
+    assert handles_in(f"Summarize {handle}, then {handle}") == [handle]
+    assert store.holders(handle) == ["child", "parent"]
+
+    # Agents of one process share a single read-only mapping
+    assert store.read(handle, 5, 10) == b"5678901234"
+    view = store.open(handle)
+    assert view.readonly and len(view) == 10000
+    view.release()
+
+    store.release_holder("child")
+    assert store.has(handle)
+    store.release(handle, "parent")
+    assert not store.has(handle)
+    assert store.handles() == []
+
+
+def test_payloads_of_exited_processes_are_collected(tmp_path):
+    store = HandoffStore(tmp_path)
+    handle = store.put(b"results", ["gone"])
+    (tmp_path / f"{handle}.refs" / "gone").write_text(str(2**22 + 1))
+    assert store.collect() == 1
+    assert not store.has(handle)
+
+
+def test_scratch_directory_and_payloads_are_private(tmp_path):
+    store = HandoffStore(tmp_path / "scratch")
+    handle = store.put(b"secret", ["agent"])
+    assert stat.S_IMODE(os.stat(store.root).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(store.path(handle)).st_mode) == 0o400
+
+    # A directory planted under the flock's name is refused, not reused
+    (tmp_path / "planted").mkdir()
+    (tmp_path / "link").symlink_to(tmp_path / "planted")
+    with pytest.raises(PermissionError):
+        HandoffStore(tmp_path / "link")
+    if os.getuid() == 0:
+        os.chown(tmp_path / "planted", 12345, 12345)
+        with pytest.raises(PermissionError, match="another user"):
+            HandoffStore(tmp_path / "planted")
+
+
+def test_new_payloads_are_held_before_they_appear(tmp_path, monkeypatch):
+    store = HandoffStore(tmp_path)
+    seen = []
+    replace = os.replace
+
+    # Another process collects the moment the payload appears
+    def collecting_replace(source, target):
+        replace(source, target)
+        seen.append(store.holders(Path(target).name))
+        store.collect()
+
+    monkeypatch.setattr(os, "replace", collecting_replace)
+    handle = store.put(b"results", ["agent"])
+    assert seen == [["agent"]]
+    assert store.has(handle)
@@ -0,0 +1,43 @@
+import threading
+
+from autogpt_dolly_plugin.hedging import Hedge, hedge_delay
+from autogpt_dolly_plugin.lifecycle import AgentNode
+
+
+def test_hedge_delay_needs_history():
+    assert hedge_delay([1.0, 2.0], 95) is None
+    assert hedge_delay([float(n) for n in range(1, 101)], 95) == 95.0
+    assert hedge_delay([float(n) for n in range(1, 101)], 0) is None
+
+
+def test_first_result_wins_and_cancels_the_other():
+    root = AgentNode("root")
+    primary = AgentNode("worker", parent=root)
+    finished = threading.Event()
+
+    def replica(hedge):
+        node = AgentNode("worker-hedge", parent=root)
+        assert hedge.attach(node)
+        finished.set()
+        return "replica result"
+
+    hedge = Hedge(primary, 0.01, replica)
+    hedge.start()
+    assert finished.wait(1)
+    hedge._timer.join()
+    for _ in range(100):
+        if hedge.winner:
+            break
+        finished.wait(0.01)
+    assert hedge.lost("primary") and hedge.result == "replica result"
+    assert primary.cancelled and not hedge.replica.cancelled
+    assert not hedge.settle("primary", "late")
+
+
+def test_primary_exit_cancels_running_replica():
+    primary = AgentNode("worker", parent=AgentNode("root"))
+    hedge = Hedge(primary, 60, lambda hedge: None)
+    hedge.replica = AgentNode("worker-hedge")
+    hedge.start()
+    hedge.stop()
+    assert hedge.replica.cancelled and hedge.winner is None
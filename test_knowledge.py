@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from autogpt_dolly_plugin.knowledge import FlockKnowledge, FlockMemory
+from autogpt_dolly_plugin.registry import FlockRegistry
+
+WORDS = ["sheep", "clone", "python", "weather"]
+
+
+def embed(text):
+    return [float(text.lower().count(word)) for word in WORDS]
+
+
+def test_findings_are_stored_once_and_scoped(tmp_path):
+    calls = []
+    knowledge = FlockKnowledge(
+        tmp_path / "knowledge.sqlite3", lambda text: calls.append(text) or embed(text)
+    )
+    assert knowledge.add("Dolly the sheep was a clone", "a1", ["biology"])
+    assert not knowledge.add("Dolly  the sheep was a clone", "a2")
+    assert knowledge.add("Python is a language", "a2")
+    assert knowledge.stats() == {"documents": 2, "references": 3}
+    assert len(calls) == 2
+
+    top = knowledge.search("sheep clone", k=1)[0]
+    assert top["agents"] == ["a1", "a2"] and top["tags"] == ["biology"]
+    own = knowledge.search("sheep clone", agent_ids=["a1"])
+    assert [result["content"] for result in own] == ["Dolly the sheep was a clone"]
+    assert knowledge.search("sheep clone", agent_ids=[]) == []
+
+
+def test_search_only_scores_the_scoped_agents_findings(tmp_path):
+    knowledge = FlockKnowledge(tmp_path / "knowledge.sqlite3", embed)
+    for index in range(50):
+        knowledge.add(f"Finding {index} about the weather", f"agent-{index}")
+    knowledge.add("The sheep was cloned", "agent-7")
+    # More agents than SQLite allows parameters in one statement
+    scope = ["agent-7"] + [f"absent-{index}" for index in range(40000)]
+    results = knowledge.search("sheep", agent_ids=scope, k=10)
+    assert [result["content"] for result in results] == [
+        "The sheep was cloned",
+        "Finding 7 about the weather",
+    ]
+    assert all(result["agents"] == ["agent-7"] for result in results)
+
+
+def test_registry_tree_spans_the_whole_flock(tmp_path):
+    registry = FlockRegistry(tmp_path / "flock.sqlite3")
+    registry.register("root", "Root")
+    registry.register("a1", "A1", parent_id="root")
+    registry.register("a2", "A2", parent_id="root")
+    registry.register("b1", "B1", parent_id="a1")
+    registry.register("other", "Other")
+    assert sorted(registry.tree("b1")) == ["a1", "a2", "b1", "root"]
+
+
+class ListMemory(list):
+    def add(self, item):
+        self.append(item)
+
+
+def test_memories_embed_and_hold_each_text_once(tmp_path):
+    calls = []
+    knowledge = FlockKnowledge(
+        tmp_path / "knowledge.sqlite3", lambda text: calls.append(text) or embed(text)
+    )
+    assert knowledge.embedding("Dolly the sheep") == embed("Dolly the sheep")
+    assert knowledge.embedding("Dolly  the sheep") == embed("Dolly the sheep")
+    # A finding with a text a memory already embedded is not embedded again
+    assert knowledge.add("Dolly the sheep", "a1")
+    assert len(calls) == 1
+
+    memory = FlockMemory(ListMemory())
+    memory.add(SimpleNamespace(raw_content="Dolly the sheep"))
+    memory.add(SimpleNamespace(raw_content="Dolly  the sheep"))
+    assert len(memory) == 1
@@ -0,0 +1,82 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt_dolly_plugin.lifecycle import AgentCancelled, AgentTree
+
+
+@pytest.fixture
+def tree():
+    return AgentTree()
+
+
+@pytest.fixture
+def root(tree):
+    agent = SimpleNamespace(ai_config=SimpleNamespace(ai_name="root"))
+    return tree.root_for(agent, tree_timeout=60)
+
+
+def test_child_deadline_never_exceeds_parent(tree, root):
+    child = tree.spawn("child", root, timeout=600)
+    grandchild = tree.spawn("grandchild", child)
+    assert child.deadline == root.deadline
+    assert grandchild.deadline == root.deadline
+
+
+def test_cancel_cascades_to_descendants(tree, root):
+    child = tree.spawn("child", root)
+    grandchild = tree.spawn("grandchild", child)
+    sibling = tree.spawn("sibling", root)
+
+    child.cancel("parent cancelled")
+
+    assert grandchild.cancelled
+    assert grandchild.cancel_reason == "parent cancelled"
+    assert not sibling.cancelled
+    assert not root.cancelled
+
+
+def test_checkpoint_raises_once_deadline_passes(tree, root):
+    child = tree.spawn("child", root, timeout=0.05)
+    with pytest.raises(AgentCancelled, match="deadline exceeded"):
+        with tree.running(child, grace=10):
+            while True:
+                time.sleep(0.01)
+                tree.checkpoint()
+    assert tree.get(child.id) is None
+
+
+def test_stuck_agent_is_interrupted_after_grace(tree, root):
+    child = tree.spawn("child", root, timeout=0.05)
+    with pytest.raises(AgentCancelled):
+        with tree.running(child, grace=0.05):
+            while True:
+                time.sleep(0.01)
+
+
+def test_checkpoint_ignores_top_level_agent(tree, root):
+    root.cancel()
+    with tree.running(root):
+        tree.checkpoint()
+
+
+def test_cancelled_agent_without_deadline_is_interrupted(tree, root):
+    child = tree.spawn("child", root)
+    threading.Timer(0.05, child.cancel, args=("replaced",)).start()
+    with pytest.raises(AgentCancelled):
+        with tree.running(child, grace=0.05):
+            while True:
+                time.sleep(0.01)
+
+
+def test_forced_cancellation_is_not_swallowed_by_command_errors(tree, root):
+    child = tree.spawn("child", root, timeout=0.05)
+    with pytest.raises(AgentCancelled):
+        with tree.running(child, grace=0.05):
+            while True:
+                try:
+                    time.sleep(0.01)  # a command, run the way Auto-GPT runs them
+                except Exception as e:
+                    pytest.fail(f"cancellation caught as a command error: {e!r}")
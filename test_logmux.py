@@ -0,0 +1,65 @@
+import threading
+
+from autogpt_dolly_plugin.logmux import AgentLog, LogMux
+
+
+def test_tail_reads_ring_then_disk(tmp_path):
+    log = AgentLog(tmp_path / "a1", "a1", ring_size=10)
+    for n in range(200):
+        log.write("stdout", f"line {n}\n")
+    log.write("stderr", "partial ")
+    assert [line.text for line in log.tail(3)] == ["line 197", "line 198", "line 199"]
+    assert [line.seq for line in log.tail(150)] == list(range(50, 200))
+    log.write("stderr", "done\n")
+    assert log.tail(1)[0].text == "partial done"
+    log.close()
+
+    reopened = AgentLog(tmp_path / "a1", "a1")
+    assert reopened.next_seq == 201
+    assert [line.text for line in reopened.read(100, 102)] == ["line 100", "line 101"]
+
+
+def test_follow_and_merged_view(tmp_path):
+    mux = LogMux()
+    mux.configure(tmp_path)
+    mux.write("a1", "stdout", "first\n")
+    threading.Timer(0.05, mux.write, args=("a2", "stdout", "second\n")).start()
+    assert mux.follow("a2", timeout=5)[0].text == "second"
+    assert mux.follow("a1", after=0, timeout=0.01) == []
+    assert [line.text for line in mux.merged(10)] == ["first", "second"]
+
+
+def test_rotated_segments_compress_and_stay_readable(tmp_path):
+    log = AgentLog(tmp_path / "a1", "a1", ring_size=1, max_bytes=4000)
+    for n in range(500):
+        log.write("stdout", f"line {n}\n")
+    segments = log.segments()
+    assert len(segments) > 2
+    assert all(path.suffix in (".gz", ".zst") for path in segments[:-1])
+    assert [line.text for line in log.read(130, 132)] == ["line 130", "line 131"]
+    assert [line.seq for line in log.tail(400)] == list(range(100, 500))
+    middle = log.read(250, 251)[0].time
+    assert log.between(middle, middle)[0].seq == 250
+
+
+def test_quota_evicts_oldest_rotated_segments(tmp_path):
+    mux = LogMux()
+    mux.configure(tmp_path, max_bytes=2000, quota=6000)
+    for n in range(1000):
+        mux.write("a1", "stdout", f"line {n} " + "x" * 40 + "\n")
+    mux._compressor.shutdown(wait=True)
+    assert mux.enforce_quota() == 0
+    used = sum(path.stat().st_size for path in tmp_path.glob("*/*"))
+    assert used <= 6000 + 2100
+    assert mux.tail("a1", 1)[0].text.startswith("line 999")
+    assert mux.log("a1").read(0, 1) == []
+
+
+def test_reading_unknown_agents_creates_nothing(tmp_path):
+    mux = LogMux()
+    mux.configure(tmp_path)
+    mux.write("a1", "stdout", "hello\n")
+    assert mux.tail("typo") == []
+    assert [line.text for line in mux.between(0, names=["a1", "typo"])] == ["hello"]
+    assert [path.name for path in tmp_path.iterdir()] == ["a1"]
+    assert mux.names() == ["a1"]
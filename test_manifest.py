@@ -0,0 +1,66 @@
+import pytest
+import yaml
+
+from autogpt_dolly_plugin.manifest import (
+    ManifestError,
+    SettingsTemplate,
+    parse_manifest,
+    provision,
+)
+
+TEAM = {
+    "team": "study",
+    "defaults": {"limits": {"timeout": 600}},
+    "agents": [
+        {
+            "name": "reporter",
+            "role": "writes reports",
+            "goals": ["Write report.md: use 'products.csv'"],
+            "depends_on": ["scraper"],
+            "limits": {"cycles": 10},
+        },
+        {"name": "scraper", "role": "scrapes", "goals": "Save products.csv"},
+    ],
+}
+
+
+def test_agents_come_after_their_dependencies():
+    manifest = parse_manifest(TEAM)
+    assert [spec.name for spec in manifest.agents] == ["scraper", "reporter"]
+    reporter = manifest.get("reporter")
+    assert (reporter.timeout, reporter.cycles) == (600.0, 10)
+
+
+def test_every_problem_is_reported_at_once():
+    broken = {
+        "agents": [
+            {"name": "a", "goals": ["x"], "depends_on": ["b"]},
+            {"name": "b", "goals": ["y"], "depends_on": ["a"]},
+            {"name": "c", "goals": [], "depends_on": ["missing"], "cpu": 2},
+        ]
+    }
+    with pytest.raises(ManifestError) as error:
+        parse_manifest(broken)
+    message = str(error.value)
+    assert "agent 'c': needs at least one goal" in message
+    assert "unknown keys cpu" in message
+    assert "unknown dependency 'missing'" in message
+
+    del broken["agents"][2]
+    with pytest.raises(ManifestError, match="dependency cycle between a, b"):
+        parse_manifest(broken)
+
+
+def test_provision_renders_valid_settings(tmp_path):
+    manifest = parse_manifest(TEAM)
+    settings = provision(manifest, tmp_path, SettingsTemplate.load())
+    assert settings["reporter"] == tmp_path / "study" / "reporter" / "ai_settings.yaml"
+    rendered = yaml.safe_load(settings["reporter"].read_text())
+    assert rendered == {
+        "ai_name": "reporter",
+        "ai_role": "writes reports",
+        "ai_goals": ["Write report.md: use 'products.csv'"],
+    }
+
+    with pytest.raises(ManifestError, match="unknown template placeholders: AGE"):
+        SettingsTemplate("ai_name: <NAME>, <AGE>")
@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+from autogpt_dolly_plugin.memwatch import MemoryAccountant
+
+
+class Agent:
+    def __init__(self):
+        self.history = [bytearray(256 * 1024)]
+
+
+def test_reports_retained_memory_and_survivors():
+    accountant = MemoryAccountant()
+    leaks = []
+    try:
+        first = SimpleNamespace(id="a1", name="first")
+        accountant.before(first)
+        agent = Agent()
+        accountant.track(first, agent=agent)
+        del agent
+        assert accountant.after(first).survivors == []
+
+        second = SimpleNamespace(id="a2", name="second")
+        accountant.before(second)
+        agent = Agent()
+        accountant.track(second, agent=agent)
+        leaks.append(agent)
+        del agent
+        report = accountant.after(second)
+        assert report.survivors == ["agent (held by list)"]
+        assert report.retained_bytes >= 256 * 1024
+    finally:
+        accountant.stop()
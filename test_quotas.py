@@ -0,0 +1,75 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt_dolly_plugin.lifecycle import AgentTree
+from autogpt_dolly_plugin.quotas import QuotaExceeded, TreeQuotas
+
+
+@pytest.fixture
+def tree():
+    return AgentTree()
+
+
+@pytest.fixture
+def root(tree):
+    return tree.root_for(SimpleNamespace(ai_config=SimpleNamespace(ai_name="root")))
+
+
+def test_max_depth(tree, root):
+    quotas = TreeQuotas(max_depth=2)
+    child = tree.spawn("child", root, quotas=quotas)
+    grandchild = tree.spawn("grandchild", child, quotas=quotas)
+    with pytest.raises(QuotaExceeded, match="2 levels deep"):
+        tree.spawn("great-grandchild", grandchild, quotas=quotas)
+
+
+def test_max_fanout_counts_finished_children(tree, root):
+    quotas = TreeQuotas(max_fanout=2)
+    for name in ("a", "b"):
+        tree.retire(tree.spawn(name, root, quotas=quotas))
+    with pytest.raises(QuotaExceeded, match="already spawned its 2 agents"):
+        tree.spawn("c", root, quotas=quotas)
+
+
+def test_max_descendants_per_root(tree, root):
+    quotas = TreeQuotas(max_descendants=3)
+    child = tree.spawn("child", root, quotas=quotas)
+    tree.spawn("grandchild-1", child, quotas=quotas)
+    tree.spawn("grandchild-2", child, quotas=quotas)
+    with pytest.raises(QuotaExceeded, match="agent tree"):
+        tree.spawn("sibling", root, quotas=quotas)
+    assert root.spawned == 1
+    assert root.spawned_total == 3
+
+
+def test_remote_root_keeps_its_place_in_the_tree(tree):
+    agent = SimpleNamespace(ai_config=SimpleNamespace(ai_name="remote"))
+    root = tree.root_for(agent, depth=1, spawned=2, deadline=time.time() + 30)
+    assert root.depth == 1 and 25 < root.remaining() <= 30
+
+    quotas = TreeQuotas(max_depth=2, max_descendants=3)
+    child = tree.spawn("child", root, quotas=quotas)
+    assert child.depth == 2 and child.deadline == root.deadline
+    with pytest.raises(QuotaExceeded, match="2 levels deep"):
+        tree.spawn("grandchild", child, quotas=quotas)
+    with pytest.raises(QuotaExceeded, match="agent tree"):
+        tree.spawn("sibling", root, quotas=quotas)
+
+
+def test_a_team_counts_as_one_child(tree, root):
+    quotas = TreeQuotas(max_descendants=3, max_fanout=2, max_team_size=4)
+    with pytest.raises(QuotaExceeded, match="at most 4 agents"):
+        tree.spawn_team(root, 5, quotas=quotas)
+    tree.spawn_team(root, 4, quotas=quotas)
+    members = [tree.spawn(f"m{i}", root, quotas=quotas, member=True) for i in range(4)]
+    assert (root.spawned, root.spawned_total) == (1, 1)
+    assert [member.ordinal for member in members] == [1, 2, 3, 4]
+
+    # Members' own children count as usual
+    tree.spawn("child", members[0], quotas=quotas)
+    assert root.spawned_total == 2
+    tree.spawn("sibling", root, quotas=quotas)
+    with pytest.raises(QuotaExceeded, match="already spawned its 2"):
+        tree.spawn_team(root, 1, quotas=quotas)
@@ -0,0 +1,54 @@
+import os
+import threading
+
+import pytest
+
+from autogpt_dolly_plugin.registry import FlockRegistry, get_registry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return FlockRegistry(tmp_path / "flock.sqlite3")
+
+
+def test_register_and_update_lifecycle(registry):
+    registry.register("root", "Root", status="running", pid=os.getpid())
+    registry.register("a1", "Researcher", parent_id="root", persona="analyst")
+    assert registry.get("a1")["status"] == "requested"
+
+    registry.update("a1", status="running")
+    assert registry.get("a1")["started_at"] is not None
+    assert [r["id"] for r in registry.running_children("root")] == ["a1"]
+
+    registry.update("a1", status="finished", result="/workspace/Researcher")
+    record = registry.get("a1")
+    assert record["finished_at"] is not None
+    assert record["result"] == "/workspace/Researcher"
+    assert registry.running_children("root") == []
+    assert [r["id"] for r in registry.children("root", "finished")] == ["a1"]
+
+
+def test_registry_is_thread_safe(registry):
+    def register_many(prefix):
+        for i in range(20):
+            registry.register(f"{prefix}-{i}", f"agent-{prefix}-{i}", parent_id="p")
+
+    threads = [threading.Thread(target=register_many, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(registry.children("p")) == 80
+
+
+def test_registry_survives_restart_and_reaps_dead_agents(tmp_path):
+    path = tmp_path / "flock.sqlite3"
+    first = FlockRegistry(path)
+    first.register("alive", "Alive", status="running", pid=os.getpid())
+    first.register("dead", "Dead", status="running", pid=2**22 + 1)
+    first.close()
+
+    reopened = get_registry(path)
+    assert reopened.find("Alive")[0]["status"] == "running"
+    assert reopened.get("dead")["status"] == "lost"
+    assert reopened.by_status("lost")[0]["name"] == "Dead"
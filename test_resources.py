@@ -0,0 +1,36 @@
+import threading
+import time
+
+from autogpt_dolly_plugin.resources import ResourceHub
+
+
+def test_builds_each_resource_once_across_threads():
+    hub = ResourceHub()
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(hub.get("encoding", build)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len({id(result) for result in results}) == 1
+    assert hub.stats()["encoding"]["borrows"] == 8
+
+
+def test_token_counter_is_shared():
+    hub = ResourceHub()
+    count = hub.token_counter("gpt-3.5-turbo")
+    assert hub.token_counter("gpt-3.5-turbo") is count
+    assert count("hello world") > 0
+    assert hub.stats()[("token_counter", "gpt-3.5-turbo")]["borrows"] == 2
@@ -0,0 +1,55 @@
+import json
+import os
+
+from autogpt_dolly_plugin.routing import ModelRouter, load_rules
+
+
+def test_hints_match_whole_words_only():
+    features = ModelRouter.features(
+        "a1", "", ["Explain the planet names", "Plan and analyze the design"], ""
+    )
+    assert features["smart_hits"] == 3
+    assert features["fast_hits"] == 0
+
+
+def test_complexity_and_rules_pick_the_model():
+    router = ModelRouter("fast-llm", "smart-llm", threshold=2)
+    decision = router.route("a1", "", ["Download the report and save it"])
+    assert decision.model == "fast-llm"
+    decision = router.route("a2", "", ["Design a strategy", "Evaluate the plan"])
+    assert decision.model == "smart-llm"
+
+    rules = [{"field": "name", "pattern": "^a2$", "model": "fast"}]
+    router = ModelRouter("fast-llm", "smart-llm", rules=tuple(rules))
+    assert router.route("a2", "", ["Design a strategy"]).tier == "fast"
+
+
+def test_rules_are_reloaded_when_the_file_changes(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"field": "role", "pattern": "x", "model": "fast"}]))
+    assert load_rules(str(path))[0]["model"] == "fast"
+    assert load_rules(str(path)) is load_rules(str(path))
+
+    path.write_text(json.dumps([{"field": "role", "pattern": "x", "model": "smart"}]))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_rules(str(path))[0]["model"] == "smart"
+
+
+def test_unusable_rules_files_fall_back_to_complexity(tmp_path, caplog):
+    missing = str(tmp_path / "missing.json")
+    assert load_rules(missing) == ()
+    for name, document in [
+        ("broken.json", "[{"),
+        ("object.json", json.dumps({"field": "role"})),
+        ("no_model.json", json.dumps([{"field": "role", "pattern": "x"}])),
+        (
+            "bad_pattern.json",
+            json.dumps([{"field": "role", "pattern": "(", "model": "fast"}]),
+        ),
+    ]:
+        path = tmp_path / name
+        path.write_text(document)
+        assert load_rules(str(path)) == ()
+    load_rules(missing)
+    assert len(caplog.records) == 5
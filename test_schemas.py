@@ -0,0 +1,54 @@
+import pytest
+
+from autogpt_dolly_plugin import COMMANDS
+from autogpt_dolly_plugin.schemas import SchemaError, compile_commands
+from autogpt_dolly_plugin.shepherd import Shepherd
+
+
+def count_words(text):
+    return len(text.replace("_", " ").split())
+
+
+def test_plugin_commands_compile():
+    schemas = compile_commands(COMMANDS, Shepherd, count_words, strict=True)
+    assert [schema.name for schema in schemas] == list(COMMANDS)
+    assert len({schema.label for schema in schemas}) == len(schemas)
+    create = schemas[1]
+    assert create.label == "spawn"
+    assert create.description == min(COMMANDS["create_agent"]["description"], key=len)
+    assert create.params["goals"] == "list[str]"
+    assert "agent" not in create.params and create.params["force"] == "bool"
+
+
+class Owner:
+    @classmethod
+    def first(cls, text: str, agent=None) -> str:
+        return text
+
+    @classmethod
+    def second(cls, text: str, agent=None) -> str:
+        return text
+
+    @classmethod
+    def loose(cls, text, agent=None) -> str:
+        return text
+
+
+def test_shared_aliases_are_not_used_as_labels():
+    commands = {
+        "first": {"description": "One.", "aliases": ["go"]},
+        "second": {"description": "Two.", "aliases": ["go", "do_second"]},
+    }
+    labels = [s.label for s in compile_commands(commands, Owner, count_words)]
+    assert labels == ["first", "second"]
+
+
+def test_invalid_commands_are_left_out():
+    commands = {
+        "first": {"description": "Same.", "aliases": []},
+        "second": {"description": "Same.", "aliases": []},
+        "loose": {"description": "Untyped.", "aliases": []},
+    }
+    assert [s.name for s in compile_commands(commands, Owner, count_words)] == ["first"]
+    with pytest.raises(SchemaError):
+        compile_commands(commands, Owner, count_words, strict=True)
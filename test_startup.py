@@ -0,0 +1,10 @@
+from autogpt_dolly_plugin.startup import measure
+
+
+def test_plugin_load_skips_heavy_imports():
+    report = measure()
+    modules = {entry.module for entry in report.imports}
+    assert "autogpt_dolly_plugin" in modules
+    assert "autogpt_dolly_plugin.shepherd" not in modules
+    assert not report.heavy()
+    assert report.init_seconds > 0
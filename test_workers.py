@@ -0,0 +1,132 @@
+import sys
+
+import pytest
+
+from autogpt_dolly_plugin.workers import (
+    BlobStore,
+    Coordinator,
+    RemoteDispatcher,
+    Worker,
+    WorkerError,
+    _request,
+)
+
+TOKEN = "flock-secret"
+
+# Stands in for Auto-GPT: reads an input file, writes a result into the workspace
+AGENT_SCRIPT = """
+import pathlib, sys
+workspace = pathlib.Path(sys.argv[1])
+print("working on", (workspace / "input.txt").read_text(), flush=True)
+(workspace / "result.txt").write_text("done")
+"""
+
+
+def start_cluster(tmp_path, capacity):
+    coordinator = Coordinator(token=TOKEN).start()
+    workers = [
+        Worker(
+            tmp_path / f"worker-{n}",
+            coordinator_url=coordinator.url,
+            capacity=capacity,
+            command=[sys.executable, "-c", AGENT_SCRIPT, "{workspace}"],
+            token=TOKEN,
+        ).start()
+        for n in range(2)
+    ]
+    return coordinator, workers
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    coordinator, workers = start_cluster(tmp_path, capacity=1)
+    yield coordinator, workers
+    for worker in workers:
+        worker.stop()
+    coordinator.stop()
+
+
+def test_blob_store_round_trip(tmp_path):
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    (source / "sub" / "a.txt").write_text("same")
+    (source / "b.txt").write_text("same")
+    store = BlobStore(tmp_path / "blobs")
+
+    manifest = store.snapshot(source)
+
+    assert manifest["sub/a.txt"] == manifest["b.txt"]
+    store.materialize(manifest, tmp_path / "copy")
+    assert (tmp_path / "copy" / "sub" / "a.txt").read_text() == "same"
+
+
+def test_agents_run_on_a_worker_and_sync_back(cluster, tmp_path):
+    coordinator, workers = cluster
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "input.txt").write_text("the task")
+    output = []
+
+    dispatcher = RemoteDispatcher(coordinator.url, tmp_path / "cache", TOKEN)
+    info = dispatcher.run(
+        {"name": "remote-1", "goals": ["g"]},
+        workspace,
+        on_output=output.append,
+        poll_interval=0.05,
+    )
+
+    assert info["status"] == "finished"
+    assert info["changed"] == {"result.txt": info["changed"]["result.txt"]}
+    assert (workspace / "result.txt").read_text() == "done"
+    assert b"working on the task" in b"".join(output)
+    assert len(coordinator.live_workers()) == 2
+
+
+def test_busy_workers_refuse_new_agents(cluster, tmp_path):
+    coordinator, workers = cluster
+    for worker in workers:
+        worker.command = [sys.executable, "-c", "import time; time.sleep(5)"]
+        worker.launch({"name": "blocker"})
+    with pytest.raises(WorkerError, match="No remote worker"):
+        RemoteDispatcher(coordinator.url, tmp_path / "cache", TOKEN).run(
+            {"name": "refused"}, tmp_path
+        )
+
+
+def test_agents_run_on_least_loaded_worker(tmp_path):
+    coordinator, (busy, idle) = start_cluster(tmp_path, capacity=2)
+    try:
+        command = busy.command
+        busy.command = [sys.executable, "-c", "import time; time.sleep(5)"]
+        busy.launch({"name": "blocker"})
+        busy.command = command
+        assert [w["id"] for w in coordinator.live_workers()] == [idle.id, busy.id]
+        workspace = tmp_path / "workspace"
+        workspace.mkdir()
+        (workspace / "input.txt").write_text("the task")
+
+        dispatcher = RemoteDispatcher(coordinator.url, tmp_path / "cache", TOKEN)
+        info = dispatcher.run({"name": "placed"}, workspace, poll_interval=0.05)
+        assert info["worker"] == idle.id
+    finally:
+        for worker in (busy, idle):
+            worker.stop()
+        coordinator.stop()
+
+
+def test_workers_refuse_requests_without_the_token(cluster, tmp_path):
+    coordinator, (worker, _) = cluster
+    for url in (f"{coordinator.url}/workers", f"{worker.url}/status"):
+        with pytest.raises(WorkerError, match="401"):
+            _request("GET", url, token="wrong")
+    with pytest.raises(WorkerError, match="shared token"):
+        RemoteDispatcher(coordinator.url, tmp_path / "cache", token="")
+
+
+def test_specs_cannot_escape_the_worker(cluster):
+    _, (worker, _) = cluster
+    with pytest.raises(ValueError, match="Invalid agent id"):
+        worker.launch({"id": "../../etc", "name": "escape"})
+    with pytest.raises(ValueError, match="LD_PRELOAD"):
+        worker.launch({"name": "inject", "env": {"LD_PRELOAD": "/tmp/evil.so"}})
+    assert worker.agents == {}
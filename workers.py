@@ -0,0 +1,580 @@
+"""Remote Dolly workers: a coordinator, worker daemons and a dispatcher.
+
+Workers register with the coordinator and run agent specs as Auto-GPT
+subprocesses. The dispatcher picks the least-loaded worker, syncs the workspace
+as content-addressed blobs, streams the agent's output back and pulls the files
+the agent changed.
+
+Every request carries a token shared by the coordinator, the workers and the
+dispatchers (DOLLY_WORKER_TOKEN); requests without it are refused.
+
+    python -m autogpt_dolly_plugin.workers coordinator --port 8700
+    python -m autogpt_dolly_plugin.workers worker --coordinator http://host:8700
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional
+
+from .blobs import BlobStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMAND = [
+    sys.executable,
+    "-m",
+    "autogpt",
+    "-C",
+    "{settings}",
+    "-w",
+    "{workspace}",
+    "-c",
+    "-l",
+    "{continuous_limit}",
+]
+TOKEN_HEADER = "X-Dolly-Token"
+AGENT_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+# The only environment variables a spec may set for its agent: its models,
+# and its place in the tree that spawned it
+SPEC_ENV_KEYS = {
+    "SMART_LLM",
+    "FAST_LLM",
+    "DOLLY_MAX_DEPTH",
+    "DOLLY_MAX_DESCENDANTS",
+    "DOLLY_MAX_FANOUT",
+    "DOLLY_TREE_DEPTH",
+    "DOLLY_TREE_SPAWNED",
+    "DOLLY_TREE_DEADLINE",
+}
+SYNC_EXCLUDE = (
+    "*.sqlite3*",
+    "*/output.txt",
+    "*/error.txt",
+    "dolly_artifacts/*",
+    "dolly_logs/*",
+    "dolly_events.jsonl*",
+    "dolly_handoff/*.refs/*",
+)
+
+
+class WorkerError(Exception):
+    """Raised when no worker can take an agent or a worker call fails."""
+
+
+def _token(token: Optional[str]) -> str:
+    token = token or os.getenv("DOLLY_WORKER_TOKEN", "")
+    if not token:
+        raise WorkerError("Remote workers need a shared token (DOLLY_WORKER_TOKEN)")
+    return token
+
+
+def _request(
+    method: str,
+    url: str,
+    payload=None,
+    data: Optional[bytes] = None,
+    timeout=30,
+    token: str = "",
+):
+    """Make an HTTP request; JSON in and out unless raw bytes are sent or read."""
+    headers = {TOKEN_HEADER: token}
+    if payload is not None:
+        data = json.dumps(payload).encode()
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=data, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            body = response.read()
+            if response.headers.get("Content-Type") == "application/json":
+                return json.loads(body)
+            return body, dict(response.headers)
+    except urllib.error.HTTPError as e:
+        raise WorkerError(f"{method} {url} failed: {e.code} {e.read()[:200]!r}")
+    except urllib.error.URLError as e:
+        raise WorkerError(f"{method} {url} failed: {e.reason}")
+
+
+def _path_of(parts: list[str]) -> str:
+    return "/" + "/".join(parts)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes requests to `route_<METHOD>(parts, query, body)` on its service."""
+
+    service = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _dispatch(self, method: str):
+        if not hmac.compare_digest(
+            self.headers.get(TOKEN_HEADER, "").encode(), self.service.token.encode()
+        ):
+            self._send(401, {"error": "missing or wrong token"}, method)
+            return
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        query = dict(
+            item.split("=", 1)
+            for item in self.path.partition("?")[2].split("&")
+            if "=" in item
+        )
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            status, result = getattr(self.service, f"route_{method}")(
+                parts, query, body
+            )
+        except (KeyError, FileNotFoundError) as e:
+            status, result = 404, {"error": str(e)}
+        except ValueError as e:
+            status, result = 400, {"error": str(e)}
+        except WorkerError as e:
+            status, result = 409, {"error": str(e)}
+        self._send(status, result, method)
+
+    def _send(self, status: int, result, method: str):
+        if isinstance(result, bytes):
+            payload, content_type = result, "application/octet-stream"
+        else:
+            payload, content_type = json.dumps(result).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class _Service:
+    def __init__(self, host: str, port: int, token: Optional[str] = None):
+        self.token = _token(token)
+        handler = type("Handler", (_Handler,), {"service": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def route_HEAD(self, parts, query, body):
+        return self.route_GET(parts, query, body)
+
+
+class Coordinator(_Service):
+    """Keeps track of live workers and their load."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        stale_after=30.0,
+        token: Optional[str] = None,
+    ):
+        super().__init__(host, port, token)
+        self.stale_after = stale_after
+        self.workers: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def live_workers(self) -> list[dict]:
+        """Workers with a recent heartbeat, least loaded first."""
+        cutoff = time.time() - self.stale_after
+        with self._lock:
+            live = [w for w in self.workers.values() if w["seen"] >= cutoff]
+        return sorted(live, key=lambda w: (w["running"] / w["capacity"], w["running"]))
+
+    def route_POST(self, parts, query, body):
+        # Registration doubles as the heartbeat: workers re-post it periodically
+        if parts == ["workers"]:
+            info = json.loads(body)
+            worker_id = info.get("id") or uuid.uuid4().hex[:12]
+            with self._lock:
+                self.workers[worker_id] = {
+                    "id": worker_id,
+                    "url": info["url"],
+                    "capacity": max(1, int(info.get("capacity", 1))),
+                    "running": int(info.get("running", 0)),
+                    "seen": time.time(),
+                }
+                return 200, self.workers[worker_id]
+        raise KeyError(_path_of(parts))
+
+    def route_GET(self, parts, query, body):
+        if parts == ["workers"]:
+            return 200, self.live_workers()
+        raise KeyError(_path_of(parts))
+
+
+class Worker(_Service):
+    """Runs agent specs as subprocesses and serves their output and blobs.
+
+    Parameters:
+        root (Path): Where blobs, workspaces and logs are kept.
+        coordinator_url (str): Coordinator to register with, if any.
+        capacity (int): How many agents may run at once.
+        command (list[str]): The agent command line; {settings}, {workspace} and
+            {continuous_limit} are filled in per agent.
+        token (str): Shared token (default: DOLLY_WORKER_TOKEN).
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        coordinator_url: Optional[str] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        capacity: int = 2,
+        command: Optional[list[str]] = None,
+        heartbeat_interval: float = 5.0,
+        token: Optional[str] = None,
+    ):
+        super().__init__(host, port, token)
+        self.root = Path(root)
+        self.blobs = BlobStore(self.root / "blobs")
+        self.coordinator_url = coordinator_url
+        self.capacity = capacity
+        self.command = command or DEFAULT_COMMAND
+        self.heartbeat_interval = heartbeat_interval
+        self.id = uuid.uuid4().hex[:12]
+        self.agents: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> int:
+        with self._lock:
+            return sum(1 for a in self.agents.values() if a["status"] == "running")
+
+    def start(self):
+        super().start()
+        if self.coordinator_url:
+            self._heartbeat()
+            threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            agents = list(self.agents.values())
+        for agent in agents:
+            if agent["process"].poll() is None:
+                agent["process"].terminate()
+        super().stop()
+
+    def _heartbeat(self):
+        if not self.coordinator_url:
+            return
+        try:
+            _request(
+                "POST",
+                f"{self.coordinator_url}/workers",
+                {
+                    "id": self.id,
+                    "url": self.url,
+                    "capacity": self.capacity,
+                    "running": self.running,
+                },
+                token=self.token,
+            )
+        except WorkerError:
+            logger.warning(f"Dolly worker {self.id} could not reach the coordinator")
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            self._heartbeat()
+
+    def launch(self, spec: dict) -> str:
+        agent_id = spec.get("id") or uuid.uuid4().hex[:12]
+        if not AGENT_ID_PATTERN.fullmatch(agent_id):
+            raise ValueError(f"Invalid agent id: {agent_id!r}")
+        env = spec.get("env", {})
+        refused = sorted(set(env) - SPEC_ENV_KEYS)
+        if refused:
+            raise ValueError(f"Agents may not set {', '.join(refused)}")
+        with self._lock:
+            running = sum(1 for a in self.agents.values() if a["status"] == "running")
+            if running >= self.capacity:
+                raise WorkerError(f"Worker {self.id} is at capacity")
+            if agent_id in self.agents:
+                raise WorkerError(f"Agent {agent_id} already ran on worker {self.id}")
+            home = self.root / "agents" / agent_id
+            workspace = home / "workspace"
+            workspace.mkdir(parents=True, exist_ok=True)
+            self.blobs.materialize(spec.get("workspace", {}), workspace)
+            # JSON is valid YAML, so it doubles as the ai_settings file
+            settings = home / "ai_settings.yaml"
+            settings.write_text(
+                json.dumps(
+                    {
+                        "ai_name": spec["name"],
+                        "ai_role": spec.get("role", ""),
+                        "ai_goals": spec.get("goals", []),
+                    }
+                )
+            )
+            log_path = home / "output.txt"
+            values = {
+                "settings": str(settings),
+                "workspace": str(workspace),
+                "continuous_limit": str(spec.get("continuous_limit", 5)),
+            }
+            command = [part.format(**values) for part in self.command]
+            child_env = {**os.environ, **{key: str(env[key]) for key in env}}
+            with open(log_path, "wb") as log:
+                process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    cwd=home,
+                    env=child_env,
+                )
+            self.agents[agent_id] = {
+                "id": agent_id,
+                "name": spec["name"],
+                "process": process,
+                "status": "running",
+                "workspace": workspace,
+                "input": spec.get("workspace", {}),
+                "log": log_path,
+            }
+        threading.Thread(target=self._reap, args=(agent_id,), daemon=True).start()
+        self._heartbeat()
+        return agent_id
+
+    def _reap(self, agent_id: str):
+        agent = self.agents[agent_id]
+        returncode = agent["process"].wait()
+        with self._lock:
+            if agent["status"] == "running":
+                agent["status"] = "finished" if returncode == 0 else "failed"
+            agent["returncode"] = returncode
+        self._heartbeat()
+
+    def describe(self, agent_id: str) -> dict:
+        agent = self.agents[agent_id]
+        info = {
+            "id": agent_id,
+            "name": agent["name"],
+            "worker": self.id,
+            "status": agent["status"],
+            "returncode": agent.get("returncode"),
+        }
+        if agent["status"] != "running":
+            output = self.blobs.snapshot(agent["workspace"], SYNC_EXCLUDE)
+            info["changed"] = {
+                path: digest
+                for path, digest in output.items()
+                if agent["input"].get(path) != digest
+            }
+        return info
+
+    def route_POST(self, parts, query, body):
+        if parts == ["agents"]:
+            agent_id = self.launch(json.loads(body))
+            return 200, self.describe(agent_id)
+        raise KeyError(_path_of(parts))
+
+    def route_PUT(self, parts, query, body):
+        if len(parts) == 2 and parts[0] == "blobs":
+            digest = self.blobs.put(body)
+            if digest != parts[1]:
+                raise ValueError("Blob content does not match its digest")
+            return 200, {"digest": digest}
+        raise KeyError(_path_of(parts))
+
+    def route_GET(self, parts, query, body):
+        if len(parts) == 2 and parts[0] == "blobs":
+            return 200, self.blobs.get(parts[1])
+        if parts == ["status"]:
+            return 200, {
+                "id": self.id,
+                "capacity": self.capacity,
+                "running": self.running,
+            }
+        if len(parts) == 2 and parts[0] == "agents":
+            return 200, self.describe(parts[1])
+        if len(parts) == 3 and parts[0] == "agents" and parts[2] == "output":
+            agent = self.agents[parts[1]]
+            with open(agent["log"], "rb") as log:
+                log.seek(int(query.get("offset", 0)))
+                return 200, log.read(int(query.get("limit", 1 << 20)))
+        raise KeyError(_path_of(parts))
+
+    def route_DELETE(self, parts, query, body):
+        if len(parts) == 2 and parts[0] == "agents":
+            agent = self.agents[parts[1]]
+            with self._lock:
+                if agent["status"] == "running":
+                    agent["status"] = "cancelled"
+                    agent["process"].terminate()
+            return 200, self.describe(parts[1])
+        raise KeyError(_path_of(parts))
+
+
+class RemoteDispatcher:
+    """Runs agents on the least-loaded worker known to a coordinator."""
+
+    def __init__(
+        self,
+        coordinator_url: str,
+        cache: Optional[Path] = None,
+        token: Optional[str] = None,
+    ):
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.blobs = BlobStore(cache or Path.home() / ".cache" / "dolly" / "blobs")
+        self.token = _token(token)
+
+    def _request(self, method: str, url: str, payload=None, data=None):
+        return _request(method, url, payload, data, token=self.token)
+
+    def available_workers(self) -> list[dict]:
+        """Workers with a free slot, least loaded first."""
+        workers = self._request("GET", f"{self.coordinator_url}/workers")
+        return [w for w in workers if w["running"] < w["capacity"]]
+
+    def _upload(self, worker_url: str, manifest: dict[str, str]):
+        for digest in set(manifest.values()):
+            try:
+                self._request("HEAD", f"{worker_url}/blobs/{digest}")
+            except WorkerError:
+                self._request(
+                    "PUT", f"{worker_url}/blobs/{digest}", data=self.blobs.get(digest)
+                )
+
+    def _download(self, worker_url: str, manifest: dict[str, str]):
+        for digest in set(manifest.values()):
+            if not self.blobs.has(digest):
+                data, _ = self._request("GET", f"{worker_url}/blobs/{digest}")
+                self.blobs.put(data)
+
+    def run(
+        self,
+        spec: dict,
+        workspace: Path,
+        on_output: Optional[Callable[[bytes], None]] = None,
+        cancelled: Callable[[], bool] = lambda: False,
+        poll_interval: float = 1.0,
+    ) -> dict:
+        """Run spec remotely against a copy of workspace.
+
+        Files the agent created or changed are written back into workspace.
+        Returns the worker's final description of the agent.
+        """
+        manifest = self.blobs.snapshot(workspace, SYNC_EXCLUDE)
+        # Loads reported to the coordinator can be stale, so a worker may still
+        # turn the agent down; fall through to the next one when it does.
+        for worker in self.available_workers():
+            try:
+                self._upload(worker["url"], manifest)
+                info = self._request(
+                    "POST", f"{worker['url']}/agents", {**spec, "workspace": manifest}
+                )
+                break
+            except WorkerError as e:
+                logger.info(f"Dolly: worker {worker['id']} declined: {e}")
+        else:
+            raise WorkerError("No remote worker has a free slot")
+        agent_url = f"{worker['url']}/agents/{info['id']}"
+        logger.info(f"Dolly: agent {spec['name']} running on worker {worker['id']}")
+
+        offset = 0
+        try:
+            while True:
+                chunk, _ = self._request("GET", f"{agent_url}/output?offset={offset}")
+                offset += len(chunk)
+                if chunk and on_output:
+                    on_output(chunk)
+                if info["status"] != "running" and not chunk:
+                    break
+                if cancelled() and info["status"] == "running":
+                    info = self._request("DELETE", agent_url)
+                    continue
+                if not chunk:
+                    time.sleep(poll_interval)
+                info = self._request("GET", agent_url)
+        except BaseException:
+            if info["status"] == "running":
+                self._request("DELETE", agent_url)
+            raise
+
+        self._download(worker["url"], info.get("changed", {}))
+        self.blobs.materialize(info.get("changed", {}), workspace)
+        return info
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Dolly remote workers")
+    commands = parser.add_subparsers(dest="role", required=True)
+    coordinator = commands.add_parser("coordinator")
+    coordinator.add_argument("--host", default="127.0.0.1")
+    coordinator.add_argument("--port", type=int, default=8700)
+    worker = commands.add_parser("worker")
+    worker.add_argument("--coordinator", required=True)
+    worker.add_argument("--host", default="127.0.0.1")
+    worker.add_argument("--port", type=int, default=0)
+    worker.add_argument("--capacity", type=int, default=2)
+    worker.add_argument("--root", default="dolly_worker")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.role == "coordinator":
+            service = Coordinator(args.host, args.port)
+        else:
+            service = Worker(
+                Path(args.root),
+                coordinator_url=args.coordinator,
+                host=args.host,
+                port=args.port,
+                capacity=args.capacity,
+            )
+    except WorkerError as e:
+        parser.exit(1, f"{e}\n")
+    service.start()
+    print(f"Dolly {args.role} listening on {service.url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()